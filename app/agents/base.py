@@ -1,14 +1,22 @@
 from langchain_google_genai import ChatGoogleGenerativeAI
+from app.agents.llm_cache import CachedLLM
 from app.core.settings import settings
 
 
-def get_llm():
+def get_llm(bypass_cache: bool = False):
     """
-    Returns a Gemini 2.0 Flash chat model via LangChain.
+    Returns a Gemini 2.0 Flash chat model via LangChain, behind the
+    response cache (see app.agents.llm_cache).
     Make sure GEMINI_API_KEY is set in your .env.
+
+    bypass_cache=True skips cached answers for this model but still stores
+    the fresh ones.
     """
-    return ChatGoogleGenerativeAI(
+    llm = ChatGoogleGenerativeAI(
         model="gemini-2.0-flash",
         temperature=0.2,
         api_key=settings.GEMINI_API_KEY,
     )
+    if not settings.LLM_CACHE_ENABLED:
+        return llm
+    return CachedLLM(llm, bypass=bypass_cache)
@@ -6,13 +6,24 @@ from app.agents.dq_agent import run_dq_agent
 from app.agents.sql_agent import run_sql_agent
 from app.agents.rootcause_agent import run_rootcause_agent
 from app.agents.base import get_llm
+from app.agents.llm_cache import bypass_llm_cache
+from app.agents.intent import IntentDecision, aclassify_intent_fast
 
 
-def classify_intent(user_query: str) -> str:
+async def classify_intent(user_query: str, db: Optional[Session] = None) -> str:
     """
-    Very simple intent classifier using LLM.
+    Intent classifier: a local keyword/n-gram model first, the LLM only
+    when the local model is unsure.
     Returns one of: metadata, dq, sql, rootcause
     """
+    return (await classify_intent_decision(user_query, db)).intent
+
+
+async def classify_intent_decision(user_query: str, db: Optional[Session] = None) -> IntentDecision:
+    return await aclassify_intent_fast(user_query, _classify_intent_llm, db=db)
+
+
+async def _classify_intent_llm(user_query: str) -> Optional[str]:
     llm = get_llm()
     prompt = f"""
 You are an intent classifier for Dr. Database.
@@ -29,7 +40,7 @@ User query:
 
 Respond with ONLY one word from the list above.
 """
-    resp = llm.invoke(prompt)
+    resp = await llm.ainvoke(prompt)
     text = (resp.content if hasattr(resp, "content") else str(resp)).strip().lower()
     if "dq" in text:
         return "dq"
@@ -37,28 +48,42 @@ Respond with ONLY one word from the list above.
         return "sql"
     if "root" in text:
         return "rootcause"
-    # default
-    return "metadata"
+    if "metadata" in text:
+        return "metadata"
+    # Unrecognized: classify_intent_fast routes to the default, unlogged.
+    return None
 
 
-def run_controller(user_query: str, db: Session, table: list[str] | None = None, sql_text: Optional[str] = None):
+async def run_controller(
+    user_query: str,
+    db: Session,
+    table: list[str] | None = None,
+    sql_text: Optional[str] = None,
+    no_cache: bool = False,
+    connection: Optional[str] = None,
+):
     """
     Main entry point for the multi-agent system.
+    no_cache=True skips cached LLM answers for this request; `connection`
+    names the warehouse (the default one when None).
     """
-    intent = classify_intent(user_query)
+    with bypass_llm_cache(no_cache):
+        decision = await classify_intent_decision(user_query, db)
+        intent = decision.intent
 
-    if intent == "metadata":
-        answer = run_metadata_agent(user_query, db, table)
-    elif intent == "dq":
-        answer = run_dq_agent(user_query, db, table)
-    elif intent == "sql":
-        answer = run_sql_agent(user_query, sql_text)
-    elif intent == "rootcause":
-        answer = run_rootcause_agent(user_query, db, table)
-    else:
-        answer = "Sorry, I could not classify your request."
+        if intent == "metadata":
+            answer = await run_metadata_agent(user_query, db, table, connection=connection)
+        elif intent == "dq":
+            answer = await run_dq_agent(user_query, db, table, connection=connection)
+        elif intent == "sql":
+            answer = await run_sql_agent(user_query, sql_text)
+        elif intent == "rootcause":
+            answer = await run_rootcause_agent(user_query, db, table, connection=connection)
+        else:
+            answer = "Sorry, I could not classify your request."
 
     return {
         "intent": intent,
         "answer": answer,
+        "debug": [f"classify_intent → {decision.describe()}"],
     }
@@ -1,15 +1,21 @@
+import asyncio
 from typing import Optional, List
 from sqlalchemy.orm import Session
 
 from app.agents.base import get_llm
-from app.dq.runner import run_dq_for_table
+from app.dq.memo import describe_cache, run_dq_for_table_memo, without_cache
+from app.warehouse.client import aget_warehouse_client
 
 
-def run_dq_agent(user_query: str, db: Session, tables: List[str] | None = None) -> str:
+async def run_dq_agent(
+    user_query: str, db: Session, tables: List[str] | None = None, connection: Optional[str] = None
+) -> str:
     llm = get_llm()
 
     if tables:
-        dq_results = {t: run_dq_for_table(db, t) for t in tables}
+        client = await aget_warehouse_client(db, connection)
+        # DQ scans stay on the sync pool; each runs on a worker thread.
+        dq_results = {t: await asyncio.to_thread(run_dq_for_table_memo, db, t, client) for t in tables}
     else:
         dq_results = {"note": "No tables selected"}
 
@@ -17,7 +23,7 @@ def run_dq_agent(user_query: str, db: Session, tables: List[str] | None = None)
 You are Dr. Database's Data Quality Insight Agent.
 
 You are given the following DQ results:
-{dq_results}
+{without_cache(dq_results)}
 
 User question:
 {user_query}
@@ -25,5 +31,10 @@ User question:
 Interpret the results, identify issues, and recommend next steps.
 """
 
-    resp = llm.invoke(prompt)
-    return resp.content if hasattr(resp, "content") else str(resp)
+    resp = await llm.ainvoke(prompt)
+    answer = resp.content if hasattr(resp, "content") else str(resp)
+
+    freshness = describe_cache(dq_results)
+    if freshness:
+        answer += f"\n\n_DQ results: {'; '.join(freshness)}_"
+    return answer
@@ -0,0 +1,265 @@
+import asyncio
+import math
+import re
+import threading
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from app.core.settings import settings
+
+
+INTENTS = ("metadata", "dq", "sql", "rootcause")
+# Used when the LLM's answer is not one of INTENTS (never logged for training).
+DEFAULT_INTENT = "metadata"
+
+# Keyword rules: each hit adds RULE_WEIGHT to the intent's log-score.
+RULE_WEIGHT = 1.5
+RULES: List[Tuple[str, "re.Pattern"]] = [
+    ("sql", re.compile(
+        r"\b(select|join|joins|cte|group by|order by|window function|"
+        r"write (a |an |the )?(sql|query)|sql|query|queries)\b"
+    )),
+    ("dq", re.compile(
+        r"\b(nulls?|duplicates?|data quality|dq|row counts?|missing values?|"
+        r"freshness|stale|completeness|quality checks?)\b"
+    )),
+    ("rootcause", re.compile(
+        r"\b(why|root cause|caused?|broke|broken|dropped|spike|spiked|"
+        r"went wrong|investigate|diagnose|failing|failed)\b"
+    )),
+    ("metadata", re.compile(
+        r"\b(which tables?|what tables?|list (the )?tables|columns?|schema|"
+        r"describe|data types?|primary keys?|foreign keys?|relationships?)\b"
+    )),
+]
+
+# Seed examples so the model is usable before anything has been logged.
+SEED_EXAMPLES: List[Tuple[str, str]] = [
+    ("which tables store customer orders", "metadata"),
+    ("what columns does the orders table have", "metadata"),
+    ("describe the schema of the sales table", "metadata"),
+    ("list all tables in the warehouse", "metadata"),
+    ("what is the primary key of customers", "metadata"),
+    ("how are orders and customers related", "metadata"),
+    ("are there nulls in the orders table", "dq"),
+    ("check data quality for customers", "dq"),
+    ("how many duplicate rows are in payments", "dq"),
+    ("run quality checks on all tables", "dq"),
+    ("what is the row count of events", "dq"),
+    ("which columns have missing values", "dq"),
+    ("write a query to find recent orders", "sql"),
+    ("write sql to join orders and customers", "sql"),
+    ("explain this select statement", "sql"),
+    ("optimize this query", "sql"),
+    ("write a cte to find recent load failures", "sql"),
+    ("convert this query to sql server syntax", "sql"),
+    ("why did the orders row count drop yesterday", "rootcause"),
+    ("what caused the spike in nulls", "rootcause"),
+    ("investigate why the customers table is broken", "rootcause"),
+    ("root cause of missing data in sales", "rootcause"),
+    ("why is the dashboard showing wrong numbers", "rootcause"),
+    ("diagnose the failed load of events", "rootcause"),
+]
+
+# Retrain after this many new logged examples.
+RETRAIN_EVERY = 50
+# Logged examples used for training (most recent first).
+MAX_TRAINING_EXAMPLES = 5000
+
+
+@dataclass
+class IntentDecision:
+    intent: str
+    confidence: float
+    source: str  # "local", "llm" or "default" (LLM answer unrecognized)
+    local_intent: Optional[str] = None
+
+    def describe(self) -> str:
+        if self.source == "local":
+            return f"{self.intent} (local, confidence {self.confidence:.2f})"
+        if self.source == "default":
+            return f"{self.intent} (default: LLM answer unrecognized, local guess {self.local_intent} at {self.confidence:.2f})"
+        return f"{self.intent} (llm, local guess {self.local_intent} at {self.confidence:.2f})"
+
+
+# ----------------------------------------------------------------------
+# Features
+# ----------------------------------------------------------------------
+_TOKEN = re.compile(r"[a-z0-9_]+")
+
+
+def _normalize(question: str) -> str:
+    return " ".join(_TOKEN.findall(question.lower()))
+
+
+def _features(question: str) -> List[str]:
+    tokens = _normalize(question).split()
+    return tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+
+
+# ----------------------------------------------------------------------
+# Model: keyword rules + multinomial Naive Bayes over word n-grams
+# ----------------------------------------------------------------------
+class IntentClassifier:
+    def __init__(self):
+        self.class_counts: Counter = Counter()
+        self.feature_counts: Dict[str, Counter] = defaultdict(Counter)
+        self.feature_totals: Counter = Counter()
+        self.vocabulary: set = set()
+
+    def fit(self, examples: Iterable[Tuple[str, str]]) -> "IntentClassifier":
+        for question, intent in examples:
+            if intent not in INTENTS:
+                continue
+            self.class_counts[intent] += 1
+            for f in _features(question):
+                self.feature_counts[intent][f] += 1
+                self.feature_totals[intent] += 1
+                self.vocabulary.add(f)
+        return self
+
+    def _log_scores(self, question: str) -> Dict[str, float]:
+        total = sum(self.class_counts.values())
+        vocab = len(self.vocabulary) + 1
+        features = _features(question)
+        normalized = _normalize(question)
+
+        scores = {}
+        for intent in INTENTS:
+            score = math.log((self.class_counts[intent] + 1) / (total + len(INTENTS)))
+            denom = self.feature_totals[intent] + vocab
+            for f in features:
+                if f in self.vocabulary:
+                    score += math.log((self.feature_counts[intent][f] + 1) / denom)
+            scores[intent] = score
+
+        for intent, pattern in RULES:
+            if pattern.search(normalized):
+                scores[intent] += RULE_WEIGHT
+        return scores
+
+    def predict(self, question: str) -> Tuple[str, float]:
+        """Return (intent, posterior probability of that intent)."""
+        scores = self._log_scores(question)
+        top = max(scores.values())
+        weights = {k: math.exp(v - top) for k, v in scores.items()}
+        norm = sum(weights.values())
+        intent = max(weights, key=weights.get)
+        return intent, weights[intent] / norm
+
+
+# ----------------------------------------------------------------------
+# Training data and the shared model
+# ----------------------------------------------------------------------
+_lock = threading.Lock()
+_classifier: Optional[IntentClassifier] = None
+_logged_since_fit = 0
+
+
+def _training_examples(db) -> List[Tuple[str, str]]:
+    examples = list(SEED_EXAMPLES)
+    if db is None:
+        return examples
+
+    from app.db.models import IntentExample
+
+    try:
+        rows = (
+            db.query(IntentExample.question, IntentExample.intent)
+            .order_by(IntentExample.created_at.desc())
+            .limit(MAX_TRAINING_EXAMPLES)
+            .all()
+        )
+    except Exception:
+        # Table not created yet – train on the seeds alone.
+        db.rollback()
+        return examples
+    return examples + [(q, i) for q, i in rows]
+
+
+def get_classifier(db=None) -> IntentClassifier:
+    global _classifier, _logged_since_fit
+    with _lock:
+        if _classifier is None or _logged_since_fit >= RETRAIN_EVERY:
+            _classifier = IntentClassifier().fit(_training_examples(db))
+            _logged_since_fit = 0
+        return _classifier
+
+
+def log_intent_example(db, question: str, intent: str, source: str = "llm") -> None:
+    global _logged_since_fit
+    if db is None:
+        return
+
+    from app.db.models import IntentExample
+
+    try:
+        db.add(IntentExample(question=question, intent=intent, source=source))
+        db.commit()
+    except Exception:
+        db.rollback()
+        return
+    with _lock:
+        _logged_since_fit += 1
+
+
+# ----------------------------------------------------------------------
+# Public entry point
+# ----------------------------------------------------------------------
+def classify_intent_fast(
+    question: str,
+    llm_fallback: Callable[[str], Optional[str]],
+    db=None,
+    threshold: Optional[float] = None,
+) -> IntentDecision:
+    """
+    Classify locally and only ask the LLM (`llm_fallback(question)`) when
+    the local confidence is below `threshold`. LLM answers are logged as
+    training examples for the local model; the fallback returns None (or
+    anything outside INTENTS) when the answer is unrecognized, which
+    routes to DEFAULT_INTENT without being logged.
+    """
+    decision = _local_decision(question, db, threshold)
+    if decision.source == "local":
+        return decision
+    return _llm_decision(question, decision, llm_fallback(question), db)
+
+
+async def aclassify_intent_fast(
+    question: str,
+    llm_fallback: Callable[[str], Awaitable[Optional[str]]],
+    db=None,
+    threshold: Optional[float] = None,
+) -> IntentDecision:
+    """
+    classify_intent_fast with an async LLM fallback. The internal-DB work
+    (retraining, logging examples) runs in a worker thread so it never
+    blocks the event loop.
+    """
+    decision = await asyncio.to_thread(_local_decision, question, db, threshold)
+    if decision.source == "local":
+        return decision
+    llm_intent = await llm_fallback(question)
+    return await asyncio.to_thread(_llm_decision, question, decision, llm_intent, db)
+
+
+def _local_decision(question: str, db, threshold: Optional[float]) -> IntentDecision:
+    """The local prediction; source is "llm" when it is not confident enough."""
+    if threshold is None:
+        threshold = settings.INTENT_CONFIDENCE_THRESHOLD
+
+    intent, confidence = get_classifier(db).predict(question)
+    source = "local" if confidence >= threshold else "llm"
+    return IntentDecision(intent=intent, confidence=confidence, source=source, local_intent=intent)
+
+
+def _llm_decision(question: str, local: IntentDecision, llm_intent: Optional[str], db) -> IntentDecision:
+    if llm_intent not in INTENTS:
+        return IntentDecision(
+            intent=DEFAULT_INTENT, confidence=local.confidence, source="default", local_intent=local.local_intent
+        )
+    log_intent_example(db, question, llm_intent, source="llm")
+    return IntentDecision(
+        intent=llm_intent, confidence=local.confidence, source="llm", local_intent=local.local_intent
+    )
@@ -0,0 +1,318 @@
+# app/agents/llm_cache.py
+"""
+LLM response cache: an in-memory LRU in front of the llm_cache table,
+keyed by normalized prompt, model and temperature.
+"""
+import asyncio
+import contextvars
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import AsyncIterator, Dict, Iterator, Optional
+
+from langchain_core.messages import AIMessage, AIMessageChunk
+from sqlalchemy.exc import IntegrityError
+
+from app.core.db_connection import SessionLocal
+from app.core.settings import settings
+from app.db.models import LLMCacheEntry
+
+
+# ----------------------------------------------------------------------
+# Keys
+# ----------------------------------------------------------------------
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_prompt(prompt) -> str:
+    """Whitespace and indentation differences do not change the answer."""
+    if not isinstance(prompt, str):
+        prompt = "\n".join(getattr(m, "content", str(m)) for m in prompt)
+    return _WHITESPACE.sub(" ", prompt).strip()
+
+
+def cache_key(prompt, model: str, temperature: Optional[float]) -> str:
+    raw = f"{model}\x00{temperature}\x00{normalize_prompt(prompt)}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+# ----------------------------------------------------------------------
+# Per-request bypass
+# ----------------------------------------------------------------------
+_bypass: contextvars.ContextVar[bool] = contextvars.ContextVar("llm_cache_bypass", default=False)
+
+
+@contextmanager
+def bypass_llm_cache(enabled: bool = True):
+    """Within this block cached answers are not served; fresh ones still refresh the cache."""
+    token = _bypass.set(enabled)
+    try:
+        yield
+    finally:
+        _bypass.reset(token)
+
+
+# ----------------------------------------------------------------------
+# Two-level store
+# ----------------------------------------------------------------------
+class LLMCache:
+    """
+    Memory LRU (`memory_entries`) over the internal DB (`max_entries`).
+    Entries older than `ttl_seconds` are never served; the DB table is
+    pruned of expired and least-recently-used rows every `prune_every`
+    writes.
+    """
+
+    def __init__(self, memory_entries: int, max_entries: int, ttl_seconds: float, prune_every: int = 100):
+        self.memory_entries = memory_entries
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.prune_every = prune_every
+
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.stores = 0
+        self.memory_evictions = 0
+        self.evictions = 0
+        self.expired = 0
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            cached = self._memory.get(key)
+            if cached is not None:
+                response, created_at = cached
+                if now - created_at <= self.ttl_seconds:
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    return response
+                del self._memory[key]
+                self.expired += 1
+
+        db = SessionLocal()
+        try:
+            entry = db.get(LLMCacheEntry, key)
+            if entry is None or now - entry.created_at > self.ttl_seconds:
+                with self._lock:
+                    self.misses += 1
+                return None
+            entry.hits = (entry.hits or 0) + 1
+            entry.last_used_at = now
+            db.commit()
+            response, created_at = entry.response, entry.created_at
+        finally:
+            db.close()
+
+        with self._lock:
+            self.db_hits += 1
+            self._remember(key, response, created_at)
+        return response
+
+    def put(self, key: str, response: str, model: str, temperature: Optional[float]) -> None:
+        now = time.time()
+        with self._lock:
+            self.stores += 1
+            self._remember(key, response, now)
+            self._writes += 1
+            prune = self._writes % self.prune_every == 0
+
+        db = SessionLocal()
+        try:
+            entry = db.get(LLMCacheEntry, key)
+            if entry is None:
+                db.add(LLMCacheEntry(
+                    key=key, model=model, temperature=temperature, response=response,
+                    hits=0, created_at=now, last_used_at=now,
+                ))
+            else:
+                entry.response = response
+                entry.created_at = now
+                entry.last_used_at = now
+            try:
+                db.commit()
+            except IntegrityError:
+                # Another worker stored the same answer first.
+                db.rollback()
+            if prune:
+                self._prune(db, now)
+        finally:
+            db.close()
+
+    def _remember(self, key: str, response: str, created_at: float) -> None:
+        self._memory[key] = (response, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+            self.memory_evictions += 1
+
+    def _prune(self, db, now: float) -> None:
+        expired = (
+            db.query(LLMCacheEntry)
+            .filter(LLMCacheEntry.created_at < now - self.ttl_seconds)
+            .delete(synchronize_session=False)
+        )
+        overflow = db.query(LLMCacheEntry).count() - self.max_entries
+        if overflow > 0:
+            oldest = (
+                db.query(LLMCacheEntry.key)
+                .order_by(LLMCacheEntry.last_used_at)
+                .limit(overflow)
+                .subquery()
+            )
+            db.query(LLMCacheEntry).filter(LLMCacheEntry.key.in_(oldest.select())).delete(
+                synchronize_session=False
+            )
+        db.commit()
+        with self._lock:
+            self.expired += expired
+            self.evictions += max(overflow, 0)
+
+    def clear(self) -> int:
+        with self._lock:
+            self._memory.clear()
+        db = SessionLocal()
+        try:
+            removed = db.query(LLMCacheEntry).delete(synchronize_session=False)
+            db.commit()
+            return removed
+        finally:
+            db.close()
+
+    def stats(self) -> Dict:
+        db = SessionLocal()
+        try:
+            stored = db.query(LLMCacheEntry).count()
+        finally:
+            db.close()
+        with self._lock:
+            hits = self.memory_hits + self.db_hits
+            lookups = hits + self.misses
+            return {
+                "memory_entries": len(self._memory),
+                "stored_entries": stored,
+                "max_entries": self.max_entries,
+                "memory_hits": self.memory_hits,
+                "db_hits": self.db_hits,
+                "misses": self.misses,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "bypassed": self.bypassed,
+                "stores": self.stores,
+                "memory_evictions": self.memory_evictions,
+                "evictions": self.evictions,
+                "expired": self.expired,
+            }
+
+
+llm_cache = LLMCache(
+    memory_entries=settings.LLM_CACHE_MEMORY_ENTRIES,
+    max_entries=settings.LLM_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.LLM_CACHE_TTL_SECONDS,
+)
+
+
+# ----------------------------------------------------------------------
+# Chat model wrapper
+# ----------------------------------------------------------------------
+class CachedLLM:
+    """
+    Wraps a chat model's `invoke` / `stream` and their async variants
+    with the cache. Anything else is passed through to the wrapped model.
+    """
+
+    def __init__(self, llm, cache: LLMCache = llm_cache, bypass: bool = False):
+        self.llm = llm
+        self.cache = cache
+        self.bypass = bypass
+        self.model = getattr(llm, "model", None) or type(llm).__name__
+        self.temperature = getattr(llm, "temperature", None)
+
+    def __getattr__(self, name):
+        return getattr(self.llm, name)
+
+    def _bypassed(self) -> bool:
+        if self.bypass or _bypass.get():
+            with self.cache._lock:
+                self.cache.bypassed += 1
+            return True
+        return False
+
+    def _lookup(self, key: str) -> Optional[str]:
+        if self._bypassed():
+            return None
+        return self.cache.get(key)
+
+    async def _alookup(self, key: str) -> Optional[str]:
+        if self._bypassed():
+            return None
+        # The DB tier is blocking; keep it off the event loop.
+        return await asyncio.to_thread(self.cache.get, key)
+
+    def invoke(self, prompt, *args, **kwargs):
+        key = cache_key(prompt, self.model, self.temperature)
+        cached = self._lookup(key)
+        if cached is not None:
+            return AIMessage(content=cached, response_metadata={"cached": True})
+
+        resp = self.llm.invoke(prompt, *args, **kwargs)
+        content = getattr(resp, "content", str(resp))
+        if isinstance(content, str) and content:
+            self.cache.put(key, content, self.model, self.temperature)
+        return resp
+
+    def stream(self, prompt, *args, **kwargs) -> Iterator:
+        key = cache_key(prompt, self.model, self.temperature)
+        cached = self._lookup(key)
+        if cached is not None:
+            yield AIMessageChunk(content=cached, response_metadata={"cached": True})
+            return
+
+        parts, textual = [], True
+        for chunk in self.llm.stream(prompt, *args, **kwargs):
+            content = getattr(chunk, "content", str(chunk))
+            if isinstance(content, str):
+                parts.append(content)
+            else:
+                textual = False
+            yield chunk
+        # Only a fully consumed, plain-text stream is stored.
+        if parts and textual:
+            self.cache.put(key, "".join(parts), self.model, self.temperature)
+
+    async def ainvoke(self, prompt, *args, **kwargs):
+        key = cache_key(prompt, self.model, self.temperature)
+        cached = await self._alookup(key)
+        if cached is not None:
+            return AIMessage(content=cached, response_metadata={"cached": True})
+
+        resp = await self.llm.ainvoke(prompt, *args, **kwargs)
+        content = getattr(resp, "content", str(resp))
+        if isinstance(content, str) and content:
+            await asyncio.to_thread(self.cache.put, key, content, self.model, self.temperature)
+        return resp
+
+    async def astream(self, prompt, *args, **kwargs) -> AsyncIterator:
+        key = cache_key(prompt, self.model, self.temperature)
+        cached = await self._alookup(key)
+        if cached is not None:
+            yield AIMessageChunk(content=cached, response_metadata={"cached": True})
+            return
+
+        parts, textual = [], True
+        async for chunk in self.llm.astream(prompt, *args, **kwargs):
+            content = getattr(chunk, "content", str(chunk))
+            if isinstance(content, str):
+                parts.append(content)
+            else:
+                textual = False
+            yield chunk
+        if parts and textual:
+            await asyncio.to_thread(self.cache.put, key, "".join(parts), self.model, self.temperature)
@@ -2,23 +2,18 @@ from typing import Optional, List
 from sqlalchemy.orm import Session
 
 from app.agents.base import get_llm
-from app.warehouse.client import WarehouseClient
-from app.warehouse.metadata import extract_table_metadata
+from app.warehouse.client import aget_warehouse_client
+from app.warehouse.schema_index import abuild_schema_context
 
 
-def run_metadata_agent(user_query: str, db: Session, tables: List[str] | None = None) -> str:
-    client = WarehouseClient(db)
+async def run_metadata_agent(
+    user_query: str, db: Session, tables: List[str] | None = None, connection: Optional[str] = None
+) -> str:
+    client = await aget_warehouse_client(db, connection)
     llm = get_llm()
 
-    all_tables = client.list_tables()
-    context_parts = [f"Available tables: {all_tables}"]
-
-    if tables:
-        for t in tables:
-            md = extract_table_metadata(db, t)
-            context_parts.append(f"\nMetadata for table '{t}':\n{md}")
-
-    context = "\n".join(context_parts)
+    schema = await abuild_schema_context(client, user_query, tables=tables or [])
+    context = schema["text"]
 
     prompt = f"""
 You are Dr. Database's Metadata Agent.
@@ -32,5 +27,5 @@ User question:
 Answer using ONLY the metadata provided. Keep responses concise and useful.
 """
 
-    resp = llm.invoke(prompt)
+    resp = await llm.ainvoke(prompt)
     return resp.content if hasattr(resp, "content") else str(resp)
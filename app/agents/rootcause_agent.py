@@ -1,22 +1,25 @@
+import asyncio
 from typing import Optional, List
 from sqlalchemy.orm import Session
 
 from app.agents.base import get_llm
-from app.warehouse.client import WarehouseClient
-from app.dq.runner import run_dq_for_table
+from app.warehouse.client import aget_warehouse_client
+from app.dq.memo import describe_cache, run_dq_for_table_memo, without_cache
 
 
-def run_rootcause_agent(user_query: str, db: Session, tables: List[str] | None = None) -> str:
+async def run_rootcause_agent(
+    user_query: str, db: Session, tables: List[str] | None = None, connection: Optional[str] = None
+) -> str:
     llm = get_llm()
-    client = WarehouseClient(db)
+    client = await aget_warehouse_client(db, connection)
 
-    warehouse_tables = client.list_tables()
+    warehouse_tables = await client.alist_tables()
     metadata_context = {"warehouse_tables": warehouse_tables}
 
     dq_context = {}
     if tables:
         for t in tables:
-            dq_context[t] = run_dq_for_table(db, t)
+            dq_context[t] = await asyncio.to_thread(run_dq_for_table_memo, db, t, client)
 
     prompt = f"""
 You are Dr. Database's Root Cause Analysis Agent.
@@ -25,7 +28,7 @@ Metadata Context:
 {metadata_context}
 
 DQ Context:
-{dq_context}
+{without_cache(dq_context)}
 
 User Question:
 {user_query}
@@ -33,5 +36,10 @@ User Question:
 Give the most likely root cause(s), explain your reasoning, and recommend next investigative actions.
 """
 
-    resp = llm.invoke(prompt)
-    return resp.content if hasattr(resp, "content") else str(resp)
+    resp = await llm.ainvoke(prompt)
+    answer = resp.content if hasattr(resp, "content") else str(resp)
+
+    freshness = describe_cache(dq_context)
+    if freshness:
+        answer += f"\n\n_DQ results: {'; '.join(freshness)}_"
+    return answer
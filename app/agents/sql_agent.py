@@ -1,7 +1,7 @@
 from app.agents.base import get_llm
 
 
-def run_sql_agent(user_query: str, sql_text: str | None = None) -> str:
+async def run_sql_agent(user_query: str, sql_text: str | None = None) -> str:
     """
     Explains or helps with SQL questions.
     """
@@ -21,5 +21,5 @@ and adapt to SQL Server if relevant.
 If no SQL is provided, answer the question about SQL best you can.
 """
 
-    resp = llm.invoke(prompt)
+    resp = await llm.ainvoke(prompt)
     return resp.content if hasattr(resp, "content") else str(resp)
@@ -0,0 +1,143 @@
+# app/api/cancellation.py
+"""
+Tie warehouse work to the HTTP request that asked for it: when the client
+disconnects, the request's CancelScope is cancelled, which aborts queued
+and running warehouse statements (see app.warehouse.cancel).
+"""
+import asyncio
+import threading
+from typing import Any, AsyncIterable, AsyncIterator, Callable, Iterable, Iterator, Optional, Union
+
+from fastapi import HTTPException, Request
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
+
+from app.warehouse.cancel import CancelScope, QueryCancelled, use_cancel_scope
+from app.warehouse.governor import QueryTimeout, WarehouseBusy
+
+# How often a running request checks whether its client is still there.
+_DISCONNECT_POLL_SECONDS = 0.5
+
+
+def _scoped(iterable: Iterable, scope: CancelScope) -> Iterator:
+    """Advance the iterator with `scope` current; each step may run on a different thread."""
+    iterator = iter(iterable)
+    try:
+        while True:
+            with use_cancel_scope(scope):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+    finally:
+        # Release the warehouse connection as soon as the stream is dropped.
+        close = getattr(iterator, "close", None)
+        if close is not None:
+            with use_cancel_scope(scope):
+                close()
+
+
+async def _ascoped(iterable: AsyncIterable, scope: CancelScope) -> AsyncIterator:
+    """_scoped for async iterators; work they hand to threads inherits the scope."""
+    iterator = iterable.__aiter__()
+    try:
+        while True:
+            with use_cancel_scope(scope):
+                try:
+                    item = await iterator.__anext__()
+                except StopAsyncIteration:
+                    return
+            yield item
+    finally:
+        aclose = getattr(iterator, "aclose", None)
+        if aclose is not None:
+            with use_cancel_scope(scope):
+                await aclose()
+
+
+def _expire(scope: CancelScope, source: Optional[Iterator]) -> None:
+    scope.cancel()
+    close = getattr(source, "close", None)
+    if close is not None:
+        try:
+            close()
+        except ValueError:
+            # Being advanced right now; the cancelled scope stops it.
+            pass
+
+
+async def stream_with_cancel(
+    iterable: Union[Iterable, AsyncIterable],
+    scope: CancelScope = None,
+    max_seconds: Optional[float] = None,
+    source: Optional[Iterator] = None,
+) -> AsyncIterator:
+    """
+    Body for a StreamingResponse. Starlette stops the stream when the
+    client disconnects; the scope is then cancelled so the warehouse
+    stops working on it too. Sync iterables are advanced in the
+    threadpool, async ones on the event loop.
+
+    With `max_seconds`, the stream is also cut at that wall-clock
+    deadline even while a stalled client is not reading: the scope is
+    cancelled and `source` (the generator holding the warehouse
+    connection) is closed, which frees its query slot.
+    """
+    scope = scope or CancelScope()
+    timer = None
+    if max_seconds:
+        timer = threading.Timer(max_seconds, _expire, (scope, source))
+        timer.daemon = True
+        timer.start()
+    if hasattr(iterable, "__aiter__"):
+        items = _ascoped(iterable, scope)
+    else:
+        items = iterate_in_threadpool(_scoped(iterable, scope))
+    try:
+        async for item in items:
+            yield item
+    finally:
+        if timer is not None:
+            timer.cancel()
+        scope.cancel()
+
+
+async def run_with_cancel(request: Request, fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    Run `fn` under a fresh scope, cancelling it if the client disconnects
+    before it finishes. Blocking functions run in the threadpool;
+    coroutine functions run on the event loop and their task is cancelled
+    too. Governor refusals and timeouts become 503 / 504.
+    """
+    scope = CancelScope()
+
+    if asyncio.iscoroutinefunction(fn):
+        # The task copies the current context, scope included.
+        with use_cancel_scope(scope):
+            task = asyncio.ensure_future(fn(*args, **kwargs))
+    else:
+        def work():
+            with use_cancel_scope(scope):
+                return fn(*args, **kwargs)
+
+        task = asyncio.ensure_future(run_in_threadpool(work))
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=_DISCONNECT_POLL_SECONDS)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                scope.cancel()
+                # Nobody is listening; threads wind down on their own.
+                task.cancel()
+                raise HTTPException(status_code=499, detail="Client closed request")
+    except WarehouseBusy as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except QueryTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except QueryCancelled as e:
+        raise HTTPException(status_code=499, detail=str(e))
+    finally:
+        if not task.done():
+            scope.cancel()
+            task.cancel()
@@ -1,9 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException
+import json
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 
+from app.api.cancellation import run_with_cancel, stream_with_cancel
 from app.core.db_connection import get_db
 from app.agents.controller import run_controller
+from app.agents.llm_cache import llm_cache
+from app.graph.graph import run_langgraph_query, stream_langgraph_query
 
 router = APIRouter()
 
@@ -12,17 +18,97 @@ class AgentQuery(BaseModel):
     query: str
     table: str | None = None
     sql_text: str | None = None
+    no_cache: bool = False
+    connection: str | None = None
+
+
+class GraphQuery(BaseModel):
+    question: str
+    tables: list[str] = []
+    sql_text: str | None = None
+    # Skip cached LLM answers (fresh answers still refresh the cache)
+    no_cache: bool = False
+    # Registry name of the warehouse; the default connection when omitted
+    connection: str | None = None
 
 
 @router.post("/query")
-def agent_query(payload: AgentQuery, db: Session = Depends(get_db)):
+async def agent_query(payload: AgentQuery, request: Request, db: Session = Depends(get_db)):
     if not payload.query:
         raise HTTPException(status_code=400, detail="Query text is required")
 
-    result = run_controller(
+    result = await run_with_cancel(
+        request,
+        run_controller,
         user_query=payload.query,
         db=db,
         table=payload.table,
         sql_text=payload.sql_text,
+        no_cache=payload.no_cache,
+        connection=payload.connection,
     )
     return result
+
+
+@router.get("/llm-cache")
+def llm_cache_stats():
+    return llm_cache.stats()
+
+
+@router.delete("/llm-cache")
+def clear_llm_cache():
+    return {"removed": llm_cache.clear()}
+
+
+# -----------------------------
+# LangGraph pipeline
+# -----------------------------
+@router.post("/run")
+async def agent_run(payload: GraphQuery, request: Request, db: Session = Depends(get_db)):
+    if not payload.question:
+        raise HTTPException(status_code=400, detail="Question text is required")
+
+    return await run_with_cancel(
+        request,
+        run_langgraph_query,
+        payload.question,
+        payload.tables,
+        payload.sql_text,
+        db,
+        no_cache=payload.no_cache,
+        connection=payload.connection,
+    )
+
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+@router.post("/run/stream")
+async def agent_run_stream(payload: GraphQuery, db: Session = Depends(get_db)):
+    """
+    Server-sent events for the LangGraph pipeline: node progress, per-table
+    DQ progress, answer tokens as they arrive, then a `final` event.
+    """
+    if not payload.question:
+        raise HTTPException(status_code=400, detail="Question text is required")
+
+    async def events():
+        try:
+            async for event, data in stream_langgraph_query(
+                payload.question,
+                payload.tables,
+                payload.sql_text,
+                db,
+                no_cache=payload.no_cache,
+                connection=payload.connection,
+            ):
+                yield _sse(event, data)
+        except Exception as e:
+            yield _sse("error", {"error": str(e)})
+
+    return StreamingResponse(
+        stream_with_cancel(events()),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
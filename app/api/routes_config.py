@@ -1,18 +1,31 @@
 # app/api/routes_config.py
-from fastapi import APIRouter
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 
 from app.db.connection import (
+    DEFAULT_CONNECTION,
     create_engine_from_dict,
+    registry,
     test_engine_connection
 )
 
-router = APIRouter(prefix="/config")
+# Mounted at /config in app.main
+router = APIRouter()
 
 
 # -----------------------------
 # Request Model
 # -----------------------------
+class PoolOptions(BaseModel):
+    pool_size: Optional[int] = None
+    max_overflow: Optional[int] = None
+    pool_recycle: Optional[int] = None
+    pool_pre_ping: Optional[bool] = None
+    pool_timeout: Optional[int] = None
+
+
 class ConnectionPayload(BaseModel):
     db_type: str
     host: str
@@ -20,6 +33,10 @@ class ConnectionPayload(BaseModel):
     database: str
     username: str
     password: str
+    # Registry name; several warehouses can be connected side by side
+    name: str = DEFAULT_CONNECTION
+    make_default: bool = True
+    pool: Optional[PoolOptions] = None
 
 
 # -----------------------------
@@ -27,14 +44,40 @@ class ConnectionPayload(BaseModel):
 # -----------------------------
 @router.post("/save")
 def save_connection(payload: ConnectionPayload):
-    ok, err = create_engine_from_dict(payload.dict())
-    return {"success": ok, "error": err}
+    details = payload.dict(exclude={"name", "make_default", "pool"})
+    pool = payload.pool.dict(exclude_none=True) if payload.pool else None
+    ok, err = create_engine_from_dict(details, name=payload.name, pool_options=pool, make_default=payload.make_default)
+    return {"success": ok, "error": err, "name": payload.name}
 
 
 # -----------------------------
 # Test existing connection
 # -----------------------------
 @router.get("/test")
-def test_connection():
-    ok, err = test_engine_connection()
+def test_connection(name: Optional[str] = None):
+    ok, err = test_engine_connection(name)
     return {"success": ok, "error": err}
+
+
+# -----------------------------
+# Named connections
+# -----------------------------
+@router.get("/connections")
+def list_connections():
+    return {"connections": registry.list_connections()}
+
+
+@router.put("/connections/{name}/default")
+def set_default_connection(name: str):
+    try:
+        registry.set_default(name)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return {"default": name}
+
+
+@router.delete("/connections/{name}")
+def remove_connection(name: str):
+    if not registry.remove(name):
+        raise HTTPException(status_code=404, detail=f"Unknown connection: {name}")
+    return {"removed": name}
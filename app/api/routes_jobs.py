@@ -0,0 +1,28 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+
+from app.core.db_connection import get_db
+from app.dq.jobs import job_manager
+
+router = APIRouter()
+
+
+@router.get("")
+def list_jobs(limit: int = 50, db: Session = Depends(get_db)):
+    return {"jobs": job_manager.list_jobs(db, limit=limit)}
+
+
+@router.get("/{job_id}")
+def get_job(job_id: str, include_results: bool = True, db: Session = Depends(get_db)):
+    job = job_manager.get(db, job_id, include_results=include_results)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.delete("/{job_id}")
+def cancel_job(job_id: str, db: Session = Depends(get_db)):
+    job = job_manager.cancel(db, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {"job_id": job.id, "status": job.status}
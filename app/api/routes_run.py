@@ -1,42 +1,402 @@
-from fastapi import APIRouter, Depends, HTTPException
+import json
+
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
 from sqlalchemy.orm import Session
 
+from app.api.cancellation import run_with_cancel, stream_with_cancel
 from app.core.db_connection import get_db
-from app.warehouse.client import WarehouseClient
+from app.core.settings import settings
+from app.dq.anomaly import STATUS_ORDER, score_latest
+from app.dq.schema_drift import detect_drift
+from app.dq.incremental import configure_watermark, reset_watermark
+from app.dq.table_config import configure_freshness, configure_key_columns, configure_tier, get_table_config
+from app.dq.jobs import job_manager
+from app.dq.memo import run_dq_for_table_memo
+from app.dq.scheduler import plan_units, scheduler
+from app.warehouse.cache import metadata_cache
+from app.warehouse.client import WarehouseClient, aget_warehouse_client, check_readonly_sql
+from app.warehouse.governor import governor_stats
+from app.warehouse.export import arrow_available, arrow_ipc_stream, ndjson_lines
 from app.warehouse.metadata import extract_table_metadata
-from app.dq.runner import run_dq_for_table, run_dq_for_all_tables
+from app.dq.runner import (
+    RUN_MODES,
+    iter_dq_for_all_tables,
+    run_dq_for_all_tables,
+)
 
 router = APIRouter()
 
 @router.get("/tables")
-def list_tables(db: Session = Depends(get_db)):
+async def list_tables(request: Request, connection: Optional[str] = None, db: Session = Depends(get_db)):
+    try:
+        client = await aget_warehouse_client(db, connection)
+        return {"tables": await run_with_cancel(request, client.alist_tables)}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+# Slack between a stream's own deadline and the forced close.
+_STREAM_GRACE_SECONDS = 5
+
+
+class SQLQuery(BaseModel):
+    sql: str
+    max_rows: Optional[int] = None
+    max_bytes: Optional[int] = None
+    format: str = "ndjson"
+    connection: Optional[str] = None
+
+
+@router.post("/sql")
+async def run_sql(req: SQLQuery, request: Request, db: Session = Depends(get_db)):
+    """
+    Stream a read-only SELECT as NDJSON or Arrow IPC record batches. Rows
+    come from a server-side cursor and stop at the row/byte budget; the
+    final NDJSON line (or the client reading to the end) reports whether
+    the result was truncated.
+    """
+    if req.format not in ("ndjson", "arrow"):
+        raise HTTPException(status_code=400, detail="format must be 'ndjson' or 'arrow'")
+    if req.format == "arrow" and not arrow_available():
+        raise HTTPException(status_code=400, detail="Arrow output requires pyarrow")
+
     try:
-        client = WarehouseClient(db)
-        return {"tables": client.list_tables()}
+        check_readonly_sql(req.sql)
+        client = await aget_warehouse_client(db, req.connection)
+        chunks = client.iter_readonly_sql(req.sql, max_rows=req.max_rows, max_bytes=req.max_bytes)
+        # Run the statement now so SQL errors surface as a 400, not a cut stream.
+        header = await run_with_cancel(request, next, chunks)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+    def replay():
+        yield header
+        yield from chunks
+
+    # The stream stops itself at the deadline; the hard cut a few seconds
+    # later frees the query slot even if the client stopped reading.
+    hard_deadline = settings.SQL_STREAM_MAX_SECONDS + _STREAM_GRACE_SECONDS
+    if req.format == "arrow":
+        return StreamingResponse(
+            stream_with_cancel(arrow_ipc_stream(replay()), max_seconds=hard_deadline, source=chunks),
+            media_type="application/vnd.apache.arrow.stream",
+        )
+    return StreamingResponse(
+        stream_with_cancel(ndjson_lines(replay()), max_seconds=hard_deadline, source=chunks),
+        media_type="application/x-ndjson",
+    )
+
+
+@router.get("/metadata/cache")
+def metadata_cache_stats():
+    return metadata_cache.stats()
+
+
+@router.get("/governor")
+def warehouse_governor_stats():
+    """Running/queued queries, rejections and timeouts per warehouse."""
+    return governor_stats()
+
+
+@router.delete("/metadata/cache")
+def clear_metadata_cache():
+    metadata_cache.invalidate()
+    return metadata_cache.stats()
+
 
 @router.get("/tables/{table}/columns")
-def table_columns(table: str, db: Session = Depends(get_db)):
+def table_columns(table: str, connection: Optional[str] = None, db: Session = Depends(get_db)):
     try:
-        client = WarehouseClient(db)
+        client = WarehouseClient(db, connection)
         return {"columns": client.get_columns(table)}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.get("/tables/{table}/metadata")
-def table_metadata(table: str, db: Session = Depends(get_db)):
+def table_metadata(table: str, connection: Optional[str] = None, db: Session = Depends(get_db)):
+    try:
+        return extract_table_metadata(db, table, connection)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def _check_mode(mode: str) -> None:
+    if mode not in RUN_MODES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown mode '{mode}'. Expected one of: {', '.join(RUN_MODES)}",
+        )
+
+
+# Declared before /dq/{table} so "stream" is not taken as a table name.
+@router.get("/dq/stream")
+def dq_all_stream(
+    mode: str = "exact",
+    target_error: Optional[float] = None,
+    connection: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    """
+    Same as /dq, but sends one NDJSON line per table as soon as that
+    table finishes.
+    """
+    _check_mode(mode)
+    client = WarehouseClient(db, connection)
+
+    def lines():
+        for table_output in iter_dq_for_all_tables(db, client=client, mode=mode, target_error=target_error):
+            yield json.dumps(table_output, default=str) + "\n"
+
+    # Disconnecting cancels the scans still running.
+    return StreamingResponse(stream_with_cancel(lines()), media_type="application/x-ndjson")
+
+
+@router.get("/dq/anomalies")
+def dq_anomalies(
+    tables: Optional[List[str]] = Query(None),
+    min_status: str = "warn",
+    connection: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    """
+    Latest value of every recorded DQ metric scored against its history,
+    worst first. Reads the internal DB only.
+    """
+    if min_status not in STATUS_ORDER:
+        raise HTTPException(status_code=400, detail=f"min_status must be one of: {', '.join(STATUS_ORDER)}")
+    client = WarehouseClient(db, connection)
+    if not client.connection_key:
+        raise HTTPException(status_code=400, detail="No warehouse connection configured.")
+    scored = score_latest(client.connection_key, tables)
+    flagged = [m for m in scored if STATUS_ORDER[m["status"]] >= STATUS_ORDER[min_status]]
+    flagged.sort(key=lambda m: (-STATUS_ORDER[m["status"]], -abs(m["score"] or 0)))
+    return {"scored_metrics": len(scored), "anomalies": flagged}
+
+
+@router.get("/dq/schema-drift")
+async def dq_schema_drift(
+    request: Request,
+    connection: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    """
+    Compare every table's schema fingerprint with the stored one: one
+    catalog snapshot plus an in-memory comparison. Read-only: drift stays
+    reported until POST /dq/schema-drift/ack accepts it.
+    """
+    client = await aget_warehouse_client(db, connection)
+    if not client.connection_key:
+        raise HTTPException(status_code=400, detail="No warehouse connection configured.")
+    return await run_with_cancel(request, detect_drift, client, record=False)
+
+
+class DriftAck(BaseModel):
+    # None acknowledges every table, including dropped ones.
+    tables: Optional[List[str]] = None
+
+
+@router.post("/dq/schema-drift/ack")
+async def dq_schema_drift_ack(
+    payload: DriftAck,
+    request: Request,
+    connection: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    """
+    Accept the current schemas as the baseline: changed fingerprints are
+    stored, dropped tables forgotten. Returns the drift that was accepted.
+    """
+    client = await aget_warehouse_client(db, connection)
+    if not client.connection_key:
+        raise HTTPException(status_code=400, detail="No warehouse connection configured.")
+    return await run_with_cancel(request, detect_drift, client, payload.tables, record=True)
+
+
+# -----------------------------
+# Background DQ scheduler
+# -----------------------------
+@router.get("/dq/scheduler")
+def dq_scheduler_status():
+    """Scheduler state: budget used per connection over the last hour, units in flight, recent runs."""
+    return scheduler.status()
+
+
+@router.get("/dq/scheduler/plan")
+def dq_scheduler_plan(
+    limit: int = 100,
+    due_only: bool = False,
+    connection: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    """Check units by urgency, with the priority, interval and learned cost behind each."""
+    client = WarehouseClient(db, connection)
+    if not client.connection_key:
+        raise HTTPException(status_code=400, detail="No warehouse connection configured.")
+    plan = plan_units(client.connection_key, client.list_tables())
+    if due_only:
+        plan = [unit for unit in plan if unit["due"]]
+    return {"units": len(plan), "plan": plan[:limit]}
+
+
+@router.post("/dq/scheduler/start")
+def dq_scheduler_start():
+    scheduler.start()
+    return {"running": scheduler.running}
+
+
+@router.post("/dq/scheduler/stop")
+def dq_scheduler_stop():
+    scheduler.stop()
+    return {"running": scheduler.running}
+
+
+class WatermarkConfig(BaseModel):
+    column: str
+    kind: str = "timestamp"
+
+
+@router.get("/dq/{table}/watermark")
+def get_watermark(table: str, connection: Optional[str] = None, db: Session = Depends(get_db)):
+    client = WarehouseClient(db, connection)
+    config = get_table_config(db, client.connection_key, table)
+    if config is None or not config.watermark_column:
+        return {"table": table, "column": None, "kind": None}
+    return {"table": table, "column": config.watermark_column, "kind": config.watermark_kind}
+
+
+@router.put("/dq/{table}/watermark")
+def set_watermark(
+    table: str, payload: WatermarkConfig, connection: Optional[str] = None, db: Session = Depends(get_db)
+):
+    try:
+        client = WarehouseClient(db, connection)
+        config = configure_watermark(db, client, table, payload.column, payload.kind)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"table": table, "column": config.watermark_column, "kind": config.watermark_kind}
+
+
+@router.delete("/dq/{table}/watermark")
+def clear_watermark_state(table: str, connection: Optional[str] = None, db: Session = Depends(get_db)):
+    """Forget the stored watermark and running aggregates; the next incremental run rescans."""
+    client = WarehouseClient(db, connection)
+    reset_watermark(db, client.connection_key, table)
+    db.commit()
+    return {"table": table, "reset": True}
+
+
+class KeyConfig(BaseModel):
+    columns: Optional[List[str]] = None
+
+
+@router.put("/dq/{table}/key")
+def set_key_columns(
+    table: str, payload: KeyConfig, connection: Optional[str] = None, db: Session = Depends(get_db)
+):
+    """Declare the business key DuplicateCheck groups by (empty clears it)."""
     try:
-        return extract_table_metadata(db, table)
+        client = WarehouseClient(db, connection)
+        config = configure_key_columns(db, client, table, payload.columns)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
+    return {"table": table, "key_columns": config.key_columns}
+
+
+class FreshnessConfig(BaseModel):
+    column: Optional[str] = None
+    sla_seconds: Optional[int] = None
+
+
+@router.put("/dq/{table}/freshness")
+def set_freshness(
+    table: str, payload: FreshnessConfig, connection: Optional[str] = None, db: Session = Depends(get_db)
+):
+    """Pin the column FreshnessCheck reads and the table's freshness SLA (nulls restore the defaults)."""
+    try:
+        client = WarehouseClient(db, connection)
+        config = configure_freshness(db, client, table, payload.column, payload.sla_seconds)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"table": table, "column": config.freshness_column, "sla_seconds": config.freshness_sla_seconds}
+
+
+class TierConfig(BaseModel):
+    tier: Optional[int] = None
+
+
+@router.put("/dq/{table}/tier")
+def set_tier(table: str, payload: TierConfig, connection: Optional[str] = None, db: Session = Depends(get_db)):
+    """Business tier the scheduler weighs the table by: 1 (critical) to 3 (low); null restores the default."""
+    try:
+        client = WarehouseClient(db, connection)
+        config = configure_tier(db, client, table, payload.tier)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"table": table, "tier": config.tier}
+
 
 @router.get("/dq/{table}")
-def dq_table(table: str, db: Session = Depends(get_db)):
-    return run_dq_for_table(db, table)
+async def dq_table(
+    request: Request,
+    table: str,
+    mode: str = "exact",
+    target_error: Optional[float] = None,
+    max_age: float = 0,
+    connection: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    """
+    Run DQ for one table. With max_age > 0 a stored result younger than
+    that many seconds is returned instead; every fresh run is stored for
+    the agents to reuse.
+    """
+    _check_mode(mode)
+    client = await aget_warehouse_client(db, connection)
+    return await run_with_cancel(
+        request, run_dq_for_table_memo, db, table, client, mode=mode, target_error=target_error, max_age=max_age
+    )
 
 @router.get("/dq")
-def dq_all(db: Session = Depends(get_db)):
-    return run_dq_for_all_tables(db)
+async def dq_all(
+    request: Request,
+    mode: str = "exact",
+    target_error: Optional[float] = None,
+    connection: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    _check_mode(mode)
+    client = await aget_warehouse_client(db, connection)
+    return await run_with_cancel(
+        request, run_dq_for_all_tables, db, client=client, mode=mode, target_error=target_error
+    )
+
+
+# -----------------------------
+# Background DQ jobs (progress/cancel under /jobs)
+# -----------------------------
+class DQJobRequest(BaseModel):
+    tables: Optional[List[str]] = None
+    mode: str = "exact"
+    target_error: Optional[float] = None
+    connection: Optional[str] = None
+
+
+@router.post("/dq/jobs", status_code=202)
+def dq_submit_job(payload: DQJobRequest, db: Session = Depends(get_db)):
+    _check_mode(payload.mode)
+    job = job_manager.submit(
+        db,
+        tables=payload.tables,
+        mode=payload.mode,
+        target_error=payload.target_error,
+        connection=payload.connection,
+    )
+    return {"job_id": job.id, "status": job.status, "total_tables": job.total_tables}
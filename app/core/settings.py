@@ -9,6 +9,93 @@ class Settings(BaseSettings):
     LLM_PROVIDER: str = "gemini"
     GEMINI_API_KEY: str
 
+    # LLM response cache (memory LRU in front of the internal DB)
+    LLM_CACHE_ENABLED: bool = True
+    LLM_CACHE_TTL_SECONDS: int = 24 * 3600
+    LLM_CACHE_MEMORY_ENTRIES: int = 256
+    LLM_CACHE_MAX_ENTRIES: int = 10_000
+
+    # Warehouse connection pools (per named connection; DBConfig.pool_options overrides)
+    WAREHOUSE_POOL_SIZE: int = 5
+    WAREHOUSE_MAX_OVERFLOW: int = 10
+    WAREHOUSE_POOL_RECYCLE_SECONDS: int = 1800
+    WAREHOUSE_POOL_PRE_PING: bool = True
+    WAREHOUSE_POOL_TIMEOUT_SECONDS: int = 30
+    # Async engine next to each pool (asyncpg / aioodbc); off, or without the
+    # driver installed, async callers fall back to the sync pool on a thread
+    WAREHOUSE_ASYNC_ENABLED: bool = True
+
+    # Query governor (per warehouse): statement/lock timeouts and admission control
+    WAREHOUSE_STATEMENT_TIMEOUT_SECONDS: int = 300
+    WAREHOUSE_LOCK_TIMEOUT_SECONDS: int = 30
+    WAREHOUSE_MAX_CONCURRENT_QUERIES: int = 4
+    WAREHOUSE_MAX_QUEUED_QUERIES: int = 64
+    WAREHOUSE_QUEUE_TIMEOUT_SECONDS: int = 300
+
+    # Read-only SQL: per-query budget and server-side cursor batch size
+    SQL_MAX_ROWS: int = 100_000
+    SQL_MAX_BYTES: int = 64 * 1024 * 1024
+    SQL_BATCH_ROWS: int = 1000
+    # Wall-clock limit on a streamed result, slow readers included: the
+    # stream holds one of the warehouse's query slots until it ends
+    SQL_STREAM_MAX_SECONDS: int = 300
+
+    # Background DQ jobs: tables run concurrently across all jobs
+    DQ_JOB_WORKERS: int = 4
+
+    # Agents reuse a table's stored DQ result while it is younger than this
+    DQ_RESULT_MAX_AGE_SECONDS: int = 900
+
+    # Column profiling: sketches are built from at most this many rows per table
+    PROFILE_SAMPLE_ROWS: int = 20_000
+    PROFILE_TOP_K: int = 10
+    PROFILE_HLL_PRECISION: int = 12
+    PROFILE_TDIGEST_COMPRESSION: int = 100
+
+    # Freshness: lag of the newest row allowed by default (per-table SLAs
+    # override it); lag past SLA x FAIL_FACTOR fails instead of warning
+    FRESHNESS_SLA_SECONDS: int = 86400
+    FRESHNESS_FAIL_FACTOR: float = 2.0
+    # Largest table whose freshness column is MAX()ed without an index
+    FRESHNESS_UNINDEXED_SCAN_MAX_ROWS: int = 1_000_000
+
+    # DQ metrics history and anomaly scoring (robust z-scores against it)
+    DQ_METRICS_RETENTION_DAYS: int = 90
+    ANOMALY_HISTORY_POINTS: int = 60
+    ANOMALY_MIN_HISTORY: int = 5
+    ANOMALY_WARN_SCORE: float = 3.0
+    ANOMALY_FAIL_SCORE: float = 5.0
+
+    # Background DQ scheduler (off unless enabled): ticks every TICK seconds
+    # and runs the most overdue check units within a per-warehouse budget
+    DQ_SCHEDULER_ENABLED: bool = False
+    DQ_SCHEDULER_TICK_SECONDS: int = 60
+    DQ_SCHEDULER_MAX_CONCURRENT: int = 2
+    DQ_SCHEDULER_QUERY_SECONDS_PER_HOUR: float = 600.0
+    DQ_SCHEDULER_ROWS_PER_HOUR: int = 500_000_000
+    # A unit costing CHEAP seconds runs every BASE_INTERVAL at priority 1;
+    # costlier units and lower priorities stretch it, up to MAX_INTERVAL
+    DQ_SCHEDULER_BASE_INTERVAL_SECONDS: int = 3600
+    DQ_SCHEDULER_MIN_INTERVAL_SECONDS: int = 300
+    DQ_SCHEDULER_MAX_INTERVAL_SECONDS: int = 7 * 86400
+    DQ_SCHEDULER_CHEAP_SECONDS: float = 1.0
+    # Assumed cost of a unit that has never run
+    DQ_SCHEDULER_DEFAULT_SECONDS: float = 5.0
+    DQ_SCHEDULER_DEFAULT_TIER: int = 2
+
+    # Local intent classifier: below this confidence the LLM decides
+    INTENT_CONFIDENCE_THRESHOLD: float = 0.75
+
+    # Warehouse metadata cache
+    METADATA_CACHE_MAX_ENTRIES: int = 16
+    METADATA_CACHE_TTL_SECONDS: int = 3600
+    # How long a snapshot is served before re-checking the catalog version
+    METADATA_CACHE_REVALIDATE_SECONDS: int = 30
+
+    # Schema context for agent prompts: BM25 top-k tables under a token budget
+    SCHEMA_CONTEXT_TOP_K: int = 15
+    SCHEMA_CONTEXT_TOKEN_BUDGET: int = 4000
+
     # App metadata
     APP_ENV: str = "local"
     APP_NAME: str = "Dr. Database"
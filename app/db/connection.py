@@ -1,10 +1,24 @@
-import os
-from typing import Dict, Optional, Tuple
-from sqlalchemy import create_engine
-from sqlalchemy.engine import Engine
+import importlib.util
+import threading
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import URL, Engine, make_url
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
 
-ENGINE: Optional[Engine] = None
+from app.core.db_connection import SessionLocal
+from app.core.settings import settings
+from app.db.models import DBConfig
+from app.warehouse.cache import metadata_cache
+from app.warehouse.cancel import install_cancel_hooks
+from app.warehouse.governor import install_governor_hooks
+
+DEFAULT_CONNECTION = "default"
+
+POOL_OPTIONS = ("pool_size", "max_overflow", "pool_recycle", "pool_pre_ping", "pool_timeout")
+
+# Async DBAPI per backend, swapped into the stored (sync) URL.
+ASYNC_DRIVERS = {"postgresql": "asyncpg", "mssql": "aioodbc", "sqlite": "aiosqlite"}
 
 
 # ---------------------------------------------------------
@@ -39,41 +53,275 @@ def _make_connection_url(details: Dict) -> str:
         raise ValueError("Unsupported db_type")
 
 
+def _pool_kwargs(overrides: Optional[Dict]) -> Dict:
+    """Settings defaults, overridden per connection by its stored pool options."""
+    kwargs = {
+        "pool_size": settings.WAREHOUSE_POOL_SIZE,
+        "max_overflow": settings.WAREHOUSE_MAX_OVERFLOW,
+        "pool_recycle": settings.WAREHOUSE_POOL_RECYCLE_SECONDS,
+        "pool_pre_ping": settings.WAREHOUSE_POOL_PRE_PING,
+        "pool_timeout": settings.WAREHOUSE_POOL_TIMEOUT_SECONDS,
+    }
+    for key, value in (overrides or {}).items():
+        if key not in POOL_OPTIONS:
+            raise ValueError(f"Unknown pool option: {key}")
+        if value is not None:
+            kwargs[key] = value
+    return kwargs
+
+
+def _async_url(url: str) -> Optional[URL]:
+    """The async-driver variant of a connection URL, or None when the driver is missing."""
+    url = make_url(url)
+    backend = url.get_backend_name()
+    driver = ASYNC_DRIVERS.get(backend)
+    if driver is None or importlib.util.find_spec(driver) is None:
+        return None
+    # SQLAlchemy's asyncio extension runs on greenlet.
+    if importlib.util.find_spec("greenlet") is None:
+        return None
+    return url.set(drivername=f"{backend}+{driver}")
+
+
+# ---------------------------------------------------------
+# Named connection registry
+# ---------------------------------------------------------
+class ConnectionRegistry:
+    """
+    Named warehouse connections, persisted as DBConfig rows. Engines are
+    built on first use and kept open side by side; re-registering a name
+    disposes only that name's pool. Each connection can also have an
+    AsyncEngine (same URL, async driver) for the event-loop request path.
+    """
+
+    def __init__(self):
+        self._engines: Dict[str, Engine] = {}
+        self._configs: Dict[str, DBConfig] = {}
+        self._async_engines: Dict[str, Optional[AsyncEngine]] = {}
+        self._default: Optional[str] = None
+        self._lock = threading.Lock()
+
+    # -- persistence --------------------------------------------------
+    def _load_config(self, name: Optional[str]) -> Optional[DBConfig]:
+        db = SessionLocal()
+        try:
+            query = db.query(DBConfig)
+            if name is None:
+                config = query.filter(DBConfig.is_default.is_(True)).first()
+            else:
+                config = query.filter(DBConfig.name == name).first()
+            if config is not None:
+                db.expunge(config)
+            return config
+        finally:
+            db.close()
+
+    def register(
+        self,
+        name: str,
+        url: str,
+        db_type: str,
+        pool_options: Optional[Dict] = None,
+        make_default: bool = True,
+    ) -> DBConfig:
+        _pool_kwargs(pool_options)  # validate before persisting
+
+        db = SessionLocal()
+        try:
+            config = db.query(DBConfig).filter(DBConfig.name == name).first()
+            if config is None:
+                config = DBConfig(name=name)
+                db.add(config)
+            config.db_type = db_type
+            config.connection_string = url
+            config.pool_options = pool_options or None
+            if make_default or not db.query(DBConfig).filter(DBConfig.is_default.is_(True)).count():
+                db.query(DBConfig).update({DBConfig.is_default: False})
+                config.is_default = True
+            db.commit()
+            db.refresh(config)
+            db.expunge(config)
+        finally:
+            db.close()
+
+        self.dispose(name)
+        self._forget_default()
+        return config
+
+    def remove(self, name: str) -> bool:
+        db = SessionLocal()
+        try:
+            removed = db.query(DBConfig).filter(DBConfig.name == name).delete(synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+        self.dispose(name)
+        self._forget_default()
+        return bool(removed)
+
+    def set_default(self, name: str) -> None:
+        db = SessionLocal()
+        try:
+            config = db.query(DBConfig).filter(DBConfig.name == name).first()
+            if config is None:
+                raise ValueError(f"Unknown connection: {name}")
+            db.query(DBConfig).update({DBConfig.is_default: False})
+            config.is_default = True
+            db.commit()
+        finally:
+            db.close()
+        self._forget_default()
+
+    def _forget_default(self) -> None:
+        with self._lock:
+            self._default = None
+
+    def list_connections(self) -> List[Dict]:
+        db = SessionLocal()
+        try:
+            configs = db.query(DBConfig).order_by(DBConfig.name).all()
+            return [
+                {
+                    "name": c.name,
+                    "db_type": c.db_type,
+                    "url": make_url(c.connection_string).render_as_string(hide_password=True),
+                    "default": bool(c.is_default),
+                    "pool": _pool_kwargs(c.pool_options),
+                    "open": c.name in self._engines,
+                }
+                for c in configs
+            ]
+        finally:
+            db.close()
+
+    # -- engines ------------------------------------------------------
+    def get(self, name: Optional[str] = None) -> Optional[Engine]:
+        """The named connection's engine (the default one when name is None)."""
+        with self._lock:
+            engine = self._engines.get(name if name is not None else self._default)
+        if engine is not None:
+            return engine
+
+        config = self._load_config(name)
+        if config is None:
+            if name is not None:
+                raise ValueError(f"Unknown connection: {name}")
+            return None
+
+        with self._lock:
+            if config.is_default:
+                self._default = config.name
+            engine = self._engines.get(config.name)
+            if engine is None:
+                engine = create_engine(config.connection_string, **_pool_kwargs(config.pool_options))
+                install_cancel_hooks(engine)
+                install_governor_hooks(engine)
+                self._engines[config.name] = engine
+                self._configs[config.name] = config
+            return engine
+
+    def get_async(self, name: Optional[str] = None) -> Optional[AsyncEngine]:
+        """
+        The named connection's AsyncEngine, or None when async access is
+        disabled or the backend's async driver is not installed.
+        """
+        if self.get(name) is None or not settings.WAREHOUSE_ASYNC_ENABLED:
+            return None
+
+        with self._lock:
+            key = name if name is not None else self._default
+            if key in self._async_engines:
+                return self._async_engines[key]
+            config = self._configs.get(key)
+            if config is None:
+                return None
+            url = _async_url(config.connection_string)
+            engine = create_async_engine(url, **_pool_kwargs(config.pool_options)) if url else None
+            self._async_engines[key] = engine
+            return engine
+
+    def dispose(self, name: str) -> None:
+        with self._lock:
+            engine = self._engines.pop(name, None)
+            self._configs.pop(name, None)
+            async_engine = self._async_engines.pop(name, None)
+        if engine is not None:
+            metadata_cache.invalidate(engine)
+            engine.dispose()
+        if async_engine is not None:
+            # Closing async connections needs the event loop; drop the pool
+            # here and let its connections be collected.
+            async_engine.sync_engine.dispose(close=False)
+
+    async def adispose_all(self) -> None:
+        """Close every async pool on the running loop, then the sync pools."""
+        with self._lock:
+            async_engines = list(self._async_engines.items())
+            self._async_engines.clear()
+        for _, async_engine in async_engines:
+            if async_engine is not None:
+                await async_engine.dispose()
+        self.dispose_all()
+
+    def dispose_all(self) -> None:
+        with self._lock:
+            names = list(self._engines)
+        for name in names:
+            self.dispose(name)
+
+
+registry = ConnectionRegistry()
+
+
 # ---------------------------------------------------------
-# Save engine globally
+# Save (and test) a named connection
 # ---------------------------------------------------------
-def create_engine_from_dict(details: Dict) -> Tuple[bool, Optional[str]]:
-    global ENGINE
+def create_engine_from_dict(
+    details: Dict,
+    name: str = DEFAULT_CONNECTION,
+    pool_options: Optional[Dict] = None,
+    make_default: bool = True,
+) -> Tuple[bool, Optional[str]]:
     try:
         url = _make_connection_url(details)
-        ENGINE = create_engine(url)
-        # Test connection
-        with ENGINE.connect() as conn:
-            conn.execute("SELECT 1")
+        # Test first, so a bad save never replaces a working connection.
+        probe = create_engine(url)
+        try:
+            with probe.connect() as conn:
+                conn.execute(text("SELECT 1"))
+        finally:
+            probe.dispose()
+        registry.register(name, url, details["db_type"], pool_options, make_default)
         return True, None
     except Exception as e:
-        ENGINE = None
         return False, str(e)
 
 
 # ---------------------------------------------------------
-# Test existing global engine
+# Test a registered engine
 # ---------------------------------------------------------
-def test_engine_connection() -> Tuple[bool, Optional[str]]:
-    global ENGINE
-    if ENGINE is None:
+def test_engine_connection(name: Optional[str] = None) -> Tuple[bool, Optional[str]]:
+    try:
+        engine = registry.get(name)
+    except ValueError as e:
+        return False, str(e)
+    if engine is None:
         return False, "No engine created."
 
     try:
-        with ENGINE.connect() as conn:
-            conn.execute("SELECT 1")
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
         return True, None
     except SQLAlchemyError as e:
         return False, str(e)
 
 
 # ---------------------------------------------------------
-# Retrieve global engine
+# Retrieve an engine from the registry
 # ---------------------------------------------------------
-def get_engine() -> Optional[Engine]:
-    return ENGINE
+def get_engine(name: Optional[str] = None) -> Optional[Engine]:
+    return registry.get(name)
+
+
+def get_async_engine(name: Optional[str] = None) -> Optional[AsyncEngine]:
+    return registry.get_async(name)
@@ -1,3 +1,5 @@
+from sqlalchemy import inspect, text
+
 from app.core.db_connection import Base, engine
 from app.db import models  # noqa: F401 (import models to register them)
 
@@ -5,3 +7,37 @@ from app.db import models  # noqa: F401 (import models to register them)
 def init_db():
     """Creates internal DB tables if they don't exist."""
     Base.metadata.create_all(bind=engine)
+    _migrate_db_config()
+
+
+def _migrate_db_config():
+    """
+    create_all never alters an existing table: internal DBs created before
+    the connection registry have a db_config without name, pool_options
+    and is_default. Add them, name the newest existing row "default" (and
+    make it the default), then enforce unique names. Safe to run on every
+    start.
+    """
+    existing = {c["name"] for c in inspect(engine).get_columns("db_config")}
+    missing = [c for c in ("name", "pool_options", "is_default") if c not in existing]
+    if not missing:
+        return
+
+    table = models.DBConfig.__table__
+    with engine.begin() as conn:
+        for name in missing:
+            column_type = table.c[name].type.compile(dialect=engine.dialect)
+            conn.execute(text(f"ALTER TABLE db_config ADD COLUMN {name} {column_type}"))
+
+        if "name" in missing:
+            ids = conn.execute(
+                text("SELECT id FROM db_config ORDER BY created_at DESC, id")
+            ).scalars().all()
+            for i, config_id in enumerate(ids):
+                conn.execute(
+                    text("UPDATE db_config SET name = :name, is_default = :is_default WHERE id = :id"),
+                    {"name": "default" if i == 0 else f"default-{i}", "is_default": i == 0, "id": config_id},
+                )
+            conn.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS ix_db_config_name ON db_config (name)"))
+        if "is_default" in missing:
+            conn.execute(text("UPDATE db_config SET is_default = :no WHERE is_default IS NULL"), {"no": False})
@@ -1,16 +1,21 @@
 import uuid
-from sqlalchemy import Column, String, DateTime, Text
+from sqlalchemy import Column, String, DateTime, Text, Integer, Float, BigInteger, Boolean, Index, LargeBinary, UniqueConstraint
 from sqlalchemy.types import JSON
 from sqlalchemy.sql import func
 from app.core.db_connection import Base
 
 
 class DBConfig(Base):
+    """A named warehouse connection (see app.db.connection.ConnectionRegistry)."""
     __tablename__ = "db_config"
 
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    name = Column(String, nullable=False, unique=True, default="default")
     db_type = Column(String, nullable=False)
     connection_string = Column(String, nullable=False)
+    # Overrides of the WAREHOUSE_POOL_* settings, e.g. {"pool_size": 10}
+    pool_options = Column(JSON)
+    is_default = Column(Boolean, default=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
@@ -25,4 +30,223 @@ class DQReport(Base):
     report_markdown = Column(Text)
     report_html = Column(Text)
     report_json = Column(JSON)
-    run_metadata = Column(JSON)
\ No newline at end of file
+    run_metadata = Column(JSON)
+
+
+class DQJob(Base):
+    __tablename__ = "dq_jobs"
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True))
+    finished_at = Column(DateTime(timezone=True))
+    # queued → running → completed | cancelled | failed
+    status = Column(String, nullable=False, default="queued")
+    mode = Column(String, default="exact")
+    target_error = Column(Float)
+    # Registry name of the warehouse; None means the default connection
+    connection = Column(String)
+    tables = Column(JSON)
+    total_tables = Column(Integer, default=0)
+    completed_tables = Column(Integer, default=0)
+    failed_tables = Column(Integer, default=0)
+    error = Column(Text)
+
+
+class DQJobResult(Base):
+    __tablename__ = "dq_job_results"
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    job_id = Column(String, nullable=False, index=True)
+    table_name = Column(String, nullable=False)
+    # completed | failed | cancelled
+    status = Column(String, nullable=False)
+    result = Column(JSON)
+    started_at = Column(DateTime(timezone=True))
+    finished_at = Column(DateTime(timezone=True))
+
+
+class DQTableConfig(Base):
+    """Per-table DQ settings for a warehouse connection."""
+    __tablename__ = "dq_table_config"
+    __table_args__ = (UniqueConstraint("connection_key", "table_name"),)
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    connection_key = Column(String, nullable=False)
+    table_name = Column(String, nullable=False)
+    # Incremental mode: column and kind (timestamp | identity | rowversion)
+    watermark_column = Column(String)
+    watermark_kind = Column(String)
+    # Business key for duplicate detection when no primary key is enforced
+    key_columns = Column(JSON)
+    # Freshness: column holding the last write time (detected when unset),
+    # and the lag allowed before the table counts as stale
+    freshness_column = Column(String)
+    freshness_sla_seconds = Column(Integer)
+    # Business tier for the DQ scheduler: 1 (critical) to 3 (low)
+    tier = Column(Integer)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+
+class DQWatermark(Base):
+    """Incremental-mode state: how far a table has been scanned, and the running aggregates."""
+    __tablename__ = "dq_watermarks"
+    __table_args__ = (UniqueConstraint("connection_key", "table_name"),)
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    connection_key = Column(String, nullable=False)
+    table_name = Column(String, nullable=False)
+    watermark_column = Column(String, nullable=False)
+    watermark_kind = Column(String, nullable=False)
+    last_value = Column(String)
+    row_count = Column(BigInteger, default=0)
+    # {rule_name: {key: value}} as produced by ScanRule.aggregates
+    aggregates = Column(JSON)
+    runs = Column(Integer, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class DQFreshnessState(Base):
+    """Last seen catalog change counter per table, to tell when it last moved."""
+    __tablename__ = "dq_freshness_state"
+    __table_args__ = (UniqueConstraint("connection_key", "table_name"),)
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    connection_key = Column(String, nullable=False)
+    table_name = Column(String, nullable=False)
+    # pg_stat_user_tables n_tup_ins + n_tup_upd + n_tup_del, or the row count
+    change_counter = Column(BigInteger)
+    # Epoch seconds: the check that first saw the current counter value
+    # (None until it has changed once), the first and the latest check
+    changed_at = Column(Float)
+    first_checked_at = Column(Float, nullable=False)
+    checked_at = Column(Float, nullable=False)
+
+
+class DQSchemaFingerprint(Base):
+    """Last recorded schema of a table and its hash (app.dq.schema_drift)."""
+    __tablename__ = "dq_schema_fingerprints"
+    __table_args__ = (UniqueConstraint("connection_key", "table_name"),)
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    connection_key = Column(String, nullable=False)
+    table_name = Column(String, nullable=False)
+    # SHA-256 of the canonical schema below
+    fingerprint = Column(String(64), nullable=False)
+    # {"columns": [[name, type, nullable], ...], "primary_key", "foreign_keys", "unique"}
+    schema = Column(JSON, nullable=False)
+    # Epoch seconds
+    recorded_at = Column(Float, nullable=False)
+
+
+class DQResultMemo(Base):
+    """Latest DQ output per (connection, table, rule set), reused within the freshness window."""
+    __tablename__ = "dq_result_memo"
+    __table_args__ = (UniqueConstraint("connection_key", "table_name", "ruleset"),)
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    connection_key = Column(String, nullable=False)
+    table_name = Column(String, nullable=False)
+    # rule_name values plus run mode, e.g. "null_check,duplicate_check,...|sample@0.01"
+    ruleset = Column(String, nullable=False)
+    result = Column(JSON, nullable=False)
+    # Epoch seconds
+    computed_at = Column(Float, nullable=False)
+    duration_seconds = Column(Float)
+
+
+class DQColumnSketch(Base):
+    """Serialized profiling sketches per column; partitions of one column merge (app.dq.sketches)."""
+    __tablename__ = "dq_column_sketches"
+    __table_args__ = (UniqueConstraint("connection_key", "table_name", "column_name", "partition_key"),)
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    connection_key = Column(String, nullable=False)
+    table_name = Column(String, nullable=False)
+    column_name = Column(String, nullable=False)
+    # "" for the whole table; otherwise e.g. a date range or warehouse partition
+    partition_key = Column(String, nullable=False, default="")
+    kind = Column(String, nullable=False)
+    rows = Column(BigInteger, default=0)
+    sketch = Column(LargeBinary, nullable=False)
+    runs = Column(Integer, default=0)
+    # Epoch seconds
+    updated_at = Column(Float, nullable=False)
+
+
+class DQMetricPoint(Base):
+    """One metric value from one DQ run: the history anomaly scores are computed against."""
+    __tablename__ = "dq_metric_points"
+    __table_args__ = (Index("ix_dq_metric_points_table", "connection_key", "table_name", "recorded_at"),)
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    connection_key = Column(String, nullable=False)
+    table_name = Column(String, nullable=False)
+    # "" for table-level metrics such as row_count
+    column_name = Column(String, nullable=False, default="")
+    metric = Column(String, nullable=False)
+    value = Column(Float, nullable=False)
+    # Epoch seconds
+    recorded_at = Column(Float, nullable=False)
+
+
+class DQRuleCost(Base):
+    """Learned cost of one check unit on one table: moving averages of observed runs."""
+    __tablename__ = "dq_rule_costs"
+    __table_args__ = (UniqueConstraint("connection_key", "table_name", "unit"),)
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    connection_key = Column(String, nullable=False)
+    table_name = Column(String, nullable=False)
+    # "scan" for the fused scan rules, otherwise a rule name
+    unit = Column(String, nullable=False)
+    avg_seconds = Column(Float, nullable=False)
+    # Warehouse rows read per run (0 for catalog-only rules)
+    avg_rows = Column(Float, nullable=False, default=0.0)
+    runs = Column(Integer, nullable=False, default=0)
+    # Epoch seconds
+    updated_at = Column(Float, nullable=False)
+
+
+class DQScheduleState(Base):
+    """When the DQ scheduler last ran a check unit on a table, and how often it found problems."""
+    __tablename__ = "dq_schedule_state"
+    __table_args__ = (UniqueConstraint("connection_key", "table_name", "unit"),)
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    connection_key = Column(String, nullable=False)
+    table_name = Column(String, nullable=False)
+    unit = Column(String, nullable=False)
+    # Epoch seconds
+    last_run_at = Column(Float, nullable=False)
+    last_status = Column(String)
+    runs = Column(Integer, nullable=False, default=0)
+    # Moving average of "the run warned or failed" (0..1)
+    anomaly_rate = Column(Float, nullable=False, default=0.0)
+    last_error = Column(Text)
+
+
+class IntentExample(Base):
+    """Question → intent pairs used to train the local intent classifier."""
+    __tablename__ = "intent_examples"
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    question = Column(Text, nullable=False)
+    intent = Column(String, nullable=False)
+    source = Column(String, default="llm")
+
+
+class LLMCacheEntry(Base):
+    """Persistent LLM responses keyed by normalized prompt, model and temperature."""
+    __tablename__ = "llm_cache"
+
+    key = Column(String(64), primary_key=True)
+    model = Column(String, nullable=False)
+    temperature = Column(Float)
+    response = Column(Text, nullable=False)
+    hits = Column(Integer, default=0)
+    # Epoch seconds, so TTL and LRU pruning are plain numeric comparisons
+    created_at = Column(Float, nullable=False, index=True)
+    last_used_at = Column(Float, nullable=False, index=True)
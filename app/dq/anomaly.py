@@ -0,0 +1,293 @@
+# app/dq/anomaly.py
+"""
+DQ metrics history and anomaly scoring.
+
+Every DQ run records its metrics (row count, null fractions, duplicate
+rate, profile means and distinct counts; see BaseRule.metrics) as points
+in dq_metric_points. A new value is scored against the series' recent
+history, for all series at once as NumPy arrays:
+- z-score against the mean and standard deviation,
+- robust score against the median and MAD,
+- day-of-week score: the robust score against the same weekday only,
+  used instead of the plain robust score once enough same-day points
+  exist, so weekly cycles do not raise alerts.
+|score| ≥ ANOMALY_WARN_SCORE warns, ≥ ANOMALY_FAIL_SCORE fails.
+
+Values measured differently never share a series: sample-mode metrics
+are recorded as "<metric>@sample", and rules tag estimator-dependent
+metrics themselves (e.g. "distinct_estimate@hll").
+"""
+import time
+import warnings
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.db_connection import SessionLocal
+from app.core.settings import settings
+from app.db.models import DQMetricPoint
+
+# (table, column, metric); column is "" for table-level metrics.
+SeriesKey = Tuple[str, str, str]
+
+# Same-weekday points needed before the day-of-week baseline is used.
+MIN_SEASONAL_POINTS = 3
+# MAD of a normal distribution is 0.6745 sigma.
+_MAD_TO_SIGMA = 1.4826
+# Lower bound on the spread, so flat series do not alert on tiny moves:
+# a change has to exceed 1% of the baseline (or 0.001 absolute).
+_RELATIVE_FLOOR = 0.01
+_ABSOLUTE_FLOOR = 1e-3
+
+STATUS_ORDER = {"pass": 0, "warn": 1, "fail": 2}
+
+
+def _weekday(epoch_seconds: np.ndarray) -> np.ndarray:
+    """UTC weekday, Monday = 0 (1970-01-01 was a Thursday)."""
+    days = np.asarray(epoch_seconds).astype(np.int64) // 86400
+    return ((days + 3) % 7).astype(np.int8)
+
+
+# ----------------------------------------------------------------------
+# Scoring kernel
+# ----------------------------------------------------------------------
+def _nanmedian(values: np.ndarray) -> np.ndarray:
+    """Row medians ignoring NaN: one sort, unlike np.nanmedian's per-row path."""
+    ordered = np.sort(values, axis=1)  # NaN sorts last
+    n = np.count_nonzero(~np.isnan(values), axis=1)
+    low = np.take_along_axis(ordered, np.maximum((n - 1) // 2, 0)[:, None], axis=1)[:, 0]
+    high = np.take_along_axis(ordered, (n // 2)[:, None], axis=1)[:, 0]
+    return np.where(n > 0, (low + high) / 2, np.nan)
+
+
+def score_series(
+    current: np.ndarray,
+    current_weekday: np.ndarray,
+    history: np.ndarray,
+    history_weekday: np.ndarray,
+) -> Dict[str, np.ndarray]:
+    """
+    Score K new values against their histories. `history` is K×W, NaN
+    where a series has fewer than W points; `history_weekday` matches it.
+    """
+    with warnings.catch_warnings(), np.errstate(divide="ignore", invalid="ignore"):
+        # All-NaN rows (no history) are expected and give NaN.
+        warnings.simplefilter("ignore", RuntimeWarning)
+
+        points = np.count_nonzero(~np.isnan(history), axis=1)
+        mean = np.nanmean(history, axis=1)
+        std = np.nanstd(history, axis=1)
+        median = _nanmedian(history)
+        mad = _nanmedian(np.abs(history - median[:, None])) * _MAD_TO_SIGMA
+
+        same_day = np.where(history_weekday == current_weekday[:, None], history, np.nan)
+        day_points = np.count_nonzero(~np.isnan(same_day), axis=1)
+        day_median = _nanmedian(same_day)
+        day_mad = _nanmedian(np.abs(same_day - day_median[:, None])) * _MAD_TO_SIGMA
+
+        floor = np.maximum(_RELATIVE_FLOOR * np.abs(median), _ABSOLUTE_FLOOR)
+        day_floor = np.maximum(_RELATIVE_FLOOR * np.abs(day_median), _ABSOLUTE_FLOOR)
+        z = (current - mean) / np.maximum(std, floor)
+        robust = (current - median) / np.maximum(mad, floor)
+        seasonal = (current - day_median) / np.maximum(day_mad, day_floor)
+
+        use_seasonal = day_points >= MIN_SEASONAL_POINTS
+        score = np.where(use_seasonal, seasonal, robust)
+        baseline = np.where(use_seasonal, day_median, median)
+
+    magnitude = np.abs(np.nan_to_num(score))
+    status = np.where(magnitude >= settings.ANOMALY_FAIL_SCORE, "fail", "pass")
+    status = np.where((status == "pass") & (magnitude >= settings.ANOMALY_WARN_SCORE), "warn", status)
+    status = np.where(points >= settings.ANOMALY_MIN_HISTORY, status, "pass")
+
+    return {
+        "score": score,
+        "z_score": z,
+        "mad_score": robust,
+        "seasonal_score": np.where(use_seasonal, seasonal, np.nan),
+        "baseline": baseline,
+        "history_points": points,
+        "status": status,
+    }
+
+
+def _history_matrix(
+    series: np.ndarray, times: np.ndarray, values: np.ndarray, n_series: int, width: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Last `width` points of each series, right-aligned. Points must come in
+    time order; a stable sort by series keeps it.
+    """
+    order = np.argsort(series, kind="stable")
+    series, times, values = series[order], times[order], values[order]
+
+    counts = np.bincount(series, minlength=n_series)
+    starts = np.cumsum(counts) - counts
+    column = np.arange(series.size) - starts[series] - (counts[series] - width)
+    keep = column >= 0
+
+    history = np.full((n_series, width), np.nan)
+    weekdays = np.full((n_series, width), -1, dtype=np.int8)
+    history[series[keep], column[keep]] = values[keep]
+    weekdays[series[keep], column[keep]] = _weekday(times[keep])
+    return history, weekdays
+
+
+# ----------------------------------------------------------------------
+# Store
+# ----------------------------------------------------------------------
+def _load_points(connection_key: str, tables: Optional[Iterable[str]]) -> List[Tuple]:
+    since = time.time() - settings.DQ_METRICS_RETENTION_DAYS * 86400
+    db = SessionLocal()
+    try:
+        query = db.query(
+            DQMetricPoint.table_name,
+            DQMetricPoint.column_name,
+            DQMetricPoint.metric,
+            DQMetricPoint.recorded_at,
+            DQMetricPoint.value,
+        ).filter(DQMetricPoint.connection_key == connection_key, DQMetricPoint.recorded_at >= since)
+        if tables is not None:
+            query = query.filter(DQMetricPoint.table_name.in_(list(tables)))
+        return query.order_by(DQMetricPoint.recorded_at).all()
+    finally:
+        db.close()
+
+
+def _index_points(rows: Sequence[Tuple], keys: Dict[SeriesKey, int]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Points as (series index, time, value) arrays; series missing from `keys` are added."""
+    series = np.empty(len(rows), dtype=np.int64)
+    for i, (table, column, metric, _, _) in enumerate(rows):
+        series[i] = keys.setdefault((table, column, metric), len(keys))
+    times = np.fromiter((r[3] for r in rows), dtype=np.float64, count=len(rows))
+    values = np.fromiter((r[4] for r in rows), dtype=np.float64, count=len(rows))
+    return series, times, values
+
+
+def record_metrics(connection_key: str, points: Dict[SeriesKey, float], recorded_at: float) -> None:
+    """Append one run's metrics and drop points past the retention window."""
+    if not points:
+        return
+    tables = {table for table, _, _ in points}
+    cutoff = recorded_at - settings.DQ_METRICS_RETENTION_DAYS * 86400
+    db = SessionLocal()
+    try:
+        db.add_all([
+            DQMetricPoint(
+                connection_key=connection_key,
+                table_name=table,
+                column_name=column,
+                metric=metric,
+                value=float(value),
+                recorded_at=recorded_at,
+            )
+            for (table, column, metric), value in points.items()
+        ])
+        db.query(DQMetricPoint).filter(
+            DQMetricPoint.connection_key == connection_key,
+            DQMetricPoint.table_name.in_(tables),
+            DQMetricPoint.recorded_at < cutoff,
+        ).delete(synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+def _scored(keys: List[SeriesKey], values: np.ndarray, scores: Dict[str, np.ndarray]) -> List[Dict]:
+    out = []
+    for i, (table, column, metric) in enumerate(keys):
+        out.append({
+            "table": table,
+            "column": column or None,
+            "metric": metric,
+            "value": float(values[i]),
+            "baseline": _finite(scores["baseline"][i]),
+            "score": _finite(scores["score"][i]),
+            "z_score": _finite(scores["z_score"][i]),
+            "mad_score": _finite(scores["mad_score"][i]),
+            "seasonal_score": _finite(scores["seasonal_score"][i]),
+            "history_points": int(scores["history_points"][i]),
+            "status": str(scores["status"][i]),
+        })
+    return out
+
+
+def _finite(value: float) -> Optional[float]:
+    return round(float(value), 4) if np.isfinite(value) else None
+
+
+# ----------------------------------------------------------------------
+# Entry points
+# ----------------------------------------------------------------------
+def score_metrics(connection_key: str, points: Dict[SeriesKey, float], now: Optional[float] = None) -> List[Dict]:
+    """Score new values against their stored histories (one query, one vectorized pass)."""
+    if not points:
+        return []
+    now = time.time() if now is None else now
+    keys: Dict[SeriesKey, int] = {key: i for i, key in enumerate(points)}
+    rows = _load_points(connection_key, {table for table, _, _ in points})
+    series, times, values = _index_points(rows, keys)
+    # Drop history of series this run did not produce.
+    known = series < len(points)
+    history, weekdays = _history_matrix(
+        series[known], times[known], values[known], len(points), settings.ANOMALY_HISTORY_POINTS
+    )
+
+    current = np.fromiter(points.values(), dtype=np.float64, count=len(points))
+    current_weekday = np.full(len(points), _weekday(np.array([now]))[0], dtype=np.int8)
+    scores = score_series(current, current_weekday, history, weekdays)
+    return _scored(list(points), current, scores)
+
+
+def score_latest(connection_key: str, tables: Optional[Iterable[str]] = None) -> List[Dict]:
+    """
+    Re-score the latest recorded value of every series (optionally only
+    for some tables) against the points before it: a fleet-wide anomaly
+    view without touching the warehouse.
+    """
+    keys: Dict[SeriesKey, int] = {}
+    series, times, values = _index_points(_load_points(connection_key, tables), keys)
+    if not keys:
+        return []
+    width = settings.ANOMALY_HISTORY_POINTS + 1
+    matrix, weekdays = _history_matrix(series, times, values, len(keys), width)
+
+    # Series are right-aligned, so the last column is each one's newest point.
+    scores = score_series(matrix[:, -1], weekdays[:, -1], matrix[:, :-1], weekdays[:, :-1])
+    return _scored(list(keys), matrix[:, -1], scores)
+
+
+def apply_anomaly_scores(connection_key: str, output: Dict, rules: Iterable, mode: str = "exact") -> None:
+    """
+    Score a run_dq_for_table output in place: each rule's status becomes
+    the worst of its metrics (pass/warn/fail) and flagged metrics are
+    listed under details["anomalies"]. The run's metrics are then
+    recorded as new history. Sample-mode estimates get series of their
+    own; exact and incremental runs share one.
+    """
+    suffix = "@sample" if mode == "sample" else ""
+    table = output["table"]
+    by_name = {rule.rule_name: rule for rule in rules}
+    points: Dict[SeriesKey, float] = {}
+    owners: Dict[SeriesKey, Dict] = {}
+    for result in output["results"]:
+        rule = by_name.get(result["rule"])
+        if rule is None or result["status"] not in STATUS_ORDER:
+            continue
+        for (column, metric), value in rule.metrics(result["details"]).items():
+            if value is None or not np.isfinite(value):
+                continue
+            key = (table, column, metric + suffix)
+            points[key] = float(value)
+            owners[key] = result
+
+    now = time.time()
+    for scored in score_metrics(connection_key, points, now):
+        if scored["status"] == "pass":
+            continue
+        result = owners[(table, scored["column"] or "", scored["metric"])]
+        result["details"].setdefault("anomalies", []).append(scored)
+        if STATUS_ORDER[scored["status"]] > STATUS_ORDER[result["status"]]:
+            result["status"] = scored["status"]
+
+    record_metrics(connection_key, points, now)
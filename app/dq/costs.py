@@ -0,0 +1,78 @@
+# app/dq/costs.py
+"""
+Learned check costs: every DQ run reports how long each check unit took
+and roughly how many warehouse rows it read, and the averages are kept
+per (connection, table, unit) in dq_rule_costs. A unit is the fused scan
+("scan": every ScanRule in one query) or a single non-scan rule. The
+scheduler (app/dq/scheduler.py) budgets with these numbers.
+"""
+import time
+from typing import Dict, Iterable, Optional, Tuple
+
+from app.core.db_connection import SessionLocal
+from app.db.models import DQRuleCost
+
+SCAN_UNIT = "scan"
+
+# Weight of the newest observation in the moving averages.
+COST_EWMA_ALPHA = 0.3
+
+
+def record_rule_costs(
+    connection_key: str,
+    table: str,
+    seconds: Dict[str, float],
+    rows: Dict[str, Optional[float]],
+) -> None:
+    """Fold one run's per-unit durations (and rows read, where known) into the averages."""
+    if not seconds:
+        return
+    now = time.time()
+    db = SessionLocal()
+    try:
+        stored = {
+            row.unit: row
+            for row in db.query(DQRuleCost).filter(
+                DQRuleCost.connection_key == connection_key,
+                DQRuleCost.table_name == table,
+                DQRuleCost.unit.in_(list(seconds)),
+            )
+        }
+        for unit, duration in seconds.items():
+            read = rows.get(unit)
+            row = stored.get(unit)
+            if row is None:
+                row = DQRuleCost(
+                    connection_key=connection_key,
+                    table_name=table,
+                    unit=unit,
+                    avg_seconds=duration,
+                    avg_rows=float(read or 0),
+                    runs=0,
+                )
+                db.add(row)
+            else:
+                row.avg_seconds += COST_EWMA_ALPHA * (duration - row.avg_seconds)
+                if read is not None:
+                    row.avg_rows += COST_EWMA_ALPHA * (read - row.avg_rows)
+            row.runs += 1
+            row.updated_at = now
+        db.commit()
+    finally:
+        db.close()
+
+
+def load_rule_costs(
+    connection_key: str, tables: Optional[Iterable[str]] = None
+) -> Dict[Tuple[str, str], Tuple[float, float]]:
+    """(table, unit) → (avg_seconds, avg_rows) for every unit with observed runs."""
+    db = SessionLocal()
+    try:
+        query = db.query(
+            DQRuleCost.table_name, DQRuleCost.unit, DQRuleCost.avg_seconds, DQRuleCost.avg_rows
+        ).filter(DQRuleCost.connection_key == connection_key)
+        if tables is not None:
+            query = query.filter(DQRuleCost.table_name.in_(list(tables)))
+        return {(table, unit): (seconds, rows) for table, unit, seconds, rows in query}
+    finally:
+        db.close()
@@ -0,0 +1,212 @@
+import re
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import text
+
+from app.core.db_connection import SessionLocal
+from app.db.models import DQTableConfig, DQWatermark
+from app.dq.memo import invalidate_dq_results
+from app.dq.profiling import WATERMARK_PARTITION, invalidate_sketches
+from app.dq.table_config import get_or_create_table_config, get_table_config
+
+
+WATERMARK_KINDS = ("timestamp", "identity", "rowversion")
+
+# Insert-time columns are the safe choice for append-only tables;
+# update-time columns are used only when nothing better exists.
+_INSERT_TIME_NAMES = re.compile(r"(inserted|loaded|ingested|created|load)_?(at|ts|time|date|datetime)?$", re.I)
+_ANY_TIME_NAMES = re.compile(r"(_at|_ts|_time|timestamp|date)$", re.I)
+
+
+# ----------------------------------------------------------------------
+# Watermark detection / configuration
+# ----------------------------------------------------------------------
+def _column_kind(column: Dict, dialect: str) -> Optional[str]:
+    col_type = str(column.get("type", "")).lower()
+    if dialect == "mssql" and col_type in ("timestamp", "rowversion"):
+        # On SQL Server `timestamp` is the rowversion type.
+        return "rowversion"
+    if col_type.startswith(("timestamp", "datetime", "date", "smalldatetime")):
+        return "timestamp"
+    return None
+
+
+def detect_watermark(client, table: str) -> Optional[Tuple[str, str]]:
+    """Pick a watermark column from the catalog: rowversion, identity, then insert-time columns."""
+    columns = client.get_columns(table)
+    dialect = client.dialect
+
+    for col in columns:
+        if _column_kind(col, dialect) == "rowversion":
+            return col["name"], "rowversion"
+    for col in columns:
+        if col.get("identity"):
+            return col["name"], "identity"
+    for pattern in (_INSERT_TIME_NAMES, _ANY_TIME_NAMES):
+        for col in columns:
+            if _column_kind(col, dialect) == "timestamp" and pattern.search(col["name"]):
+                return col["name"], "timestamp"
+    return None
+
+
+def configure_watermark(db, client, table: str, column: str, kind: str) -> DQTableConfig:
+    if kind not in WATERMARK_KINDS:
+        raise ValueError(f"Unknown watermark kind: {kind}")
+    if column not in {c["name"] for c in client.get_columns(table)}:
+        raise ValueError(f"Column '{column}' not found in table '{table}'")
+
+    config = get_or_create_table_config(db, client.connection_key, table)
+    config.watermark_column = column
+    config.watermark_kind = kind
+    # A different watermark invalidates the running aggregates.
+    reset_watermark(db, client.connection_key, table)
+    db.commit()
+    return config
+
+
+def reset_watermark(db, connection_key: str, table: str) -> None:
+    db.query(DQWatermark).filter(
+        DQWatermark.connection_key == connection_key,
+        DQWatermark.table_name == table,
+    ).delete(synchronize_session=False)
+    invalidate_dq_results(db, connection_key, table)
+    invalidate_sketches(db, connection_key, table, WATERMARK_PARTITION)
+
+
+# ----------------------------------------------------------------------
+# Watermark values: stored as strings, bound in their native type
+# ----------------------------------------------------------------------
+def _encode(value: Any, kind: str) -> Optional[str]:
+    if value is None:
+        return None
+    if kind == "rowversion":
+        return bytes(value).hex()
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+
+def _decode(value: Optional[str], kind: str) -> Any:
+    if value is None:
+        return None
+    if kind == "rowversion":
+        return bytes.fromhex(value)
+    if kind == "identity":
+        return int(value)
+    return datetime.fromisoformat(value)
+
+
+# ----------------------------------------------------------------------
+# Incremental window
+# ----------------------------------------------------------------------
+@dataclass
+class WatermarkWindow:
+    """Rows with low < watermark <= high are new since the last run."""
+    table: str
+    column: str
+    kind: str
+    low: Optional[str]
+    high: Optional[str]
+    state: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def has_new_rows(self) -> bool:
+        return self.high is not None and self.high != self.low
+
+    def where(self, client) -> Tuple[str, Dict]:
+        col = client.quote_identifier(self.column)
+        params = {"wm_high": _decode(self.high, self.kind)}
+        if self.low is None:
+            return f"{col} <= :wm_high", params
+        params["wm_low"] = _decode(self.low, self.kind)
+        return f"{col} > :wm_low AND {col} <= :wm_high", params
+
+    def describe(self, new_rows: int) -> Dict[str, Any]:
+        return {
+            "watermark_column": self.column,
+            "watermark_kind": self.kind,
+            "from": self.low,
+            "to": self.high if self.has_new_rows else self.low,
+            "new_rows": new_rows,
+            "first_run": self.low is None,
+        }
+
+
+def open_window(client, table: str) -> WatermarkWindow:
+    """
+    Resolve the table's watermark column and read its current maximum
+    (a single index-friendly MAX), giving the window of unscanned rows.
+    """
+    db = SessionLocal()
+    try:
+        config = get_table_config(db, client.connection_key, table)
+        if config is not None and config.watermark_column:
+            column, kind = config.watermark_column, config.watermark_kind
+        else:
+            detected = detect_watermark(client, table)
+            if detected is None:
+                raise ValueError(
+                    f"No watermark column for '{table}'. Configure one with "
+                    f"PUT /run/dq/{table}/watermark."
+                )
+            column, kind = detected
+
+        stored = (
+            db.query(DQWatermark)
+            .filter(DQWatermark.connection_key == client.connection_key, DQWatermark.table_name == table)
+            .first()
+        )
+        if stored is not None and stored.watermark_column != column:
+            stored = None
+
+        state = {}
+        low = None
+        if stored is not None:
+            low = stored.last_value
+            state = {"row_count": stored.row_count or 0, "aggregates": stored.aggregates or {}}
+    finally:
+        db.close()
+
+    query = text(f"SELECT MAX({client.quote_identifier(column)}) FROM {client.quote_table(table)}")
+    with client.connect() as conn:
+        high = _encode(conn.execute(query).scalar(), kind)
+
+    return WatermarkWindow(table=table, column=column, kind=kind, low=low, high=high, state=state)
+
+
+def merge_and_store(client, window: WatermarkWindow, rules, row_count: int, values: Dict[str, Dict]):
+    """
+    Fold the new rows' aggregates into the stored running aggregates and
+    advance the watermark. Returns (total_row_count, merged_values).
+    """
+    stored_aggregates = window.state.get("aggregates", {})
+    merged = {
+        rule.rule_name: rule.merge_values(stored_aggregates.get(rule.rule_name, {}), values.get(rule.rule_name, {}))
+        for rule in rules
+    }
+    total_rows = window.state.get("row_count", 0) + row_count
+
+    db = SessionLocal()
+    try:
+        stored = (
+            db.query(DQWatermark)
+            .filter(DQWatermark.connection_key == client.connection_key, DQWatermark.table_name == window.table)
+            .first()
+        )
+        if stored is None:
+            stored = DQWatermark(connection_key=client.connection_key, table_name=window.table, runs=0)
+            db.add(stored)
+        stored.watermark_column = window.column
+        stored.watermark_kind = window.kind
+        if window.has_new_rows:
+            stored.last_value = window.high
+        stored.row_count = total_rows
+        stored.aggregates = merged
+        stored.runs = (stored.runs or 0) + 1
+        db.commit()
+    finally:
+        db.close()
+
+    return total_rows, merged
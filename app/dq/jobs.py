@@ -0,0 +1,254 @@
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from app.core.db_connection import SessionLocal
+from app.core.settings import settings
+from app.db.models import DQJob, DQJobResult
+from app.dq.runner import RUN_MODES, run_dq_for_table
+from app.warehouse.cancel import CancelScope, use_cancel_scope
+from app.warehouse.client import WarehouseClient
+
+
+# Jobs that cancel() may still move to "cancelling".
+_ACTIVE_STATUSES = ("queued", "running")
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _jsonable(output: Dict) -> Dict:
+    return json.loads(json.dumps(output, default=str))
+
+
+class DQJobManager:
+    """
+    Runs DQ over many tables in the background. Job state and per-table
+    results live in the internal DB (dq_jobs / dq_job_results); the
+    manager only keeps what it needs to run and cancel in-flight jobs.
+    """
+
+    def __init__(self, max_workers: int):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="dq-job")
+        self._lock = threading.Lock()
+        self._scopes: Dict[str, CancelScope] = {}
+        self._remaining: Dict[str, int] = {}
+
+    # ------------------------------------------------------------------
+    # Submit
+    # ------------------------------------------------------------------
+    def submit(
+        self,
+        db,
+        tables: Optional[List[str]] = None,
+        mode: str = "exact",
+        target_error: Optional[float] = None,
+        connection: Optional[str] = None,
+    ) -> DQJob:
+        if mode not in RUN_MODES:
+            raise ValueError(f"Unknown DQ run mode: {mode}")
+
+        client = WarehouseClient(db, connection)
+        tables = tables or client.list_tables()
+
+        job = DQJob(
+            status="queued" if tables else "completed",
+            mode=mode,
+            target_error=target_error,
+            connection=connection,
+            tables=tables,
+            total_tables=len(tables),
+            completed_tables=0,
+            failed_tables=0,
+        )
+        if not tables:
+            job.finished_at = _now()
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+
+        if tables:
+            scope = CancelScope()
+            with self._lock:
+                self._scopes[job.id] = scope
+                self._remaining[job.id] = len(tables)
+            options = {"mode": mode, "target_error": target_error}
+            for table in tables:
+                self._executor.submit(self._run_table, job.id, table, options, scope, client)
+        return job
+
+    # ------------------------------------------------------------------
+    # Worker
+    # ------------------------------------------------------------------
+    def _run_table(self, job_id: str, table: str, options: Dict, scope: CancelScope, client) -> None:
+        db = SessionLocal()
+        try:
+            self._mark_running(db, job_id)
+            started = _now()
+
+            if scope.cancelled:
+                status, output = "cancelled", None
+            else:
+                try:
+                    with use_cancel_scope(scope):
+                        output = run_dq_for_table(db, table, client=client, **options)
+                    status = "failed" if output.get("error") else "completed"
+                except Exception as e:
+                    output = {"table": table, "error": str(e), "results": []}
+                    status = "failed"
+                if scope.cancelled:
+                    status = "cancelled"
+
+            db.add(DQJobResult(
+                job_id=job_id,
+                table_name=table,
+                status=status,
+                result=_jsonable(output) if output is not None else None,
+                started_at=started,
+                finished_at=_now(),
+            ))
+            counters = {DQJob.completed_tables: DQJob.completed_tables + 1}
+            if status == "failed":
+                counters[DQJob.failed_tables] = DQJob.failed_tables + 1
+            db.query(DQJob).filter(DQJob.id == job_id).update(counters, synchronize_session=False)
+            db.commit()
+        finally:
+            self._table_done(db, job_id)
+            db.close()
+
+    def _mark_running(self, db, job_id: str) -> None:
+        (
+            db.query(DQJob)
+            .filter(DQJob.id == job_id, DQJob.status == "queued")
+            .update({DQJob.status: "running", DQJob.started_at: _now()}, synchronize_session=False)
+        )
+        # Commit even when nothing matched: the UPDATE opened a write
+        # transaction that would otherwise stay open for the whole scan.
+        db.commit()
+
+    def _table_done(self, db, job_id: str) -> None:
+        with self._lock:
+            self._remaining[job_id] -= 1
+            if self._remaining[job_id] > 0:
+                return
+            del self._remaining[job_id]
+            scope = self._scopes.pop(job_id)
+
+        job = db.get(DQJob, job_id)
+        if job is None:
+            return
+        if scope.cancelled:
+            status = "cancelled"
+        elif job.total_tables and job.failed_tables == job.total_tables:
+            status = "failed"
+        else:
+            status = "completed"
+        # Conditional like cancel(): a finished job is never rewritten.
+        (
+            db.query(DQJob)
+            .filter(DQJob.id == job_id, DQJob.status.in_(_ACTIVE_STATUSES + ("cancelling",)))
+            .update({DQJob.status: status, DQJob.finished_at: _now()}, synchronize_session=False)
+        )
+        db.commit()
+
+    # ------------------------------------------------------------------
+    # Cancel / inspect
+    # ------------------------------------------------------------------
+    def cancel(self, db, job_id: str) -> Optional[DQJob]:
+        job = db.get(DQJob, job_id)
+        if job is None:
+            return None
+
+        # Under the lock _table_done cannot pop the scope and finish the job
+        # in between; the conditional update never reopens a finished job.
+        with self._lock:
+            scope = self._scopes.get(job_id)
+            if scope is not None:
+                # Stops queued tables and aborts statements already running.
+                scope.cancel()
+                (
+                    db.query(DQJob)
+                    .filter(DQJob.id == job_id, DQJob.status.in_(_ACTIVE_STATUSES))
+                    .update({DQJob.status: "cancelling"}, synchronize_session=False)
+                )
+                db.commit()
+        db.refresh(job)
+        return job
+
+    def get(self, db, job_id: str, include_results: bool = True) -> Optional[Dict]:
+        job = db.get(DQJob, job_id)
+        if job is None:
+            return None
+
+        rows = (
+            db.query(DQJobResult)
+            .filter(DQJobResult.job_id == job_id)
+            .order_by(DQJobResult.finished_at)
+            .all()
+        )
+        finished = {r.table_name for r in rows}
+
+        return {
+            "job_id": job.id,
+            "status": job.status,
+            "mode": job.mode,
+            "connection": job.connection,
+            "created_at": job.created_at,
+            "started_at": job.started_at,
+            "finished_at": job.finished_at,
+            "progress": {
+                "total": job.total_tables,
+                "completed": job.completed_tables,
+                "failed": job.failed_tables,
+                "pending": [t for t in (job.tables or []) if t not in finished],
+            },
+            "tables": [
+                {
+                    "table": r.table_name,
+                    "status": r.status,
+                    "started_at": r.started_at,
+                    "finished_at": r.finished_at,
+                    **({"result": r.result} if include_results else {}),
+                }
+                for r in rows
+            ],
+        }
+
+    def list_jobs(self, db, limit: int = 50) -> List[Dict]:
+        jobs = db.query(DQJob).order_by(DQJob.created_at.desc()).limit(limit).all()
+        return [
+            {
+                "job_id": j.id,
+                "status": j.status,
+                "mode": j.mode,
+                "connection": j.connection,
+                "created_at": j.created_at,
+                "total_tables": j.total_tables,
+                "completed_tables": j.completed_tables,
+                "failed_tables": j.failed_tables,
+            }
+            for j in jobs
+        ]
+
+
+def recover_interrupted_jobs() -> None:
+    """Jobs left queued/running by a previous process can never finish."""
+    db = SessionLocal()
+    try:
+        (
+            db.query(DQJob)
+            .filter(DQJob.status.in_(("queued", "running", "cancelling")))
+            .update(
+                {DQJob.status: "failed", DQJob.error: "Interrupted by server restart", DQJob.finished_at: _now()},
+                synchronize_session=False,
+            )
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+job_manager = DQJobManager(max_workers=settings.DQ_JOB_WORKERS)
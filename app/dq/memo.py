@@ -0,0 +1,151 @@
+# app/dq/memo.py
+"""
+DQ result memoization: the latest output per (connection, table, rule
+set) is kept in the internal DB, and agents reuse it while it is younger
+than the freshness window instead of rescanning the table.
+"""
+import json
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional
+
+from app.core.db_connection import SessionLocal
+from app.core.settings import settings
+from app.db.models import DQResultMemo
+
+
+def ruleset_key(rules: Iterable, mode: str = "exact", target_error: Optional[float] = None) -> str:
+    names = ",".join(rule.rule_name for rule in rules)
+    suffix = f"{mode}@{target_error}" if mode == "sample" and target_error else mode
+    return f"{names}|{suffix}"
+
+
+def _lookup(connection_key: str, table: str, ruleset: str) -> Optional[DQResultMemo]:
+    db = SessionLocal()
+    try:
+        memo = (
+            db.query(DQResultMemo)
+            .filter(
+                DQResultMemo.connection_key == connection_key,
+                DQResultMemo.table_name == table,
+                DQResultMemo.ruleset == ruleset,
+            )
+            .first()
+        )
+        if memo is not None:
+            db.expunge(memo)
+        return memo
+    finally:
+        db.close()
+
+
+def _store(connection_key: str, table: str, ruleset: str, output: Dict, computed_at: float, duration: float) -> None:
+    db = SessionLocal()
+    try:
+        memo = (
+            db.query(DQResultMemo)
+            .filter(
+                DQResultMemo.connection_key == connection_key,
+                DQResultMemo.table_name == table,
+                DQResultMemo.ruleset == ruleset,
+            )
+            .first()
+        )
+        if memo is None:
+            memo = DQResultMemo(connection_key=connection_key, table_name=table, ruleset=ruleset)
+            db.add(memo)
+        memo.result = json.loads(json.dumps(output, default=str))
+        memo.computed_at = computed_at
+        memo.duration_seconds = duration
+        db.commit()
+    finally:
+        db.close()
+
+
+def invalidate_dq_results(db, connection_key: str, table: Optional[str] = None) -> int:
+    """Forget memoized results for one table (or the whole connection). The caller commits."""
+    query = db.query(DQResultMemo).filter(DQResultMemo.connection_key == connection_key)
+    if table is not None:
+        query = query.filter(DQResultMemo.table_name == table)
+    return query.delete(synchronize_session=False)
+
+
+def _cache_info(hit: bool, computed_at: float, now: float) -> Dict:
+    return {
+        "hit": hit,
+        "age_seconds": round(now - computed_at, 1),
+        "computed_at": datetime.fromtimestamp(computed_at, tz=timezone.utc).isoformat(),
+    }
+
+
+def _cacheable(output: Dict) -> bool:
+    return not output.get("error") and all(r.get("status") != "error" for r in output.get("results", []))
+
+
+# One scan per key at a time: a concurrent caller waits and reuses it.
+_key_locks: Dict[tuple, threading.Lock] = {}
+_key_locks_guard = threading.Lock()
+
+
+def run_dq_for_table_memo(
+    db,
+    table: str,
+    client,
+    mode: str = "exact",
+    target_error: Optional[float] = None,
+    max_age: Optional[float] = None,
+) -> Dict:
+    """
+    run_dq_for_table, reusing a stored output younger than `max_age`
+    seconds (DQ_RESULT_MAX_AGE_SECONDS by default). The output gains a
+    "cache" entry: {"hit", "age_seconds", "computed_at"}. max_age=0
+    always rescans (and refreshes the stored output). Outputs with rule
+    errors are never stored.
+    """
+    from app.dq.runner import ALL_RULES, run_dq_for_table
+
+    max_age = settings.DQ_RESULT_MAX_AGE_SECONDS if max_age is None else max_age
+    connection_key = client.connection_key
+    ruleset = ruleset_key(ALL_RULES, mode, target_error)
+    key = (connection_key, table, ruleset)
+
+    with _key_locks_guard:
+        lock = _key_locks.setdefault(key, threading.Lock())
+
+    with lock:
+        now = time.time()
+        if max_age > 0:
+            memo = _lookup(connection_key, table, ruleset)
+            if memo is not None and now - memo.computed_at <= max_age:
+                return {**memo.result, "cache": _cache_info(True, memo.computed_at, now)}
+
+        started = time.time()
+        output = run_dq_for_table(db, table, mode=mode, target_error=target_error, client=client)
+        finished = time.time()
+        if _cacheable(output):
+            _store(connection_key, table, ruleset, output, finished, finished - started)
+        return {**output, "cache": _cache_info(False, finished, finished)}
+
+
+def describe_cache(outputs: Dict[str, Dict]) -> List[str]:
+    """One line per table: `orders: cached, 4m12s old` / `orders: fresh scan`."""
+    lines = []
+    for table, output in outputs.items():
+        cache = output.get("cache") if isinstance(output, dict) else None
+        if not cache:
+            continue
+        if cache["hit"]:
+            age = int(cache["age_seconds"])
+            lines.append(f"{table}: cached, {age // 60}m{age % 60:02d}s old")
+        else:
+            lines.append(f"{table}: fresh scan")
+    return lines
+
+
+def without_cache(outputs: Dict[str, Dict]) -> Dict[str, Dict]:
+    """Outputs minus the cache entry, so prompts stay identical across reuse."""
+    return {
+        table: {k: v for k, v in output.items() if k != "cache"} if isinstance(output, dict) else output
+        for table, output in outputs.items()
+    }
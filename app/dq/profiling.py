@@ -0,0 +1,460 @@
+# app/dq/profiling.py
+"""
+Column profiling in one pass over the table:
+- cheap aggregates (non-null count, min, max, sum) ride along in the fused
+  DQ scan (see app.dq.runner.plan_table_scan),
+- distinct counts, quantiles and top values come from mergeable sketches
+  (app.dq.sketches) built over a streamed sample of at most
+  PROFILE_SAMPLE_ROWS rows.
+
+Sketches are stored per column in the internal DB. Incremental runs fold
+each window of new rows into the stored sketches instead of re-reading the
+table; any stored partitions of a column can be merged on demand.
+"""
+import random
+import re
+import time
+from datetime import date, datetime, time as dt_time
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import text
+
+from app.core.db_connection import SessionLocal
+from app.core.settings import settings
+from app.db.models import DQColumnSketch
+from app.dq.rules import DQResult, ScanContext, ScanRule, non_null_count_expr
+from app.dq.sampling import (
+    BLOCK_SAMPLING_OVERSAMPLE,
+    DEFAULT_CONFIDENCE_Z,
+    SampleSpec,
+    sample_details,
+    tablesample_clause,
+)
+from app.dq.sketches import ColumnSketch
+from app.warehouse.cancel import QueryCancelled, raise_if_cancelled
+
+# Partition keys: exact/sample runs replace the whole-table sketch,
+# incremental runs merge every watermark window into their own.
+FULL_PARTITION = ""
+WATERMARK_PARTITION = "watermark"
+
+
+# ----------------------------------------------------------------------
+# Which columns get profiled, and how
+# ----------------------------------------------------------------------
+_NUMERIC_TYPES = re.compile(
+    r"^(tiny|small|medium|big)?int|^integer|^decimal|^numeric|^number|^real|^float|^double"
+    r"|^(small)?money|^(small|big)?serial",
+    re.I,
+)
+_TEMPORAL_TYPES = re.compile(r"^(timestamp|datetime|smalldatetime|date)", re.I)
+# UUID / uniqueidentifier stay "other": neither backend has MIN/MAX for them.
+_TEXT_TYPES = re.compile(r"^(n?var)?char|^character|^n?text|^citext|^string", re.I)
+_MONEY_TYPES = re.compile(r"^(small)?money", re.I)
+# Values that cannot be sketched usefully (or fetched cheaply).
+_SKIPPED_TYPES = re.compile(r"^(bytea|blob|(var)?binary|image|geometry|geography|hierarchyid|sql_variant)", re.I)
+
+
+def profile_kind(column: Dict, dialect: str) -> Optional[str]:
+    """The ColumnSketch kind for a catalog column, or None to leave it out."""
+    col_type = str(column.get("type", "")).strip().lower()
+    if dialect == "mssql" and col_type in ("timestamp", "rowversion", "text", "ntext"):
+        # rowversion is binary; TEXT/NTEXT cannot be compared or sorted.
+        return None
+    if _SKIPPED_TYPES.match(col_type):
+        return None
+    if _NUMERIC_TYPES.match(col_type):
+        return "numeric"
+    if _TEMPORAL_TYPES.match(col_type):
+        return "temporal"
+    if _TEXT_TYPES.match(col_type):
+        return "text"
+    return "other"
+
+
+def profiled_columns(columns: Iterable[Dict], dialect: str) -> Dict[str, str]:
+    kinds = {}
+    for col in columns:
+        kind = profile_kind(col, dialect)
+        if kind is not None:
+            kinds[col["name"]] = kind
+    return kinds
+
+
+def _json_value(value: Any) -> Any:
+    """Aggregate values as they are stored in JSON (incremental state, memo)."""
+    if isinstance(value, (datetime, date, dt_time)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return bytes(value).hex()
+    return value
+
+
+# ----------------------------------------------------------------------
+# Distinct counts
+# ----------------------------------------------------------------------
+def estimate_distinct(sample_rows: int, distinct: int, singletons: int, total_rows: int) -> int:
+    """
+    Duj1 estimator (Haas et al.): scale the sample's distinct count by how
+    many values were seen exactly once. Exact when the sample is the table.
+    """
+    n, d, f1, big_n = sample_rows, distinct, singletons, total_rows
+    if n <= 0 or n >= big_n:
+        return d
+    denominator = n - f1 + f1 * n / big_n
+    if denominator <= 0:
+        return big_n
+    return min(big_n, round(n * d / denominator))
+
+
+def _sample_frequencies(sketch: ColumnSketch) -> Tuple[int, int]:
+    """(distinct values, values seen once) among the rows this sketch read."""
+    if not sketch.hashes:
+        return 0, 0
+    _, counts = np.unique(np.concatenate(sketch.hashes), return_counts=True)
+    sketch.hashes = []
+    return int(counts.size), int(np.count_nonzero(counts == 1))
+
+
+# ----------------------------------------------------------------------
+# Streaming the sample
+# ----------------------------------------------------------------------
+def _sketch_source(client, plan, rows: int, limit: int) -> Tuple[str, Dict[str, Any]]:
+    """FROM clause for the sketch pass, plus a description of how it samples."""
+    source = client.quote_table(plan.table)
+    sample = plan.sample
+    if sample is not None and not sample.is_full_scan:
+        # Sample mode: reuse the fused scan's TABLESAMPLE.
+        return f"{source} {tablesample_clause(client.dialect, sample)}", {"method": "tablesample", "percent": sample.percent}
+
+    if rows > limit and client.dialect in ("postgresql", "mssql"):
+        # Oversampled for page-level variance; build_sketches reservoir-
+        # samples the result down to `limit`.
+        percent = min(100.0, 100.0 * limit * BLOCK_SAMPLING_OVERSAMPLE / rows)
+        spec = SampleSpec(
+            percent=percent,
+            method="SYSTEM",
+            target_error=0.0,
+            z=DEFAULT_CONFIDENCE_Z,
+            seed=random.randint(1, 2 ** 31 - 1),
+        )
+        if not spec.is_full_scan:
+            return f"{source} {tablesample_clause(client.dialect, spec)}", {"method": "tablesample", "percent": percent}
+
+    # Dialects without TABLESAMPLE read the first `limit` rows.
+    return source, {"method": "full" if rows <= limit else "head", "percent": None}
+
+
+def _reservoir(partitions: Iterable[List], limit: int) -> Tuple[List, int]:
+    """
+    Uniform sample of at most `limit` rows from a stream (Algorithm R, a
+    batch at a time). Returns the sample and the number of rows seen.
+    """
+    rng = np.random.default_rng()
+    reservoir: List = []
+    seen = 0
+    for partition in partitions:
+        raise_if_cancelled()
+        fill = max(0, min(len(partition), limit - len(reservoir)))
+        reservoir.extend(partition[:fill])
+        rest = partition[fill:]
+        if len(rest):
+            # Row i of the stream (0-based) replaces a random slot with probability limit/(i+1).
+            slots = rng.integers(0, seen + fill + np.arange(len(rest)) + 1)
+            for k in np.flatnonzero(slots < limit):
+                reservoir[slots[k]] = rest[k]
+        seen += len(partition)
+    return reservoir, seen
+
+
+def build_sketches(client, plan, kinds: Dict[str, str], rows: int) -> Tuple[Dict[str, ColumnSketch], Dict[str, Any]]:
+    """
+    Stream the plan's table (and row filter) and feed at most
+    PROFILE_SAMPLE_ROWS rows to one ColumnSketch per column. TABLESAMPLE
+    results are reservoir-sampled down to the limit, so no part of the
+    sample is favoured; unsampled reads take the first rows, a NumPy
+    batch at a time.
+    """
+    limit = settings.PROFILE_SAMPLE_ROWS
+    source, how = _sketch_source(client, plan, rows, limit)
+    names = list(kinds)
+    sql = f"SELECT {', '.join(client.quote_identifier(n) for n in names)} FROM {source}"
+    if plan.where:
+        sql += f" WHERE {plan.where}"
+
+    sketches = {
+        name: ColumnSketch(
+            kind,
+            p=settings.PROFILE_HLL_PRECISION,
+            compression=settings.PROFILE_TDIGEST_COMPRESSION,
+            top_k=settings.PROFILE_TOP_K,
+        )
+        for name, kind in kinds.items()
+    }
+
+    read = 0
+    with client.connect() as conn:
+        result = conn.execute(text(sql), plan.params, execution_options={"yield_per": settings.SQL_BATCH_ROWS})
+        try:
+            if how["method"] == "tablesample":
+                sample, seen = _reservoir(result.partitions(settings.SQL_BATCH_ROWS), limit)
+                how["rows_seen"] = seen
+                read = len(sample)
+                for start in range(0, read, settings.SQL_BATCH_ROWS):
+                    batch = sample[start:start + settings.SQL_BATCH_ROWS]
+                    for name, values in zip(names, zip(*batch)):
+                        sketches[name].update(values)
+            else:
+                for partition in result.partitions(settings.SQL_BATCH_ROWS):
+                    raise_if_cancelled()
+                    partition = partition[: limit - read]
+                    read += len(partition)
+                    for name, values in zip(names, zip(*partition)):
+                        sketches[name].update(values)
+                    if read >= limit:
+                        break
+        finally:
+            result.close()
+
+    return sketches, {**how, "rows": read}
+
+
+# ----------------------------------------------------------------------
+# Storage
+# ----------------------------------------------------------------------
+def store_sketches(
+    connection_key: str,
+    table: str,
+    sketches: Dict[str, ColumnSketch],
+    partition_key: str = FULL_PARTITION,
+    merge: bool = False,
+) -> Dict[str, ColumnSketch]:
+    """
+    Save one partition's sketches, replacing the stored ones or (merge=True)
+    folding into them. Returns the sketches as stored.
+    """
+    db = SessionLocal()
+    try:
+        stored = {
+            row.column_name: row
+            for row in db.query(DQColumnSketch).filter(
+                DQColumnSketch.connection_key == connection_key,
+                DQColumnSketch.table_name == table,
+                DQColumnSketch.partition_key == partition_key,
+            )
+        }
+        now = time.time()
+        out = {}
+        for name, sketch in sketches.items():
+            row = stored.get(name)
+            if row is None:
+                row = DQColumnSketch(
+                    connection_key=connection_key,
+                    table_name=table,
+                    column_name=name,
+                    partition_key=partition_key,
+                    runs=0,
+                )
+                db.add(row)
+            elif merge:
+                previous = ColumnSketch.from_bytes(row.sketch)
+                previous.merge(sketch)
+                sketch = previous
+            row.kind = sketch.kind
+            row.rows = sketch.rows
+            row.sketch = sketch.to_bytes()
+            row.runs = (row.runs or 0) + 1
+            row.updated_at = now
+            out[name] = sketch
+        db.commit()
+        return out
+    finally:
+        db.close()
+
+
+def load_sketches(connection_key: str, table: str, partition_key: str = FULL_PARTITION) -> Dict[str, ColumnSketch]:
+    return merge_stored_sketches(connection_key, table, [partition_key])
+
+
+def merge_stored_sketches(
+    connection_key: str, table: str, partitions: Optional[List[str]] = None
+) -> Dict[str, ColumnSketch]:
+    """Merge a table's stored sketches per column, over the given partitions (all by default)."""
+    db = SessionLocal()
+    try:
+        query = db.query(DQColumnSketch).filter(
+            DQColumnSketch.connection_key == connection_key,
+            DQColumnSketch.table_name == table,
+        )
+        if partitions is not None:
+            query = query.filter(DQColumnSketch.partition_key.in_(partitions))
+        rows = query.all()
+    finally:
+        db.close()
+
+    merged: Dict[str, ColumnSketch] = {}
+    for row in rows:
+        sketch = ColumnSketch.from_bytes(row.sketch)
+        if row.column_name in merged:
+            merged[row.column_name].merge(sketch)
+        else:
+            merged[row.column_name] = sketch
+    return merged
+
+
+def invalidate_sketches(
+    db, connection_key: str, table: Optional[str] = None, partition_key: Optional[str] = None
+) -> int:
+    """Drop stored sketches for one table (or the whole connection). The caller commits."""
+    query = db.query(DQColumnSketch).filter(DQColumnSketch.connection_key == connection_key)
+    if table is not None:
+        query = query.filter(DQColumnSketch.table_name == table)
+    if partition_key is not None:
+        query = query.filter(DQColumnSketch.partition_key == partition_key)
+    return query.delete(synchronize_session=False)
+
+
+# ----------------------------------------------------------------------
+# Rule
+# ----------------------------------------------------------------------
+_ORDERED_KINDS = ("numeric", "temporal", "text")
+
+
+class ProfileCheck(ScanRule):
+    rule_name = "profile"
+    description = "Profiles each column: nulls, min/max, mean, distinct count, quantiles and top values."
+
+    def aggregates(self, columns: List[Dict], client) -> List[Tuple[str, str]]:
+        pairs = []
+        for col in columns:
+            kind = profile_kind(col, client.dialect)
+            if kind is None:
+                continue
+            name = col["name"]
+            quoted = client.quote_identifier(name)
+            pairs.append((f"{name}:non_null", non_null_count_expr(col, client)))
+            if kind in _ORDERED_KINDS:
+                pairs.append((f"{name}:min", f"MIN({quoted})"))
+                pairs.append((f"{name}:max", f"MAX({quoted})"))
+            if kind == "numeric":
+                value = quoted
+                if client.dialect == "postgresql" and _MONEY_TYPES.match(str(col.get("type", ""))):
+                    # Postgres money only casts to numeric.
+                    value = f"CAST({quoted} AS NUMERIC)"
+                pairs.append((f"{name}:sum", f"SUM(CAST({value} AS FLOAT))"))
+        return pairs
+
+    def merge_values(self, stored: Dict[str, Any], delta: Dict[str, Any]) -> Dict[str, Any]:
+        merged = dict(stored)
+        for key, value in delta.items():
+            value = _json_value(value)
+            previous = merged.get(key)
+            stat = key.rsplit(":", 1)[1]
+            if stat in ("min", "max"):
+                if previous is None or value is None:
+                    merged[key] = value if previous is None else previous
+                else:
+                    merged[key] = min(previous, value) if stat == "min" else max(previous, value)
+            else:
+                merged[key] = (previous or 0) + (value or 0)
+        return merged
+
+    def build_result(self, values: Dict[str, Any], scan: ScanContext) -> DQResult:
+        stats: Dict[str, Dict[str, Any]] = {}
+        for key, value in values.items():
+            name, stat = key.rsplit(":", 1)
+            stats.setdefault(name, {})[stat] = _json_value(value)
+
+        columns = {}
+        for name, col in stats.items():
+            non_null = col.get("non_null") or 0
+            profile = {
+                "non_null": non_null,
+                "null_fraction": 1.0 - non_null / scan.row_count if scan.row_count else 0.0,
+            }
+            if "min" in col:
+                profile["min"] = col["min"]
+                profile["max"] = col.get("max")
+            if "sum" in col:
+                profile["mean"] = col["sum"] / non_null if non_null and col["sum"] is not None else None
+            columns[name] = profile
+
+        details: Dict[str, Any] = {"columns": columns}
+        if scan.sample is not None:
+            details.update({"estimated": True, **sample_details(scan.row_count, scan.sample)})
+        return DQResult(rule=self.rule_name, status="pass", details=details)
+
+    def metrics(self, details: Dict[str, Any]) -> Dict[Tuple[str, str], float]:
+        # Null fractions are already tracked by null_check. Exact, Duj1 and
+        # HLL distinct counts are kept as separate series.
+        out = {}
+        for name, profile in details.get("columns", {}).items():
+            if profile.get("mean") is not None:
+                out[(name, "mean")] = profile["mean"]
+            if profile.get("distinct_estimate") is not None:
+                method = profile.get("distinct_method")
+                out[(name, f"distinct_estimate@{method}" if method else "distinct_estimate")] = profile["distinct_estimate"]
+        return out
+
+    def finish(self, result: DQResult, scan: ScanContext, client, plan, incremental: bool = False) -> DQResult:
+        if not client.connection_key:
+            return result
+        try:
+            kinds = profiled_columns(client.get_columns(scan.table), client.dialect)
+            if not kinds:
+                return result
+            self._add_sketches(result, scan, client, plan, kinds, incremental)
+        except QueryCancelled:
+            raise
+        except Exception as e:
+            # The aggregates are still good without the sketches.
+            result.details["sketch_error"] = str(e)
+        return result
+
+    def _add_sketches(self, result: DQResult, scan: ScanContext, client, plan, kinds: Dict[str, str], incremental: bool) -> None:
+        partition = WATERMARK_PARTITION if incremental else FULL_PARTITION
+        frequencies: Dict[str, Tuple[int, int]] = {}
+        how: Dict[str, Any] = {"method": "stored", "percent": None, "rows": 0}
+
+        if plan is not None and scan.row_count:
+            sketches, how = build_sketches(client, plan, kinds, scan.row_count)
+            frequencies = {name: _sample_frequencies(s) for name, s in sketches.items()}
+            sketches = store_sketches(client.connection_key, scan.table, sketches, partition, merge=incremental)
+        else:
+            sketches = load_sketches(client.connection_key, scan.table, partition)
+
+        columns = result.details["columns"]
+        # Sample mode: the aggregates cover the TABLESAMPLE, not the table.
+        scale = 1.0 / plan.sample.fraction if plan is not None and plan.sample is not None and plan.sample.percent > 0 else 1.0
+        for name, sketch in sketches.items():
+            if name not in columns:
+                continue
+            profile = columns[name]
+            summary = sketch.summary()
+            total = round(profile["non_null"] * scale)
+            sketched = sketch.rows - sketch.nulls
+
+            if name in frequencies and not incremental:
+                distinct, singletons = frequencies[name]
+                profile["distinct_estimate"] = estimate_distinct(sketched, distinct, singletons, total)
+                profile["distinct_method"] = "exact" if sketched >= total else "duj1"
+            else:
+                # Running sketch over every window so far.
+                profile["distinct_estimate"] = summary["distinct_sketch"]
+                profile["distinct_method"] = "hll"
+            profile["kind"] = summary["kind"]
+            profile["top_values"] = summary["top_values"]
+            if "quantiles" in summary:
+                profile["quantiles"] = summary["quantiles"]
+            profile["sketch_rows"] = sketched
+
+        result.details["sketch"] = {
+            **how,
+            "partition": partition,
+            "hll_precision": settings.PROFILE_HLL_PRECISION,
+            "tdigest_compression": settings.PROFILE_TDIGEST_COMPRESSION,
+        }
@@ -1,7 +1,24 @@
-from dataclasses import dataclass
-from typing import Any, Dict
+import re
+import time
+from dataclasses import dataclass, replace
+from datetime import date, datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
 from sqlalchemy import text
-from sqlalchemy.exc import SQLAlchemyError
+
+from app.core.db_connection import SessionLocal
+from app.core.settings import settings
+from app.db.models import DQFreshnessState
+from app.dq.schema_drift import detect_drift
+from app.dq.stats import TableStats, stats_age_seconds
+from app.dq.sampling import (
+    SampleSpec,
+    estimate_table_rows,
+    proportion_interval,
+    sample_details,
+    scaled_count_interval,
+    tablesample_clause,
+)
+from app.dq.table_config import load_table_config
 
 
 @dataclass
@@ -11,83 +28,636 @@ class DQResult:
     details: Dict[str, Any]
 
 
+@dataclass
+class ScanContext:
+    """Facts about a fused table scan that every scan rule can use."""
+    table: str
+    row_count: int
+    # Set when the scan ran over a TABLESAMPLE instead of the full table.
+    sample: Optional[SampleSpec] = None
+
+
 class BaseRule:
     rule_name: str = ""
     description: str = ""
+    # Whether the rule reads table rows (vs. catalog only); the DQ
+    # scheduler charges such rules against its scanned-rows budget.
+    reads_rows: bool = False
 
     def run(self, table: str, client) -> DQResult:
         raise NotImplementedError
 
+    def run_sampled(self, table: str, client, sample: Optional[SampleSpec]) -> DQResult:
+        """Sample mode; rules that cannot sample run exactly."""
+        return self.run(table, client)
+
+    def from_stats(self, stats: TableStats) -> Optional[DQResult]:
+        """Answer from warehouse statistics (stats mode); None if the rule can't."""
+        return None
+
+    def metrics(self, details: Dict[str, Any]) -> Dict[Tuple[str, str], float]:
+        """
+        (column, metric) → value pairs from a result's details, recorded
+        for anomaly scoring (app.dq.anomaly). Column is "" for table-level
+        metrics.
+        """
+        return {}
+
+    def rows_read(self, details: Dict[str, Any]) -> Optional[float]:
+        """Warehouse rows the run read, for cost learning; None if unknown."""
+        return None if self.reads_rows else 0.0
+
+
+def _stats_details(stats: TableStats) -> Dict[str, Any]:
+    return {
+        "estimated": True,
+        "source": "catalog_statistics",
+        "last_analyzed": stats.last_analyzed.isoformat() if stats.last_analyzed else None,
+        "stats_age_seconds": stats_age_seconds(stats.last_analyzed),
+    }
+
+
+class ScanRule(BaseRule):
+    """
+    A rule that can be answered from plain aggregates over one table.
+
+    The runner fuses the aggregates of all scan rules into a single
+    SELECT per table (see `app.dq.runner.run_scan_rules`), so these rules
+    only describe their expressions and how to read the values back.
+    """
+    reads_rows = True
+
+    def aggregates(self, columns: List[Dict], client) -> List[Tuple[str, str]]:
+        """Return (key, SQL aggregate expression) pairs for this rule."""
+        raise NotImplementedError
+
+    def build_result(self, values: Dict[str, Any], scan: ScanContext) -> DQResult:
+        """Turn the aggregate values (by key) into a DQResult."""
+        raise NotImplementedError
+
+    def merge_values(self, stored: Dict[str, Any], delta: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Fold the aggregates of newly arrived rows into stored running
+        aggregates (incremental mode). COUNT/SUM style values simply add up.
+        """
+        merged = dict(stored)
+        for key, value in delta.items():
+            merged[key] = (merged.get(key) or 0) + (value or 0)
+        return merged
+
+    def finish(self, result: DQResult, scan: ScanContext, client, plan, incremental: bool = False) -> DQResult:
+        """
+        Hook run after the fused scan, for rules that add work of their own
+        over the rows `plan` covered. `scan.row_count` counts those rows;
+        `plan` is None when an incremental run found no new rows.
+        """
+        return result
+
+    def run(self, table: str, client) -> DQResult:
+        from app.dq.runner import run_scan_rules
+
+        return run_scan_rules(table, [self], client)[self.rule_name]
+
+
+# SQL Server cannot COUNT() these legacy LOB types directly.
+_UNCOUNTABLE_TYPES = ("TEXT", "NTEXT", "IMAGE")
+
 
-class NullCheck(BaseRule):
+def non_null_count_expr(column: Dict, client) -> str:
+    col = client.quote_identifier(column["name"])
+    if client.dialect == "mssql" and str(column.get("type", "")).upper() in _UNCOUNTABLE_TYPES:
+        return f"SUM(CASE WHEN {col} IS NULL THEN 0 ELSE 1 END)"
+    return f"COUNT({col})"
+
+
+class NullCheck(ScanRule):
     rule_name = "null_check"
     description = "Checks number of NULLs in each column."
 
-    def run(self, table: str, client) -> DQResult:
-        engine = client.engine
-        insp = client.engine.dialect
-        nulls = {}
-
-        with engine.connect() as conn:
-            cols = client.get_columns(table)
-            for col in cols:
-                col_name = col["name"]
-                query = text(f"SELECT COUNT(*) FROM {table} WHERE {col_name} IS NULL")
-                count = conn.execute(query).scalar()
-                nulls[col_name] = count
+    def aggregates(self, columns: List[Dict], client) -> List[Tuple[str, str]]:
+        return [(col["name"], non_null_count_expr(col, client)) for col in columns]
+
+    def build_result(self, values: Dict[str, Any], scan: ScanContext) -> DQResult:
+        nulls = {
+            col_name: scan.row_count - (non_null or 0)
+            for col_name, non_null in values.items()
+        }
+
+        if scan.sample is None:
+            details = {
+                "null_counts": nulls,
+                "null_fractions": {c: n / scan.row_count if scan.row_count else 0.0 for c, n in nulls.items()},
+            }
+        else:
+            details = self._sampled_details(nulls, scan)
 
         return DQResult(
             rule=self.rule_name,
             status="pass",
-            details={"null_counts": nulls},
+            details=details,
         )
 
+    def from_stats(self, stats: TableStats) -> Optional[DQResult]:
+        fractions = {}
+        distinct = {}
+        analyzed = {}
+        for col_name, col in stats.columns.items():
+            fractions[col_name] = col.null_fraction
+            distinct[col_name] = col.distinct_estimate
+            analyzed[col_name] = col.last_analyzed.isoformat() if col.last_analyzed else None
+
+        details = {
+            "null_fractions": fractions,
+            "null_counts": {
+                c: round(f * stats.row_count) if f is not None and stats.row_count is not None else None
+                for c, f in fractions.items()
+            },
+            "distinct_estimates": distinct,
+            "column_last_analyzed": analyzed,
+            **_stats_details(stats),
+        }
+        return DQResult(rule=self.rule_name, status="pass", details=details)
+
+    def metrics(self, details: Dict[str, Any]) -> Dict[Tuple[str, str], float]:
+        fractions = details.get("null_fractions") or {}
+        return {(c, "null_fraction"): f for c, f in fractions.items() if f is not None}
+
+    def _sampled_details(self, nulls: Dict[str, int], scan: ScanContext) -> Dict[str, Any]:
+        n = scan.row_count
+        fractions = {}
+        intervals = {}
+        estimated = {}
+        for col_name, sampled_nulls in nulls.items():
+            fractions[col_name] = sampled_nulls / n if n else 0.0
+            if scan.sample.is_full_scan:
+                # Small tables are read in full; the fraction is exact.
+                intervals[col_name] = [fractions[col_name], fractions[col_name]]
+            else:
+                intervals[col_name] = list(proportion_interval(sampled_nulls, n, scan.sample.z))
+            estimated[col_name] = scaled_count_interval(sampled_nulls, scan.sample)[0]
+
+        return {
+            "null_counts": estimated,
+            "null_fractions": fractions,
+            "null_fraction_ci": intervals,
+            "estimated": True,
+            **sample_details(n, scan.sample),
+        }
+
+
+# Column types left out of the row hash on SQL Server: rowversion is unique
+# per row by construction, the others cannot be converted to text.
+_UNHASHABLE_MSSQL_TYPES = ("timestamp", "rowversion", "image", "geography", "geometry")
+
+
+def _mssql_text_expr(column: Dict, client) -> str:
+    col = client.quote_identifier(column["name"])
+    col_type = str(column.get("type", "")).lower()
+    if col_type.startswith(("binary", "varbinary")):
+        return f"CONVERT(VARCHAR(MAX), {col}, 1)"
+    if col_type in ("float", "real"):
+        # Style 2 keeps 16 significant digits (default keeps 6).
+        return f"CONVERT(NVARCHAR(MAX), {col}, 2)"
+    if col_type in ("datetime", "smalldatetime"):
+        return f"CONVERT(NVARCHAR(MAX), {col}, 121)"
+    return f"CONVERT(NVARCHAR(MAX), {col})"
+
+
+def row_hash_expr(columns: List[Dict], client, alias: str = "src") -> Tuple[Optional[str], List[str]]:
+    """
+    Server-side hash of a whole row. Returns (expression, skipped columns);
+    expression is None on dialects without a row hash.
+    """
+    if client.dialect == "postgresql":
+        return f"md5(CAST({alias} AS text))", []
+
+    if client.dialect == "mssql":
+        parts, skipped = [], []
+        for col in columns:
+            if str(col.get("type", "")).lower() in _UNHASHABLE_MSSQL_TYPES:
+                skipped.append(col["name"])
+                continue
+            # NCHAR(30) marks NULL, NCHAR(31) separates values. `+` rather
+            # than CONCAT, which is capped at 254 arguments.
+            parts.append(f"ISNULL({_mssql_text_expr(col, client)}, NCHAR(30))")
+        if not parts:
+            return None, skipped
+        return f"HASHBYTES('SHA2_256', {' + NCHAR(31) + '.join(parts)})", skipped
+
+    return None, []
+
 
 class DuplicateCheck(BaseRule):
     rule_name = "duplicate_check"
-    description = "Checks for duplicate rows in the table."
+    description = "Checks for duplicate rows (or duplicate declared keys) in the table."
+    reads_rows = True
 
     def run(self, table: str, client) -> DQResult:
-        with client.engine.connect() as conn:
-            query = text(f"SELECT COUNT(*) - COUNT(DISTINCT *) AS duplicates FROM {table}")
-            # SQL Server does not support SELECT DISTINCT * inside COUNT
-            # We handle this later. For now keep placeholder.
-            try:
-                duplicates = conn.execute(query).scalar()
-            except SQLAlchemyError:
-                duplicates = "Not supported on this database"
+        return self.run_sampled(table, client, None)
+
+    def run_sampled(self, table: str, client, sample: Optional[SampleSpec]) -> DQResult:
+        info = client.get_table(table)
+        config = load_table_config(client.connection_key, table) if client.connection_key else None
+        key_columns = (config.key_columns if config is not None else None) or []
+
+        if not key_columns and info.primary_key:
+            # An enforced primary key makes whole-row duplicates impossible.
+            return DQResult(
+                rule=self.rule_name,
+                status="pass",
+                details={
+                    "duplicate_rows": 0,
+                    "method": "primary_key",
+                    "key_columns": info.primary_key,
+                },
+            )
+
+        if sample is not None and sample.method == "SYSTEM" and client.dialect == "postgresql":
+            # Row-level sampling keeps the two rows of a pair independent
+            # even when they were loaded onto the same page.
+            sample = replace(sample, method="BERNOULLI")
+
+        source = client.quote_table(table) + " src"
+        if sample is not None and not sample.is_full_scan:
+            source = f"{client.quote_table(table)} src {tablesample_clause(client.dialect, sample)}"
+
+        skipped: List[str] = []
+        if key_columns:
+            method = "declared_key"
+            group_by = ", ".join(client.quote_identifier(c) for c in key_columns)
+            grouped = f"SELECT COUNT(*) AS n FROM {source} GROUP BY {group_by}"
+        else:
+            hash_expr, skipped = row_hash_expr(client.get_columns(table), client)
+            if hash_expr is not None:
+                method = "row_hash"
+                grouped = (
+                    f"SELECT COUNT(*) AS n FROM (SELECT {hash_expr} AS row_hash FROM {source}) hashed "
+                    f"GROUP BY row_hash"
+                )
+            else:
+                method = "all_columns"
+                group_by = ", ".join(client.quote_identifier(c["name"]) for c in client.get_columns(table))
+                grouped = f"SELECT COUNT(*) AS n FROM {source} GROUP BY {group_by}"
+
+        # One aggregation over the groups yields total rows, duplicate groups
+        # and surplus rows together; no rows travel to Python.
+        query = text(
+            "SELECT COALESCE(SUM(n), 0) AS total_rows, "
+            "COALESCE(SUM(CASE WHEN n > 1 THEN 1 ELSE 0 END), 0) AS duplicate_groups, "
+            "COALESCE(SUM(CASE WHEN n > 1 THEN n - 1 ELSE 0 END), 0) AS duplicate_rows "
+            f"FROM ({grouped}) grouped"
+        )
+        with client.connect() as conn:
+            row = conn.execute(query).one()
+
+        total, groups, duplicates = int(row[0]), int(row[1]), int(row[2])
+        details = {
+            "duplicate_rows": duplicates,
+            "duplicate_groups": groups,
+            "duplicate_rate": duplicates / total if total else 0.0,
+            "method": method,
+        }
+        if key_columns:
+            details["key_columns"] = key_columns
+        if skipped:
+            details["columns_not_hashed"] = skipped
+        if sample is not None:
+            details.update(self._sampled_details(total, duplicates, sample))
+        else:
+            details["total_rows"] = total
 
         return DQResult(
             rule=self.rule_name,
             status="pass",
-            details={"duplicate_rows": duplicates},
+            details=details,
         )
 
+    def metrics(self, details: Dict[str, Any]) -> Dict[Tuple[str, str], float]:
+        return {("", "duplicate_rate"): details.get("duplicate_rate", 0.0)}
+
+    def rows_read(self, details: Dict[str, Any]) -> Optional[float]:
+        if details.get("method") == "primary_key":
+            return 0.0
+        return details.get("sampled_rows", details.get("total_rows"))
+
+    def _sampled_details(self, sampled_rows: int, sampled_duplicates: int, sample: SampleSpec) -> Dict[str, Any]:
+        if sample.is_full_scan:
+            return sample_details(sampled_rows, sample)
+
+        f = sample.fraction
+        low, high = proportion_interval(sampled_duplicates, sampled_rows, sample.z)
+        if sample.method == "BERNOULLI":
+            # Both rows of a duplicate pair land in the sample with
+            # probability f^2, so the in-sample rate understates the
+            # table's rate by ~f. Assumes duplicates mostly come in pairs.
+            scale, rate_scale = 1 / (f * f), 1 / f
+        else:
+            # Page sampling: duplicates loaded together share pages and are
+            # sampled together with probability ~f, so the rate carries over.
+            scale, rate_scale = 1 / f, 1.0
+        duplicate_rows = round(sampled_duplicates * scale)
+        if sample.estimated_rows:
+            duplicate_rows = min(duplicate_rows, sample.estimated_rows)
+        return {
+            "duplicate_rows": duplicate_rows,
+            "duplicate_rate": min(1.0, (sampled_duplicates / sampled_rows) * rate_scale) if sampled_rows else 0.0,
+            "duplicate_rate_ci": [min(1.0, low * rate_scale), min(1.0, high * rate_scale)],
+            "sample_duplicate_rows": sampled_duplicates,
+            "estimated": True,
+            **sample_details(sampled_rows, sample),
+        }
 
-class RowCountCheck(BaseRule):
+
+class RowCountCheck(ScanRule):
     rule_name = "row_count"
     description = "Counts total rows."
 
-    def run(self, table: str, client) -> DQResult:
-        with client.engine.connect() as conn:
-            query = text(f"SELECT COUNT(*) FROM {table}")
-            count = conn.execute(query).scalar()
+    def aggregates(self, columns: List[Dict], client) -> List[Tuple[str, str]]:
+        # COUNT(*) is part of every fused scan already.
+        return []
+
+    def build_result(self, values: Dict[str, Any], scan: ScanContext) -> DQResult:
+        if scan.sample is None:
+            details = {"row_count": scan.row_count}
+        else:
+            estimate, low, high = scaled_count_interval(scan.row_count, scan.sample)
+            details = {
+                "row_count": estimate,
+                "row_count_ci": [low, high],
+                "estimated": True,
+                **sample_details(scan.row_count, scan.sample),
+            }
+
+        return DQResult(
+            rule=self.rule_name,
+            status="pass",
+            details=details,
+        )
 
+    def from_stats(self, stats: TableStats) -> Optional[DQResult]:
         return DQResult(
             rule=self.rule_name,
             status="pass",
-            details={"row_count": count},
+            details={"row_count": stats.row_count, **_stats_details(stats)},
         )
 
+    def metrics(self, details: Dict[str, Any]) -> Dict[Tuple[str, str], float]:
+        return {("", "row_count"): details["row_count"]}
+
 
 class SchemaCheck(BaseRule):
     rule_name = "schema_check"
-    description = "Reports table columns and types."
+    description = "Reports table columns and types, and how they drifted since the last run."
 
     def run(self, table: str, client) -> DQResult:
         cols = client.get_columns(table)
+        details: Dict[str, Any] = {"schema": cols}
+        status = "pass"
+        if client.connection_key:
+            # Only first sightings become the baseline: a change keeps
+            # failing until POST /run/dq/schema-drift/ack accepts it.
+            drift = detect_drift(client, [table], record="new")
+            details["fingerprint"] = drift["fingerprints"][table]
+            if table in drift["changed_tables"]:
+                details["drift"] = drift["changed_tables"][table]
+                status = details["drift"]["severity"]
+            elif table in drift["new_tables"]:
+                details["baseline"] = True
+
         return DQResult(
             rule=self.rule_name,
-            status="pass",
-            details={"schema": cols},
+            status=status,
+            details=details,
         )
+
+
+# ----------------------------------------------------------------------
+# Freshness
+# ----------------------------------------------------------------------
+# Update-time columns move on any write; insert/load-time columns on new
+# rows; anything else time-like is a last resort.
+_FRESHNESS_NAMES = (
+    re.compile(r"(updated|modified|changed|last_?update)_?(at|ts|time|date|datetime|on)?$", re.I),
+    re.compile(r"(inserted|loaded|ingested|created|load|event)_?(at|ts|time|date|datetime|on)?$", re.I),
+    re.compile(r"(_at|_ts|_time|timestamp|date)$", re.I),
+)
+_TIMESTAMP_TYPES = ("timestamp", "datetime", "smalldatetime", "date")
+
+# The warehouse's own clock, in the same (naive) terms as its timestamp columns.
+_SERVER_NOW = {
+    "postgresql": "LOCALTIMESTAMP",
+    "mssql": "SYSDATETIME()",
+    "sqlite": "CURRENT_TIMESTAMP",
+}
+
+# Catalog freshness signals: seconds since the last write the catalog saw,
+# and a counter that moves on writes.
+_PG_FRESHNESS_SIGNALS = """
+SELECT EXTRACT(EPOCH FROM now() - GREATEST(s.last_autoanalyze, s.last_autovacuum)) AS seconds_ago,
+       s.n_tup_ins + s.n_tup_upd + s.n_tup_del AS change_counter
+FROM pg_stat_user_tables s
+WHERE s.relid = to_regclass(:table)
+"""
+
+_MSSQL_FRESHNESS_SIGNALS = """
+SELECT (SELECT DATEDIFF(SECOND, MAX(us.last_user_update), SYSDATETIME())
+        FROM sys.dm_db_index_usage_stats us
+        WHERE us.database_id = DB_ID() AND us.object_id = OBJECT_ID(:table)) AS seconds_ago,
+       (SELECT SUM(ps.row_count)
+        FROM sys.dm_db_partition_stats ps
+        WHERE ps.object_id = OBJECT_ID(:table) AND ps.index_id IN (0, 1)) AS change_counter
+"""
+
+
+def _is_timestamp_column(column: Dict, dialect: str) -> bool:
+    col_type = str(column.get("type", "")).lower()
+    if dialect == "mssql" and col_type in ("timestamp", "rowversion"):
+        return False
+    return col_type.startswith(_TIMESTAMP_TYPES)
+
+
+def freshness_candidates(columns: List[Dict], dialect: str) -> List[str]:
+    """Timestamp columns likely to track the table's latest write, best first."""
+    temporal = [c["name"] for c in columns if _is_timestamp_column(c, dialect)]
+    ranked: List[str] = []
+    for pattern in _FRESHNESS_NAMES:
+        ranked += [name for name in temporal if name not in ranked and pattern.search(name)]
+    return ranked
+
+
+def _as_datetime(value: Any) -> Optional[datetime]:
+    if value is None or isinstance(value, datetime):
+        return value
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day)
+    return datetime.fromisoformat(str(value))
+
+
+def _observe_change_counter(connection_key: str, table: str, counter: int, now: float) -> Tuple[Optional[float], float]:
+    """
+    Compare a catalog change counter with the last one seen. Returns
+    (changed_at, unchanged_since): the check that first saw the counter's
+    current value (None if it never moved), and the time since which it
+    has not moved (which bounds the lag from below).
+    """
+    db = SessionLocal()
+    try:
+        state = (
+            db.query(DQFreshnessState)
+            .filter(DQFreshnessState.connection_key == connection_key, DQFreshnessState.table_name == table)
+            .first()
+        )
+        if state is None:
+            state = DQFreshnessState(connection_key=connection_key, table_name=table, first_checked_at=now)
+            db.add(state)
+        elif state.change_counter != counter:
+            state.changed_at = now
+        state.change_counter = counter
+        state.checked_at = now
+        changed_at, unchanged_since = state.changed_at, state.changed_at or state.first_checked_at
+        db.commit()
+        return changed_at, unchanged_since
+    finally:
+        db.close()
+
+
+class FreshnessCheck(BaseRule):
+    rule_name = "freshness"
+    description = "Checks how long ago the table last received data, against its SLA."
+
+    def run(self, table: str, client) -> DQResult:
+        config = load_table_config(client.connection_key, table) if client.connection_key else None
+        sla = (config.freshness_sla_seconds if config is not None else None) or settings.FRESHNESS_SLA_SECONDS
+        info = client.get_table(table)
+
+        configured = config.freshness_column if config is not None else None
+        candidates = [configured] if configured else freshness_candidates(client.get_columns(table), client.dialect)
+        indexed = {ix.columns[0] for ix in info.indexes if ix.columns}
+        column = next((c for c in candidates if c in indexed), None)
+
+        warning = None
+        if column is not None:
+            details = self._column_lag(table, column, client, "indexed_max")
+        else:
+            # Without an index MAX() reads the whole table: only small
+            # tables get it, even for a configured column.
+            rows = estimate_table_rows(client, table)
+            # Dialects without catalog row estimates are the small, local ones.
+            small = rows is None or rows <= settings.FRESHNESS_UNINDEXED_SCAN_MAX_ROWS
+            if configured and small:
+                details = self._column_lag(table, configured, client, "configured_max")
+            else:
+                if configured:
+                    warning = (
+                        f"Configured column '{configured}' is not indexed and the table has ~{rows} rows; "
+                        "index it (or raise FRESHNESS_UNINDEXED_SCAN_MAX_ROWS) to read it."
+                    )
+                details = self._catalog_lag(table, client)
+                if details is None and candidates and not configured and small:
+                    details = self._column_lag(table, candidates[0], client, "max_scan")
+            if details is not None and details["method"] != "catalog":
+                details["estimated_rows_scanned"] = rows
+
+        if details is None:
+            reason = warning or (
+                "No indexed timestamp column, catalog signal or small enough table. "
+                f"Configure one with PUT /run/dq/{table}/freshness."
+            )
+            return DQResult(
+                rule=self.rule_name,
+                status="skipped",
+                details={"reason": reason, "candidate_columns": candidates, "sla_seconds": sla},
+            )
+        if warning:
+            details["warning"] = warning
+
+        lag = details.get("lag_seconds")
+        details["sla_seconds"] = sla
+        if lag is None:
+            # An empty table is suspicious; a catalog signal seen once is not.
+            status = "skipped" if details["method"] == "catalog" else "warn"
+        elif lag <= sla:
+            status = "pass"
+        elif lag <= sla * settings.FRESHNESS_FAIL_FACTOR:
+            status = "warn"
+        else:
+            status = "fail"
+        return DQResult(rule=self.rule_name, status=status, details=details)
+
+    def rows_read(self, details: Dict[str, Any]) -> Optional[float]:
+        # Unindexed MAX() scans read the whole table; an index or the
+        # catalog reads next to nothing.
+        if details.get("method") in ("max_scan", "configured_max"):
+            return details.get("estimated_rows_scanned")
+        return 0.0
+
+    def _column_lag(self, table: str, column: str, client, method: str) -> Dict[str, Any]:
+        server_now = _SERVER_NOW.get(client.dialect)
+        select = f"MAX({client.quote_identifier(column)})"
+        if server_now:
+            select += f", {server_now}"
+        with client.connect() as conn:
+            row = conn.execute(text(f"SELECT {select} FROM {client.quote_table(table)}")).one()
+
+        latest = _as_datetime(row[0])
+        details: Dict[str, Any] = {
+            "method": method,
+            "column": column,
+            "latest_value": latest.isoformat() if latest is not None else None,
+            "lag_seconds": None,
+        }
+        if latest is None:
+            details["reason"] = "Table has no rows with a value in this column"
+            return details
+
+        if latest.tzinfo is not None:
+            now = datetime.now(timezone.utc)
+        elif server_now:
+            now = _as_datetime(row[1]).replace(tzinfo=None)
+        else:
+            now = datetime.now(timezone.utc).replace(tzinfo=None)
+        # Rows stamped in the future count as fresh.
+        details["lag_seconds"] = max(0, round((now - latest).total_seconds()))
+        return details
+
+    def _catalog_lag(self, table: str, client) -> Optional[Dict[str, Any]]:
+        if client.dialect == "postgresql":
+            query = _PG_FRESHNESS_SIGNALS
+        elif client.dialect == "mssql":
+            query = _MSSQL_FRESHNESS_SIGNALS
+        else:
+            return None
+        with client.connect() as conn:
+            row = conn.execute(text(query), {"table": client.quote_table(table)}).mappings().first()
+        if row is None:
+            return None
+
+        estimates = []
+        lower_bound = 0
+        details: Dict[str, Any] = {"method": "catalog"}
+        if row["seconds_ago"] is not None:
+            details["last_write_seconds_ago"] = round(float(row["seconds_ago"]))
+            estimates.append(details["last_write_seconds_ago"])
+
+        if row["change_counter"] is not None and client.connection_key:
+            now = time.time()
+            changed_at, unchanged_since = _observe_change_counter(
+                client.connection_key, table, int(row["change_counter"]), now
+            )
+            details["change_counter"] = int(row["change_counter"])
+            details["counter_unchanged_since"] = datetime.fromtimestamp(unchanged_since, tz=timezone.utc).isoformat()
+            lower_bound = round(now - unchanged_since)
+            if changed_at is not None:
+                # Writes landed between the check before changed_at and changed_at.
+                estimates.append(lower_bound)
+
+        if not estimates and not lower_bound:
+            if "change_counter" not in details:
+                return None
+            details["reason"] = "First observation of the change counter; lag is known from the next check"
+            details["lag_seconds"] = None
+            return details
+        # The most recent evidence of a write wins, but the counter has
+        # not moved for at least `lower_bound` seconds.
+        details["lag_seconds"] = max(min(estimates), lower_bound) if estimates else lower_bound
+        return details
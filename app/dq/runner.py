@@ -1,10 +1,35 @@
-from typing import List, Dict
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import Iterator, List, Dict, Optional, Tuple
+from sqlalchemy import text
+
 from app.dq.rules import (
+    BaseRule,
+    DQResult,
     NullCheck,
     DuplicateCheck,
+    FreshnessCheck,
     RowCountCheck,
+    ScanContext,
+    ScanRule,
     SchemaCheck,
 )
+from app.dq.anomaly import apply_anomaly_scores
+from app.dq.costs import SCAN_UNIT, record_rule_costs
+from app.dq.incremental import merge_and_store, open_window
+from app.dq.profiling import ProfileCheck
+from app.dq.sampling import SampleSpec, plan_sample, tablesample_clause
+from app.dq.stats import TableStats, load_warehouse_stats
+from app.warehouse.cancel import (
+    CancelScope,
+    QueryCancelled,
+    current_cancel_scope,
+    raise_if_cancelled,
+    use_cancel_scope,
+)
+from app.warehouse.governor import get_governor
 from app.warehouse.client import WarehouseClient
 
 
@@ -13,33 +38,377 @@ ALL_RULES = [
     DuplicateCheck(),
     RowCountCheck(),
     SchemaCheck(),
+    FreshnessCheck(),
+    ProfileCheck(),
 ]
 
 
-def run_dq_for_table(db, table: str):
-    client = WarehouseClient(db)
+# ----------------------------------------------------------------------
+# Rule fusion planner
+# ----------------------------------------------------------------------
+# Max aggregate expressions per SELECT, kept under the hard dialect limits
+# (1664 target-list entries on Postgres, 4096 columns on SQL Server).
+MAX_SELECT_EXPRESSIONS = {
+    "postgresql": 1600,
+    "mssql": 4000,
+}
+DEFAULT_MAX_SELECT_EXPRESSIONS = 1000
+
+
+@dataclass
+class ScanPlan:
+    """
+    One table's fused scan: every scan rule's aggregates, split into
+    batches of SELECT expressions. Each batch entry is
+    (rule_name, key, sql_expression).
+    """
+    table: str
+    batches: List[List[Tuple[str, str, str]]] = field(default_factory=list)
+    sample: Optional[SampleSpec] = None
+    # Optional row filter (e.g. an incremental watermark window) and its binds.
+    where: Optional[str] = None
+    params: Dict = field(default_factory=dict)
+
+
+def plan_table_scan(
+    table: str,
+    rules: List[ScanRule],
+    columns: List[Dict],
+    client,
+    max_expressions: Optional[int] = None,
+    sample: Optional[SampleSpec] = None,
+    where: Optional[str] = None,
+    params: Optional[Dict] = None,
+) -> ScanPlan:
+    if max_expressions is None:
+        max_expressions = MAX_SELECT_EXPRESSIONS.get(
+            client.dialect, DEFAULT_MAX_SELECT_EXPRESSIONS
+        )
+    # Leave room for the COUNT(*) every batch carries.
+    batch_size = max(1, max_expressions - 1)
+
+    expressions = [
+        (rule.rule_name, key, expr)
+        for rule in rules
+        for key, expr in rule.aggregates(columns, client)
+    ]
+
+    plan = ScanPlan(table=table, sample=sample, where=where, params=params or {})
+    for start in range(0, len(expressions), batch_size):
+        plan.batches.append(expressions[start:start + batch_size])
+    if not plan.batches:
+        # Rules such as RowCountCheck only need the COUNT(*).
+        plan.batches.append([])
+    return plan
+
+
+def _batch_sql(plan: ScanPlan, batch: List[Tuple[str, str, str]], client) -> str:
+    select_list = ["COUNT(*) AS row_count"]
+    select_list += [f"{expr} AS a{i}" for i, (_, _, expr) in enumerate(batch)]
+    source = client.quote_table(plan.table)
+    if plan.sample is not None and not plan.sample.is_full_scan:
+        source = f"{source} {tablesample_clause(client.dialect, plan.sample)}"
+    sql = f"SELECT {', '.join(select_list)} FROM {source}"
+    if plan.where:
+        sql += f" WHERE {plan.where}"
+    return sql
+
+
+def collect_scan_values(plan: ScanPlan, rules: List[ScanRule], client) -> Tuple[int, Dict[str, Dict]]:
+    """Execute the plan; return (row_count, aggregate values by rule name and key)."""
+    values: Dict[str, Dict] = {rule.rule_name: {} for rule in rules}
+    row_count = 0
+
+    with client.connect() as conn:
+        for batch in plan.batches:
+            row = conn.execute(text(_batch_sql(plan, batch, client)), plan.params).one()
+            row_count = row[0]
+            for i, (rule_name, key, _) in enumerate(batch):
+                values[rule_name][key] = row[i + 1]
+
+    return row_count, values
+
+
+def build_scan_results(
+    table: str,
+    rules: List[ScanRule],
+    row_count: int,
+    values: Dict[str, Dict],
+    sample: Optional[SampleSpec] = None,
+) -> Dict[str, DQResult]:
+    scan = ScanContext(table=table, row_count=row_count, sample=sample)
+    return {rule.rule_name: rule.build_result(values.get(rule.rule_name, {}), scan) for rule in rules}
+
+
+def execute_scan_plan(plan: ScanPlan, rules: List[ScanRule], client) -> Dict[str, DQResult]:
+    row_count, values = collect_scan_values(plan, rules, client)
+    results = build_scan_results(plan.table, rules, row_count, values, sample=plan.sample)
+    scan = ScanContext(table=plan.table, row_count=row_count, sample=plan.sample)
+    return {rule.rule_name: rule.finish(results[rule.rule_name], scan, client, plan) for rule in rules}
+
+
+def run_scan_rules(
+    table: str,
+    rules: List[ScanRule],
+    client,
+    columns: Optional[List[Dict]] = None,
+    sample: Optional[SampleSpec] = None,
+) -> Dict[str, DQResult]:
+    """
+    Run all scan rules for a table in one aggregate query (or a few, for
+    tables too wide for a single SELECT). Returns results by rule name.
+    """
+    if columns is None:
+        columns = client.get_columns(table)
+    plan = plan_table_scan(table, rules, columns, client, sample=sample)
+    return execute_scan_plan(plan, rules, client)
+
+
+# ----------------------------------------------------------------------
+# Runners
+# ----------------------------------------------------------------------
+def _error_result(rule: BaseRule, e: Exception) -> Dict:
+    return {
+        "rule": rule.rule_name,
+        "status": "error",
+        "details": {"error": str(e)},
+    }
+
+
+# "exact" scans every row; "sample" estimates from a TABLESAMPLE sized to
+# the requested error bound (see app/dq/sampling.py); "incremental" scans
+# only rows past the stored watermark (see app/dq/incremental.py); "stats"
+# reads catalog statistics and never touches table data (app/dq/stats.py).
+RUN_MODES = ("exact", "sample", "incremental", "stats")
+
+
+def select_rules(names: Optional[List[str]] = None) -> List[BaseRule]:
+    """ALL_RULES, or only the named ones (in ALL_RULES order)."""
+    if names is None:
+        return list(ALL_RULES)
+    known = {rule.rule_name for rule in ALL_RULES}
+    unknown = [name for name in names if name not in known]
+    if unknown:
+        raise ValueError(f"Unknown DQ rules: {', '.join(unknown)}")
+    return [rule for rule in ALL_RULES if rule.rule_name in names]
+
+
+def _rows_read(fused: Dict[str, DQResult]) -> Optional[float]:
+    """Rows the fused scan read, from the row count result (None if it did not run)."""
+    result = fused.get("row_count")
+    if result is None:
+        return None
+    details = result.details
+    if "incremental" in details:
+        return details["incremental"]["new_rows"]
+    return details.get("sampled_rows", details.get("row_count"))
+
+
+def _stats_output(table: str, stats: Optional[TableStats], rules: Optional[List[BaseRule]] = None) -> Dict:
     results = []
+    for rule in rules or ALL_RULES:
+        result = rule.from_stats(stats) if stats is not None else None
+        if result is None:
+            results.append({
+                "rule": rule.rule_name,
+                "status": "skipped",
+                "details": {"reason": "No catalog statistics available for this rule"},
+            })
+        else:
+            results.append(result.__dict__)
+    return {"table": table, "mode": "stats", "results": results}
 
-    for rule in ALL_RULES:
+
+def iter_dq_stats_for_all_tables(db, client: Optional[WarehouseClient] = None) -> Iterator[Dict]:
+    """Stats mode for the whole warehouse: a few catalog queries, no table scans."""
+    client = client or WarehouseClient(db)
+    stats = load_warehouse_stats(client)
+    for table in client.list_tables():
+        yield _stats_output(table, stats.get(table))
+
+
+def run_incremental_scan_rules(table: str, rules: List[ScanRule], client) -> Dict[str, DQResult]:
+    """Scan only new rows and merge them into the stored running aggregates."""
+    window = open_window(client, table)
+
+    plan, row_count, values = None, 0, {}
+    if window.has_new_rows:
+        where, params = window.where(client)
+        plan = plan_table_scan(table, rules, client.get_columns(table), client, where=where, params=params)
+        row_count, values = collect_scan_values(plan, rules, client)
+
+    total_rows, merged = merge_and_store(client, window, rules, row_count, values)
+    results = build_scan_results(table, rules, total_rows, merged)
+    scan = ScanContext(table=table, row_count=row_count)
+    for rule in rules:
+        result = rule.finish(results[rule.rule_name], scan, client, plan, incremental=True)
+        result.details["incremental"] = window.describe(row_count)
+        results[rule.rule_name] = result
+    return results
+
+
+def run_dq_for_table(
+    db,
+    table: str,
+    mode: str = "exact",
+    target_error: Optional[float] = None,
+    client: Optional[WarehouseClient] = None,
+    rules: Optional[List[str]] = None,
+):
+    """
+    Run every rule (or only the named `rules`) for one table. Pass
+    `client` to reuse its catalog snapshot across tables. Outside stats
+    mode, each rule's status is scored against the table's metrics
+    history (app/dq/anomaly.py), and the time and rows each check unit
+    took are reported under "cost" and learned (app/dq/costs.py).
+    """
+    if mode not in RUN_MODES:
+        raise ValueError(f"Unknown DQ run mode: {mode}")
+    selected = select_rules(rules)
+    raise_if_cancelled()
+
+    client = client or WarehouseClient(db)
+    if mode == "stats":
+        return _stats_output(table, load_warehouse_stats(client, table).get(table), selected)
+    scan_rules = [r for r in selected if isinstance(r, ScanRule)]
+
+    seconds: Dict[str, float] = {}
+    rows: Dict[str, Optional[float]] = {}
+    sample = None
+    fused, scan_error = {}, None
+    if scan_rules:
+        started = time.monotonic()
         try:
-            result = rule.run(table, client)
+            if mode == "incremental":
+                fused = run_incremental_scan_rules(table, scan_rules, client)
+            else:
+                sample = plan_sample(client, table, target_error) if mode == "sample" else None
+                fused = run_scan_rules(table, scan_rules, client, sample=sample)
+            seconds[SCAN_UNIT] = time.monotonic() - started
+            rows[SCAN_UNIT] = _rows_read(fused)
+        except Exception as e:
+            scan_error = e
+    elif mode == "sample":
+        sample = plan_sample(client, table, target_error)
+
+    results = []
+    for rule in selected:
+        if isinstance(rule, ScanRule):
+            if scan_error is not None:
+                results.append(_error_result(rule, scan_error))
+            else:
+                results.append(fused[rule.rule_name].__dict__)
+            continue
+
+        try:
+            raise_if_cancelled()
+            started = time.monotonic()
+            if sample is not None:
+                result = rule.run_sampled(table, client, sample)
+            else:
+                result = rule.run(table, client)
+            seconds[rule.rule_name] = time.monotonic() - started
+            read = rule.rows_read(result.details)
+            # Otherwise assume the same rows (or sample) as the scan.
+            rows[rule.rule_name] = read if read is not None else rows.get(SCAN_UNIT)
             results.append(result.__dict__)
         except Exception as e:
-            results.append({
-                "rule": rule.rule_name,
-                "status": "error",
-                "details": {"error": str(e)},
-            })
+            results.append(_error_result(rule, e))
 
-    return {"table": table, "results": results}
+    output = {
+        "table": table,
+        "results": results,
+        "cost": {
+            "seconds": {unit: round(value, 4) for unit, value in seconds.items()},
+            "rows": rows,
+        },
+    }
+    if client.connection_key:
+        try:
+            apply_anomaly_scores(client.connection_key, output, selected, mode)
+        except Exception as e:
+            # Scores are advisory; the checks themselves still stand.
+            output["anomaly_error"] = str(e)
+        try:
+            record_rule_costs(client.connection_key, table, seconds, rows)
+        except Exception as e:
+            output["cost_error"] = str(e)
+    return output
+
+
+# Used when the engine's pool does not report a size.
+DEFAULT_DQ_WORKERS = 5
+
+
+def _pool_workers(engine) -> int:
+    """
+    One worker per pooled connection, so tables never queue on the pool,
+    and no more than the governor admits at once.
+    """
+    size = getattr(getattr(engine, "pool", None), "size", None)
+    workers = size() if callable(size) else DEFAULT_DQ_WORKERS
+    return max(1, min(workers, get_governor(engine).max_concurrent))
+
+
+def _run_dq_for_table_safe(db, table: str, scope: Optional[CancelScope] = None, **options):
+    try:
+        # Worker threads do not inherit the caller's context.
+        with use_cancel_scope(scope):
+            return run_dq_for_table(db, table, **options)
+    except QueryCancelled:
+        raise
+    except Exception as e:
+        return {"table": table, "error": str(e), "results": []}
+
+
+def iter_dq_for_all_tables(
+    db,
+    max_workers: Optional[int] = None,
+    client: Optional[WarehouseClient] = None,
+    **options,
+) -> Iterator[Dict]:
+    """
+    Run DQ for every table in parallel, yielding each table's output as
+    soon as it finishes. At most `max_workers` tables are in flight, so
+    memory stays flat regardless of warehouse size. `options` are passed
+    on to run_dq_for_table (mode, target_error). Pass `client` to scan a
+    named connection instead of the default one.
+    """
+    client = client or WarehouseClient(db)
+    if options.get("mode") == "stats":
+        # Nothing to parallelise: the whole warehouse is a few catalog queries.
+        yield from iter_dq_stats_for_all_tables(db, client)
+        return
+
+    # Loads the catalog snapshot once; every worker reads from it.
+    tables = iter(client.list_tables())
+    workers = max_workers or _pool_workers(client.engine)
+    options["client"] = client
+    options["scope"] = current_cancel_scope()
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="dq") as pool:
+        pending = {
+            pool.submit(_run_dq_for_table_safe, db, t, **options)
+            for t in islice(tables, workers)
+        }
+        try:
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    next_table = next(tables, None)
+                    if next_table is not None:
+                        pending.add(pool.submit(_run_dq_for_table_safe, db, next_table, **options))
+                    yield future.result()
+        finally:
+            # Consumer went away (e.g. client disconnected): drop queued work.
+            for future in pending:
+                future.cancel()
 
 
-def run_dq_for_all_tables(db):
-    client = WarehouseClient(db)
-    tables = client.list_tables()
+def run_dq_for_all_tables(db, max_workers: Optional[int] = None, client: Optional[WarehouseClient] = None, **options):
     output = {}
 
-    for t in tables:
-        output[t] = run_dq_for_table(db, t)
+    for table_output in iter_dq_for_all_tables(db, max_workers=max_workers, client=client, **options):
+        output[table_output["table"]] = table_output
 
     return output
@@ -0,0 +1,145 @@
+import math
+import random
+from dataclasses import dataclass
+from typing import Optional, Tuple
+from sqlalchemy import text
+
+
+# Default error bound: null fractions within ±1 percentage point ...
+DEFAULT_TARGET_ERROR = 0.01
+# ... at 95% confidence.
+DEFAULT_CONFIDENCE_Z = 1.96
+
+# Block sampling (Postgres SYSTEM, SQL Server TABLESAMPLE) returns whole pages,
+# so sampled rows are correlated. Oversample to keep the interval honest.
+BLOCK_SAMPLING_OVERSAMPLE = 3.0
+
+
+@dataclass
+class SampleSpec:
+    percent: float
+    method: str
+    target_error: float
+    z: float
+    seed: int
+    estimated_rows: Optional[int] = None
+
+    @property
+    def fraction(self) -> float:
+        return self.percent / 100.0
+
+    @property
+    def is_full_scan(self) -> bool:
+        return self.percent >= 100.0
+
+
+# ----------------------------------------------------------------------
+# Sample sizing
+# ----------------------------------------------------------------------
+def required_sample_size(target_error: float, z: float = DEFAULT_CONFIDENCE_Z) -> int:
+    """Rows needed so a proportion is within ±target_error (worst case p=0.5)."""
+    return math.ceil(z * z * 0.25 / (target_error * target_error))
+
+
+def estimate_table_rows(client, table: str) -> Optional[int]:
+    """Row estimate from the catalog, without touching the table."""
+    if client.dialect == "postgresql":
+        query = text(
+            "SELECT c.reltuples::bigint FROM pg_class c "
+            "WHERE c.oid = to_regclass(:table)"
+        )
+    elif client.dialect == "mssql":
+        query = text(
+            "SELECT SUM(ps.row_count) FROM sys.dm_db_partition_stats ps "
+            "WHERE ps.object_id = OBJECT_ID(:table) AND ps.index_id IN (0, 1)"
+        )
+    else:
+        return None
+
+    with client.connect() as conn:
+        rows = conn.execute(query, {"table": client.quote_table(table)}).scalar()
+
+    # Postgres reports -1 for never-analyzed tables.
+    if rows is None or rows < 0:
+        return None
+    return int(rows)
+
+
+def plan_sample(
+    client,
+    table: str,
+    target_error: Optional[float] = None,
+    z: float = DEFAULT_CONFIDENCE_Z,
+    method: str = "SYSTEM",
+) -> SampleSpec:
+    """Pick the sampling percentage that meets `target_error` for this table."""
+    target_error = target_error or DEFAULT_TARGET_ERROR
+    method = method.upper()
+    if method not in ("SYSTEM", "BERNOULLI"):
+        raise ValueError(f"Unknown sampling method: {method}")
+    if client.dialect == "mssql":
+        # SQL Server only offers page-level sampling.
+        method = "SYSTEM"
+
+    needed = required_sample_size(target_error, z)
+    if method == "SYSTEM":
+        needed = math.ceil(needed * BLOCK_SAMPLING_OVERSAMPLE)
+
+    estimated_rows = estimate_table_rows(client, table)
+    if not estimated_rows:
+        percent = 100.0
+    else:
+        percent = min(100.0, 100.0 * needed / estimated_rows)
+
+    return SampleSpec(
+        percent=percent,
+        method=method,
+        target_error=target_error,
+        z=z,
+        seed=random.randint(1, 2 ** 31 - 1),
+        estimated_rows=estimated_rows,
+    )
+
+
+def tablesample_clause(dialect: str, sample: SampleSpec) -> str:
+    if sample.is_full_scan:
+        return ""
+    # REPEATABLE keeps every batch of a fused scan on the same sample.
+    if dialect == "postgresql":
+        return f"TABLESAMPLE {sample.method} ({sample.percent:.6f}) REPEATABLE ({sample.seed})"
+    if dialect == "mssql":
+        return f"TABLESAMPLE ({sample.percent:.6f} PERCENT) REPEATABLE ({sample.seed})"
+    raise ValueError(f"Sampling is not supported on {dialect}")
+
+
+# ----------------------------------------------------------------------
+# Estimators
+# ----------------------------------------------------------------------
+def proportion_interval(successes: int, n: int, z: float = DEFAULT_CONFIDENCE_Z) -> Tuple[float, float]:
+    """Wilson score interval for a proportion."""
+    if n <= 0:
+        return 0.0, 1.0
+    p = successes / n
+    denom = 1 + z * z / n
+    centre = (p + z * z / (2 * n)) / denom
+    half = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / denom
+    return max(0.0, centre - half), min(1.0, centre + half)
+
+
+def scaled_count_interval(sampled: int, sample: SampleSpec) -> Tuple[int, int, int]:
+    """Estimate of a table-wide count from its sampled count, with interval."""
+    f = sample.fraction
+    if f >= 1.0:
+        return sampled, sampled, sampled
+    estimate = sampled / f
+    half = sample.z * math.sqrt(sampled * (1 - f)) / f
+    return round(estimate), max(sampled, round(estimate - half)), round(estimate + half)
+
+
+def sample_details(sampled_rows: int, sample: SampleSpec) -> dict:
+    return {
+        "sampled_rows": sampled_rows,
+        "sample_percent": round(sample.percent, 6),
+        "sample_method": sample.method,
+        "confidence_z": sample.z,
+    }
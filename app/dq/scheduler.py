@@ -0,0 +1,497 @@
+# app/dq/scheduler.py
+"""
+Adaptive DQ scheduler: runs checks continuously in the background,
+within a per-warehouse budget.
+
+Work is split into check units per table: the fused scan ("scan", every
+ScanRule in one query) and each other rule on its own. Every unit has an
+interval
+
+    BASE_INTERVAL × sqrt(cost / CHEAP_SECONDS) / priority
+
+clipped to [MIN_INTERVAL, MAX_INTERVAL], so cheap catalog checks
+(schema, freshness) run often and expensive scans rarely. The cost is
+the unit's learned average duration (app/dq/costs.py). A table's
+priority grows with its business tier (DQTableConfig.tier), its change
+rate (share of recent runs whose row count moved) and its anomaly rate
+(moving average of scheduled runs that warned or failed).
+
+Each tick, the most overdue units are dispatched while the warehouse's
+budget allows: at most DQ_SCHEDULER_MAX_CONCURRENT units in flight, and
+query-seconds and rows read over the last hour under their limits.
+Units are charged their estimate on dispatch and their observed cost
+when they finish.
+"""
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Deque, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from app.core.db_connection import SessionLocal
+from app.core.settings import settings
+from app.db.connection import registry
+from app.db.models import DQMetricPoint, DQScheduleState, DQTableConfig
+from app.dq.anomaly import STATUS_ORDER, _history_matrix
+from app.dq.costs import SCAN_UNIT, load_rule_costs
+from app.dq.incremental import detect_watermark
+from app.dq.rules import ScanRule
+from app.dq.runner import ALL_RULES, run_dq_for_table
+from app.dq.sampling import estimate_table_rows, plan_sample
+from app.dq.table_config import get_table_config
+from app.warehouse.cancel import CancelScope, QueryCancelled, use_cancel_scope
+from app.warehouse.client import WarehouseClient
+from app.warehouse.governor import get_governor
+
+logger = logging.getLogger(__name__)
+
+# Priority multiplier per business tier (1 = critical).
+TIER_WEIGHTS = {1: 4.0, 2: 2.0, 3: 1.0}
+# Recent row counts the change rate is measured over.
+CHANGE_HISTORY_POINTS = 20
+# Weight of the newest run in the anomaly rate.
+ANOMALY_EWMA_ALPHA = 0.2
+BUDGET_WINDOW_SECONDS = 3600
+RECENT_RUNS = 100
+
+
+def check_units() -> Dict[str, List[str]]:
+    """Unit name → rule names: the fused scan, then every other rule alone."""
+    units = {SCAN_UNIT: [r.rule_name for r in ALL_RULES if isinstance(r, ScanRule)]}
+    for rule in ALL_RULES:
+        if not isinstance(rule, ScanRule):
+            units[rule.rule_name] = [rule.rule_name]
+    return {unit: rules for unit, rules in units.items() if rules}
+
+
+def _unit_reads_rows(unit: str) -> bool:
+    return unit == SCAN_UNIT or any(r.reads_rows for r in ALL_RULES if r.rule_name == unit)
+
+
+# ----------------------------------------------------------------------
+# Priorities and plan
+# ----------------------------------------------------------------------
+def _change_rates(connection_key: str, tables: List[str]) -> np.ndarray:
+    """Share of consecutive recorded row counts that differ; 1 for tables without history."""
+    index = {table: i for i, table in enumerate(tables)}
+    since = time.time() - settings.DQ_METRICS_RETENTION_DAYS * 86400
+    db = SessionLocal()
+    try:
+        rows = (
+            db.query(DQMetricPoint.table_name, DQMetricPoint.recorded_at, DQMetricPoint.value)
+            .filter(
+                DQMetricPoint.connection_key == connection_key,
+                DQMetricPoint.metric == "row_count",
+                DQMetricPoint.column_name == "",
+                DQMetricPoint.recorded_at >= since,
+            )
+            .order_by(DQMetricPoint.recorded_at)
+            .all()
+        )
+    finally:
+        db.close()
+
+    rows = [r for r in rows if r[0] in index]
+    series = np.fromiter((index[r[0]] for r in rows), dtype=np.int64, count=len(rows))
+    times = np.fromiter((r[1] for r in rows), dtype=np.float64, count=len(rows))
+    values = np.fromiter((r[2] for r in rows), dtype=np.float64, count=len(rows))
+    history, _ = _history_matrix(series, times, values, len(tables), CHANGE_HISTORY_POINTS + 1)
+
+    # Series are right-aligned; steps touching the NaN padding are NaN.
+    steps = np.diff(history, axis=1)
+    observed = np.count_nonzero(~np.isnan(steps), axis=1)
+    moved = np.count_nonzero(~np.isnan(steps) & (steps != 0), axis=1)
+    return np.where(observed > 0, moved / np.maximum(observed, 1), 1.0)
+
+
+def _load_states(connection_key: str) -> Dict[Tuple[str, str], Tuple[float, float, Optional[str]]]:
+    """(table, unit) → (last_run_at, anomaly_rate, last_status)."""
+    db = SessionLocal()
+    try:
+        rows = db.query(
+            DQScheduleState.table_name,
+            DQScheduleState.unit,
+            DQScheduleState.last_run_at,
+            DQScheduleState.anomaly_rate,
+            DQScheduleState.last_status,
+        ).filter(DQScheduleState.connection_key == connection_key)
+        return {(table, unit): (last_run, rate, status) for table, unit, last_run, rate, status in rows}
+    finally:
+        db.close()
+
+
+def _load_tiers(connection_key: str) -> Dict[str, int]:
+    db = SessionLocal()
+    try:
+        rows = db.query(DQTableConfig.table_name, DQTableConfig.tier).filter(
+            DQTableConfig.connection_key == connection_key, DQTableConfig.tier.isnot(None)
+        )
+        return dict(rows)
+    finally:
+        db.close()
+
+
+def plan_units(connection_key: str, tables: List[str], now: Optional[float] = None) -> List[Dict]:
+    """
+    Every (table, unit) with its priority, interval and learned cost, most
+    urgent first. Urgency is time since the last run over the interval;
+    units that never ran come first.
+    """
+    now = time.time() if now is None else now
+    if not tables:
+        return []
+    units = check_units()
+    states = _load_states(connection_key)
+    costs = load_rule_costs(connection_key)
+    tiers = _load_tiers(connection_key)
+
+    tier = np.array([tiers.get(t, settings.DQ_SCHEDULER_DEFAULT_TIER) for t in tables])
+    tier_weight = np.array([TIER_WEIGHTS.get(int(t), 1.0) for t in tier])
+    change_rate = _change_rates(connection_key, tables)
+    anomaly_rate = np.zeros(len(tables))
+    for i, table in enumerate(tables):
+        anomaly_rate[i] = max((states[(table, u)][1] for u in units if (table, u) in states), default=0.0)
+    priority = tier_weight * (1.0 + change_rate) * (1.0 + 2.0 * anomaly_rate)
+
+    plan = []
+    for unit, rules in units.items():
+        learned = [costs.get((t, unit)) for t in tables]
+        seconds = np.array([c[0] if c else settings.DQ_SCHEDULER_DEFAULT_SECONDS for c in learned])
+        last_run = np.array([states[(t, unit)][0] if (t, unit) in states else np.nan for t in tables])
+
+        stretch = np.sqrt(np.maximum(seconds / settings.DQ_SCHEDULER_CHEAP_SECONDS, 1.0))
+        interval = np.clip(
+            settings.DQ_SCHEDULER_BASE_INTERVAL_SECONDS * stretch / priority,
+            settings.DQ_SCHEDULER_MIN_INTERVAL_SECONDS,
+            settings.DQ_SCHEDULER_MAX_INTERVAL_SECONDS,
+        )
+        urgency = np.where(np.isnan(last_run), np.inf, (now - last_run) / interval)
+
+        for i, table in enumerate(tables):
+            plan.append({
+                "table": table,
+                "unit": unit,
+                "rules": rules,
+                "tier": int(tier[i]),
+                "change_rate": round(float(change_rate[i]), 3),
+                "anomaly_rate": round(float(anomaly_rate[i]), 3),
+                "priority": round(float(priority[i]), 3),
+                "interval_seconds": round(float(interval[i]), 1),
+                "urgency": float(urgency[i]),
+                "due": bool(urgency[i] >= 1.0),
+                "last_run_at": None if np.isnan(last_run[i]) else float(last_run[i]),
+                "last_status": states.get((table, unit), (None, None, None))[2],
+                "est_seconds": round(float(seconds[i]), 4),
+                "est_rows": learned[i][1] if learned[i] else None,
+            })
+
+    # Never-run units first, then by urgency; ties go to the higher priority.
+    plan.sort(key=lambda u: (-u["urgency"], -u["priority"]))
+    return plan
+
+
+# ----------------------------------------------------------------------
+# Budget
+# ----------------------------------------------------------------------
+class WarehouseBudget:
+    """Query-seconds and rows read over a sliding hour, plus units in flight."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # [charged_at, seconds, rows]; in-flight entries hold the estimate.
+        self._spent: Deque[List[float]] = deque()
+        self.in_flight: Set[Tuple[str, str]] = set()
+
+    def _used(self, now: float) -> Tuple[float, float]:
+        while self._spent and self._spent[0][0] < now - BUDGET_WINDOW_SECONDS:
+            self._spent.popleft()
+        return sum(e[1] for e in self._spent), sum(e[2] for e in self._spent)
+
+    def try_reserve(self, key: Tuple[str, str], seconds: float, rows: float, max_concurrent: int, now: float):
+        """Charge an estimate if it fits; returns the entry to settle, or None."""
+        # A unit costlier than the whole hourly budget still gets through,
+        # once the window is empty; otherwise it would never run (and never
+        # learn its real cost).
+        seconds = min(seconds, settings.DQ_SCHEDULER_QUERY_SECONDS_PER_HOUR)
+        rows = min(rows, settings.DQ_SCHEDULER_ROWS_PER_HOUR)
+        with self._lock:
+            if key in self.in_flight or len(self.in_flight) >= max_concurrent:
+                return None
+            used_seconds, used_rows = self._used(now)
+            if used_seconds + seconds > settings.DQ_SCHEDULER_QUERY_SECONDS_PER_HOUR:
+                return None
+            if used_rows + rows > settings.DQ_SCHEDULER_ROWS_PER_HOUR:
+                return None
+            entry = [now, seconds, rows]
+            self._spent.append(entry)
+            self.in_flight.add(key)
+            return entry
+
+    def remaining(self, now: float) -> Tuple[float, float]:
+        """Query-seconds and rows still available in the current window."""
+        with self._lock:
+            used_seconds, used_rows = self._used(now)
+        return (
+            settings.DQ_SCHEDULER_QUERY_SECONDS_PER_HOUR - used_seconds,
+            settings.DQ_SCHEDULER_ROWS_PER_HOUR - used_rows,
+        )
+
+    def settle(self, key: Tuple[str, str], entry: List[float], seconds: float, rows: float) -> None:
+        """Replace a reservation with the unit's observed cost."""
+        with self._lock:
+            entry[1], entry[2] = seconds, rows
+            self.in_flight.discard(key)
+
+    def stats(self, now: float) -> Dict:
+        with self._lock:
+            used_seconds, used_rows = self._used(now)
+            return {
+                "query_seconds_last_hour": round(used_seconds, 2),
+                "query_seconds_limit": settings.DQ_SCHEDULER_QUERY_SECONDS_PER_HOUR,
+                "rows_last_hour": int(used_rows),
+                "rows_limit": settings.DQ_SCHEDULER_ROWS_PER_HOUR,
+                "in_flight": sorted(f"{table}:{unit}" for table, unit in self.in_flight),
+            }
+
+
+# ----------------------------------------------------------------------
+# Scheduler
+# ----------------------------------------------------------------------
+def _record_run(connection_key: str, table: str, unit: str, started_at: float, status: str, error: Optional[str]):
+    db = SessionLocal()
+    try:
+        state = (
+            db.query(DQScheduleState)
+            .filter(
+                DQScheduleState.connection_key == connection_key,
+                DQScheduleState.table_name == table,
+                DQScheduleState.unit == unit,
+            )
+            .first()
+        )
+        if state is None:
+            state = DQScheduleState(connection_key=connection_key, table_name=table, unit=unit, runs=0, anomaly_rate=0.0)
+            db.add(state)
+        state.last_run_at = started_at
+        state.last_status = status
+        state.last_error = error
+        state.runs += 1
+        if status in STATUS_ORDER:
+            flagged = 1.0 if status != "pass" else 0.0
+            state.anomaly_rate += ANOMALY_EWMA_ALPHA * (flagged - state.anomaly_rate)
+        db.commit()
+    finally:
+        db.close()
+
+
+def _worst_status(output: Dict) -> str:
+    statuses = [r["status"] for r in output.get("results", [])]
+    if output.get("error") or "error" in statuses:
+        return "error"
+    scored = [s for s in statuses if s in STATUS_ORDER]
+    return max(scored, key=STATUS_ORDER.get) if scored else "skipped"
+
+
+class DQScheduler:
+    """
+    Background thread that ticks every DQ_SCHEDULER_TICK_SECONDS over all
+    registered connections. Schedule state lives in the internal DB
+    (dq_schedule_state, dq_rule_costs); budgets and recent runs are kept
+    in memory and start empty after a restart.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._scope = CancelScope()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._budgets: Dict[str, WarehouseBudget] = {}
+        self._recent: Deque[Dict] = deque(maxlen=RECENT_RUNS)
+        self._last_tick: Optional[float] = None
+        self._errors: Dict[str, str] = {}
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        with self._lock:
+            if self.running:
+                return
+            self._stop = threading.Event()
+            self._scope = CancelScope()
+            self._executor = ThreadPoolExecutor(
+                max_workers=settings.DQ_SCHEDULER_MAX_CONCURRENT, thread_name_prefix="dq-sched"
+            )
+            self._thread = threading.Thread(target=self._loop, name="dq-scheduler", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        with self._lock:
+            thread, executor = self._thread, self._executor
+            self._thread = self._executor = None
+        if thread is None:
+            return
+        self._stop.set()
+        # Aborts the units still running on the warehouse.
+        self._scope.cancel()
+        thread.join(timeout)
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            self.tick()
+            self._stop.wait(settings.DQ_SCHEDULER_TICK_SECONDS)
+
+    def _budget(self, connection: str) -> WarehouseBudget:
+        with self._lock:
+            return self._budgets.setdefault(connection, WarehouseBudget())
+
+    # ------------------------------------------------------------------
+    # Tick
+    # ------------------------------------------------------------------
+    def tick(self) -> None:
+        self._last_tick = time.time()
+        for connection in registry.list_connections():
+            name = connection["name"]
+            try:
+                self._tick_connection(name)
+                self._errors.pop(name, None)
+            except Exception as e:
+                logger.warning("DQ scheduler tick failed for %s: %s", name, e)
+                self._errors[name] = str(e)
+
+    def _tick_connection(self, name: str) -> None:
+        client = WarehouseClient(None, name)
+        connection_key = client.connection_key
+        executor = self._executor
+        if not connection_key or executor is None:
+            return
+        budget = self._budget(name)
+        # The scheduler never takes more than the governor would admit.
+        max_concurrent = min(settings.DQ_SCHEDULER_MAX_CONCURRENT, get_governor(client.engine).max_concurrent)
+
+        now = time.time()
+        for unit in plan_units(connection_key, client.list_tables(), now):
+            if not unit["due"] or len(budget.in_flight) >= max_concurrent or self._stop.is_set():
+                break
+            # Budget checks come before anything that queries the warehouse:
+            # a spent budget must not turn into catalog queries every tick.
+            left_seconds, left_rows = budget.remaining(now)
+            if left_seconds <= 0:
+                break
+            if min(unit["est_seconds"], settings.DQ_SCHEDULER_QUERY_SECONDS_PER_HOUR) > left_seconds:
+                # A cheaper, less urgent unit may still fit.
+                continue
+            reads_rows = _unit_reads_rows(unit["unit"])
+            if reads_rows and (
+                left_rows <= 0
+                or (unit["est_rows"] is not None and min(unit["est_rows"], settings.DQ_SCHEDULER_ROWS_PER_HOUR) > left_rows)
+            ):
+                continue
+            key = (unit["table"], unit["unit"])
+            try:
+                mode = self._mode(client, unit)
+            except Exception as e:
+                # e.g. the table was dropped since the catalog snapshot.
+                logger.warning("DQ scheduler skipped %s:%s: %s", unit["table"], unit["unit"], e)
+                continue
+            est_rows = unit["est_rows"]
+            if est_rows is None:
+                est_rows = self._estimate_rows(client, unit["table"], mode) if reads_rows else 0
+            entry = budget.try_reserve(key, unit["est_seconds"], est_rows, max_concurrent, now)
+            if entry is None:
+                # Over budget: a cheaper, less urgent unit may still fit.
+                continue
+            try:
+                executor.submit(self._run_unit, client, unit, mode, budget, entry)
+            except RuntimeError:
+                # Shut down while ticking.
+                budget.settle(key, entry, 0.0, 0.0)
+                return
+
+    @staticmethod
+    def _estimate_rows(client, table: str, mode: str) -> float:
+        """
+        Rows the first run of a row-reading unit will read: the planned
+        sample in sample mode, otherwise the whole table (an incremental
+        first run has no watermark yet).
+        """
+        try:
+            if mode == "sample":
+                sample = plan_sample(client, table)
+                return float((sample.estimated_rows or 0) * min(sample.fraction, 1.0))
+            return float(estimate_table_rows(client, table) or 0)
+        except Exception:
+            return 0.0
+
+    def _mode(self, client, unit: Dict) -> str:
+        if unit["unit"] != SCAN_UNIT:
+            return "sample" if _unit_reads_rows(unit["unit"]) else "exact"
+        db = SessionLocal()
+        try:
+            config = get_table_config(db, client.connection_key, unit["table"])
+        finally:
+            db.close()
+        if (config is not None and config.watermark_column) or detect_watermark(client, unit["table"]):
+            return "incremental"
+        return "sample"
+
+    def _run_unit(self, client, unit: Dict, mode: str, budget: WarehouseBudget, entry: List[float]) -> None:
+        table, name = unit["table"], unit["unit"]
+        started = time.time()
+        seconds = rows = 0.0
+        output: Dict = {}
+        error = None
+        try:
+            with use_cancel_scope(self._scope):
+                output = run_dq_for_table(None, table, mode=mode, client=client, rules=unit["rules"])
+            cost = output.get("cost", {})
+            seconds = sum(cost.get("seconds", {}).values())
+            rows = sum(r for r in cost.get("rows", {}).values() if r)
+        except QueryCancelled:
+            budget.settle((table, name), entry, time.time() - started, 0.0)
+            return
+        except Exception as e:
+            seconds = time.time() - started
+            error = str(e)
+        status = "error" if error else _worst_status(output)
+        budget.settle((table, name), entry, seconds, rows)
+
+        try:
+            _record_run(client.connection_key, table, name, started, status, error)
+        except Exception as e:
+            logger.warning("DQ scheduler could not record %s:%s: %s", table, name, e)
+        self._recent.appendleft({
+            "connection": client.connection,
+            "table": table,
+            "unit": name,
+            "status": status,
+            "seconds": round(seconds, 3),
+            "rows": int(rows),
+            "started_at": started,
+            **({"error": error} if error else {}),
+        })
+
+    # ------------------------------------------------------------------
+    # Status
+    # ------------------------------------------------------------------
+    def status(self) -> Dict:
+        now = time.time()
+        with self._lock:
+            budgets = dict(self._budgets)
+        return {
+            "enabled": settings.DQ_SCHEDULER_ENABLED,
+            "running": self.running,
+            "last_tick_at": self._last_tick,
+            "budgets": {key: budget.stats(now) for key, budget in budgets.items()},
+            "errors": dict(self._errors),
+            "recent_runs": list(self._recent),
+        }
+
+
+scheduler = DQScheduler()
@@ -0,0 +1,172 @@
+# app/dq/schema_drift.py
+"""
+Schema drift: each table's schema (column names, types and nullability
+in order, primary key, foreign keys, unique indexes) is reduced to a
+SHA-256 fingerprint and stored in the internal DB with the schema itself.
+A drift check hashes the current catalog snapshot in memory, compares
+fingerprints only, and loads stored schemas just for the tables whose
+fingerprint changed, to diff their columns and keys.
+"""
+import hashlib
+import json
+import time
+from typing import Dict, Iterable, List, Optional, Union
+
+from app.core.db_connection import SessionLocal
+from app.db.models import DQSchemaFingerprint
+from app.warehouse.catalog import TableInfo
+
+# Keeps IN (...) lists well under every backend's bind parameter limit.
+_IN_CHUNK = 500
+
+
+# ----------------------------------------------------------------------
+# Fingerprints and diffs
+# ----------------------------------------------------------------------
+def schema_signature(table: TableInfo) -> Dict:
+    """The parts of a table's schema that count as drift, in canonical form."""
+    return {
+        "columns": [[c.name, c.type, bool(c.nullable)] for c in table.columns],
+        "primary_key": list(table.primary_key),
+        # Constraint and index names are often generated; only their content counts.
+        "foreign_keys": sorted([fk.columns, fk.referred_table, fk.referred_columns] for fk in table.foreign_keys),
+        "unique": sorted(ix.columns for ix in table.indexes if ix.unique and not ix.primary_key),
+    }
+
+
+def fingerprint(signature: Dict) -> str:
+    return hashlib.sha256(json.dumps(signature, sort_keys=True, separators=(",", ":")).encode()).hexdigest()
+
+
+def diff_schemas(before: Dict, after: Dict) -> Dict:
+    """
+    Column and key changes between two signatures. Severity is "fail" when
+    columns disappear or change type (downstream queries break), "warn"
+    otherwise.
+    """
+    old = {name: (col_type, nullable) for name, col_type, nullable in before["columns"]}
+    new = {name: (col_type, nullable) for name, col_type, nullable in after["columns"]}
+
+    changed = []
+    for name in old.keys() & new.keys():
+        (old_type, old_null), (new_type, new_null) = old[name], new[name]
+        change = {}
+        if old_type != new_type:
+            change["type"] = [old_type, new_type]
+        if old_null != new_null:
+            change["nullable"] = [old_null, new_null]
+        if change:
+            changed.append({"column": name, **change})
+
+    diff = {
+        "added_columns": [name for name in new if name not in old],
+        "removed_columns": [name for name in old if name not in new],
+        "changed_columns": sorted(changed, key=lambda c: c["column"]),
+    }
+    kept_order = [name for name in old if name in new]
+    if kept_order != [name for name in new if name in old]:
+        diff["column_order_changed"] = True
+    keys = {
+        key: {"before": before[key], "after": after[key]}
+        for key in ("primary_key", "foreign_keys", "unique")
+        if before[key] != after[key]
+    }
+    if keys:
+        diff["key_changes"] = keys
+
+    breaking = diff["removed_columns"] or any("type" in c for c in changed)
+    diff["severity"] = "fail" if breaking else "warn"
+    return diff
+
+
+# ----------------------------------------------------------------------
+# Store
+# ----------------------------------------------------------------------
+def _chunks(items: List[str]) -> Iterable[List[str]]:
+    for start in range(0, len(items), _IN_CHUNK):
+        yield items[start:start + _IN_CHUNK]
+
+
+def _stored_fingerprints(db, connection_key: str, tables: Optional[List[str]]) -> Dict[str, str]:
+    query = db.query(DQSchemaFingerprint.table_name, DQSchemaFingerprint.fingerprint).filter(
+        DQSchemaFingerprint.connection_key == connection_key
+    )
+    if tables is None:
+        return dict(query.all())
+    stored: Dict[str, str] = {}
+    for chunk in _chunks(tables):
+        stored.update(query.filter(DQSchemaFingerprint.table_name.in_(chunk)).all())
+    return stored
+
+
+def _stored_rows(db, connection_key: str, tables: List[str]) -> Dict[str, DQSchemaFingerprint]:
+    rows: Dict[str, DQSchemaFingerprint] = {}
+    for chunk in _chunks(tables):
+        for row in db.query(DQSchemaFingerprint).filter(
+            DQSchemaFingerprint.connection_key == connection_key,
+            DQSchemaFingerprint.table_name.in_(chunk),
+        ):
+            rows[row.table_name] = row
+    return rows
+
+
+# ----------------------------------------------------------------------
+# Drift check
+# ----------------------------------------------------------------------
+def detect_drift(client, tables: Optional[List[str]] = None, record: Union[bool, str] = True) -> Dict:
+    """
+    Compare the catalog snapshot with the stored fingerprints of every
+    table (or only `tables`). With `record=True` new fingerprints become
+    the baseline, so each change is reported once; `record="new"` only
+    baselines tables seen for the first time, leaving changes reported
+    until a recording check acknowledges them. Named tables missing from
+    the catalog count as dropped.
+    """
+    snapshot = client.catalog()
+    names = snapshot.list_tables() if tables is None else [t for t in tables if t in snapshot.tables]
+    signatures = {name: schema_signature(snapshot.get_table(name)) for name in names}
+    current = {name: fingerprint(sig) for name, sig in signatures.items()}
+
+    connection_key = client.connection_key
+    db = SessionLocal()
+    try:
+        stored = _stored_fingerprints(db, connection_key, tables)
+        new_tables = [name for name in current if name not in stored]
+        changed_tables = [name for name in current if name in stored and stored[name] != current[name]]
+        dropped = [name for name in stored if name not in current]
+
+        # Only drifted tables pay for loading their stored schema.
+        rows = _stored_rows(db, connection_key, changed_tables)
+        changed = {name: diff_schemas(rows[name].schema, signatures[name]) for name in changed_tables}
+
+        if record == "new":
+            changed_to_store, dropped_to_delete = [], []
+        else:
+            changed_to_store, dropped_to_delete = changed_tables, dropped
+        if record and (changed_to_store or new_tables or dropped_to_delete):
+            now = time.time()
+            for name in changed_to_store + new_tables:
+                row = rows.get(name)
+                if row is None:
+                    row = DQSchemaFingerprint(connection_key=connection_key, table_name=name)
+                    db.add(row)
+                row.fingerprint = current[name]
+                row.schema = signatures[name]
+                row.recorded_at = now
+            for chunk in _chunks(dropped_to_delete):
+                db.query(DQSchemaFingerprint).filter(
+                    DQSchemaFingerprint.connection_key == connection_key,
+                    DQSchemaFingerprint.table_name.in_(chunk),
+                ).delete(synchronize_session=False)
+            db.commit()
+    finally:
+        db.close()
+
+    return {
+        "tables_checked": len(current),
+        # Tables seen for the first time; their schema is now the baseline.
+        "new_tables": new_tables,
+        "dropped_tables": dropped,
+        "changed_tables": changed,
+        "fingerprints": current if tables is not None else {},
+    }
@@ -0,0 +1,390 @@
+# app/dq/sketches.py
+"""
+Mergeable column sketches for profiling, updated one NumPy batch at a time:
+- HyperLogLog for distinct counts,
+- t-digest for quantiles,
+- Space-Saving for the most frequent values.
+
+Sketches with the same parameters merge, so sketches built over different
+partitions, samples or runs can be combined; ColumnSketch bundles the
+three per column and serializes them for the internal DB.
+"""
+import io
+import json
+import math
+from datetime import timezone
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+
+# ----------------------------------------------------------------------
+# Hashing (64-bit, vectorized)
+# ----------------------------------------------------------------------
+# Only the first characters of long strings are hashed; the full length is
+# mixed in, so long values sharing a prefix still rarely collide.
+_MAX_HASHED_CHARS = 64
+
+
+def _splitmix64(x: np.ndarray) -> np.ndarray:
+    x = x.astype(np.uint64, copy=True)
+    x += np.uint64(0x9E3779B97F4A7C15)
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def hash_numbers(values: np.ndarray) -> np.ndarray:
+    """Hash float64 values by their bit pattern (1 and 1.0 hash alike)."""
+    values = np.asarray(values, dtype=np.float64) + 0.0  # folds -0.0 into 0.0
+    return _splitmix64(values.view(np.uint64))
+
+
+def hash_strings(values: np.ndarray) -> np.ndarray:
+    """Hash an array of str: UTF-8 bytes mixed eight at a time, then the length."""
+    values = np.asarray(values, dtype=str)
+    if values.size == 0:
+        return np.zeros(0, dtype=np.uint64)
+    lengths = np.strings.str_len(values).astype(np.uint64)
+    encoded = np.strings.encode(values.astype(f"<U{_MAX_HASHED_CHARS}"), "utf-8")
+
+    width = max(encoded.dtype.itemsize, 1)
+    padded = -(-width // 8) * 8
+    raw = np.zeros((values.size, padded), dtype=np.uint8)
+    raw[:, :encoded.dtype.itemsize] = np.frombuffer(encoded.tobytes(), dtype=np.uint8).reshape(
+        values.size, encoded.dtype.itemsize
+    )
+    words = raw.view("<u8")
+
+    h = np.full(values.size, 0xCBF29CE484222325, dtype=np.uint64)
+    for j in range(words.shape[1]):
+        h = _splitmix64(h ^ words[:, j])
+    return _splitmix64(h ^ lengths)
+
+
+# ----------------------------------------------------------------------
+# HyperLogLog
+# ----------------------------------------------------------------------
+def _leading_zeros64(x: np.ndarray) -> np.ndarray:
+    x = x.copy()
+    zeros = np.zeros(x.shape, dtype=np.uint8)
+    for shift in (32, 16, 8, 4, 2, 1):
+        empty_top = (x >> np.uint64(64 - shift)) == 0
+        zeros[empty_top] += shift
+        x[empty_top] <<= np.uint64(shift)
+    zeros[x == 0] = 64
+    return zeros
+
+
+class HyperLogLog:
+    """2^p one-byte registers; relative error about 1.04 / sqrt(2^p)."""
+
+    def __init__(self, p: int = 12, registers: Optional[np.ndarray] = None):
+        if not 4 <= p <= 18:
+            raise ValueError("HyperLogLog precision must be between 4 and 18")
+        self.p = p
+        self.m = 1 << p
+        self.registers = registers if registers is not None else np.zeros(self.m, dtype=np.uint8)
+
+    def update(self, hashes: np.ndarray) -> None:
+        if hashes.size == 0:
+            return
+        index = (hashes >> np.uint64(64 - self.p)).astype(np.intp)
+        rank = np.minimum(_leading_zeros64(hashes << np.uint64(self.p)) + 1, 64 - self.p + 1)
+        np.maximum.at(self.registers, index, rank.astype(np.uint8))
+
+    def merge(self, other: "HyperLogLog") -> None:
+        if other.p != self.p:
+            raise ValueError("Cannot merge HyperLogLog sketches of different precision")
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def estimate(self) -> float:
+        m = self.m
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / float(np.sum(np.ldexp(1.0, -self.registers.astype(np.int64))))
+        empty = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * m and empty:
+            # Small cardinalities: linear counting is more accurate.
+            return m * math.log(m / empty)
+        return raw
+
+
+# ----------------------------------------------------------------------
+# t-digest (merging variant, k1 scale)
+# ----------------------------------------------------------------------
+class TDigest:
+    """
+    Quantile sketch: weighted centroids, small near the tails. Incoming
+    values are buffered and folded in with one vectorized merge pass.
+    """
+
+    def __init__(
+        self,
+        compression: float = 100.0,
+        means: Optional[np.ndarray] = None,
+        weights: Optional[np.ndarray] = None,
+        min_value: float = math.inf,
+        max_value: float = -math.inf,
+    ):
+        self.compression = compression
+        self.means = means if means is not None else np.zeros(0)
+        self.weights = weights if weights is not None else np.zeros(0)
+        self.min = min_value
+        self.max = max_value
+        self._buffer: List[np.ndarray] = []
+        self._buffered = 0
+
+    @property
+    def count(self) -> float:
+        return float(self.weights.sum()) + self._buffered
+
+    def update(self, values: np.ndarray) -> None:
+        values = np.asarray(values, dtype=np.float64)
+        values = values[np.isfinite(values)]
+        if values.size == 0:
+            return
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self._buffer.append(values)
+        self._buffered += values.size
+        if self._buffered >= 20 * self.compression:
+            self._compress()
+
+    def merge(self, other: "TDigest") -> None:
+        other._compress()
+        self._compress(other.means, other.weights)
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def _compress(self, extra_means: Optional[np.ndarray] = None, extra_weights: Optional[np.ndarray] = None) -> None:
+        means = [self.means, *self._buffer]
+        weights = [self.weights, *(np.ones(b.size) for b in self._buffer)]
+        if extra_means is not None:
+            means.append(extra_means)
+            weights.append(extra_weights)
+        self._buffer, self._buffered = [], 0
+
+        means, weights = np.concatenate(means), np.concatenate(weights)
+        if means.size == 0:
+            return
+        order = np.argsort(means, kind="stable")
+        means, weights = means[order], weights[order]
+
+        # Points whose mid-rank falls in the same unit of the k1 scale
+        # k(q) = compression / (2 pi) * asin(2q - 1) share a centroid.
+        total = weights.sum()
+        q = (np.cumsum(weights) - weights / 2) / total
+        k = self.compression / (2 * math.pi) * np.arcsin(2 * q - 1)
+        cluster = np.floor(k - k[0]).astype(np.int64)
+        starts = np.flatnonzero(np.r_[True, cluster[1:] != cluster[:-1]])
+
+        merged_weights = np.add.reduceat(weights, starts)
+        self.means = np.add.reduceat(means * weights, starts) / merged_weights
+        self.weights = merged_weights
+
+    def quantiles(self, qs: Sequence[float]) -> Optional[List[float]]:
+        self._compress()
+        total = self.weights.sum()
+        if total == 0:
+            return None
+        centres = np.cumsum(self.weights) - self.weights / 2
+        ranks = np.clip(np.asarray(qs, dtype=np.float64), 0.0, 1.0) * total
+        xs = np.r_[0.0, centres, total]
+        ys = np.r_[self.min, self.means, self.max]
+        return [float(v) for v in np.interp(ranks, xs, ys)]
+
+
+# ----------------------------------------------------------------------
+# Space-Saving (top-k)
+# ----------------------------------------------------------------------
+class SpaceSaving:
+    """
+    Heavy hitters with `capacity` counters (a few times the `k` reported).
+    A value's true count lies in [count - error, count].
+    """
+
+    def __init__(self, k: int = 10, capacity: Optional[int] = None):
+        self.k = k
+        self.capacity = capacity or 4 * k
+        self.counts: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+        self.n = 0
+
+    def _floor(self) -> int:
+        """Count an unmonitored value may have had: the smallest counter once full."""
+        if len(self.counts) < self.capacity:
+            return 0
+        return min(self.counts.values())
+
+    def update(self, keys: np.ndarray) -> None:
+        if keys.size == 0:
+            return
+        # Pre-aggregate the batch, then fold it in as an exact summary.
+        values, counts = np.unique(keys, return_counts=True)
+        self._merge(dict(zip(values.tolist(), counts.tolist())), {}, 0)
+        self.n += int(keys.size)
+
+    def merge(self, other: "SpaceSaving") -> None:
+        self._merge(other.counts, other.errors, other._floor())
+        self.n += other.n
+
+    def _merge(self, counts: Dict[str, int], errors: Dict[str, int], other_floor: int) -> None:
+        floor = self._floor()
+        merged_counts, merged_errors = {}, {}
+        for key in self.counts.keys() | counts.keys():
+            merged_counts[key] = self.counts.get(key, floor) + counts.get(key, other_floor)
+            merged_errors[key] = self.errors.get(key, floor) + errors.get(key, other_floor)
+
+        keep = sorted(merged_counts, key=merged_counts.get, reverse=True)[:self.capacity]
+        self.counts = {key: merged_counts[key] for key in keep}
+        self.errors = {key: merged_errors[key] for key in keep}
+
+    def top(self, k: Optional[int] = None) -> List[Dict]:
+        keys = sorted(self.counts, key=self.counts.get, reverse=True)[:k or self.k]
+        return [{"value": key, "count": self.counts[key], "error": self.errors[key]} for key in keys]
+
+
+# ----------------------------------------------------------------------
+# Per-column bundle
+# ----------------------------------------------------------------------
+SKETCH_KINDS = ("numeric", "temporal", "text", "other")
+QUANTILES = (0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99)
+
+_EPOCH_US = np.datetime64(0, "us")
+
+
+def _epoch_seconds(values: np.ndarray) -> np.ndarray:
+    if getattr(values[0], "tzinfo", None) is not None:
+        # NumPy has no time zones: normalise aware datetimes to naive UTC.
+        values = [v.astimezone(timezone.utc).replace(tzinfo=None) for v in values]
+    micros = np.asarray(values, dtype="datetime64[us]")
+    return (micros - _EPOCH_US).astype(np.int64) / 1e6
+
+
+def _iso(seconds: float) -> str:
+    return str(_EPOCH_US + np.timedelta64(int(round(seconds * 1e6)), "us"))
+
+
+class ColumnSketch:
+    """HyperLogLog + Space-Saving for every column, t-digest for numeric and temporal ones."""
+
+    def __init__(self, kind: str, p: int = 12, compression: float = 100.0, top_k: int = 10):
+        if kind not in SKETCH_KINDS:
+            raise ValueError(f"Unknown sketch kind: {kind}")
+        self.kind = kind
+        self.rows = 0
+        self.nulls = 0
+        self.hll = HyperLogLog(p)
+        self.digest = TDigest(compression) if kind in ("numeric", "temporal") else None
+        self.top = SpaceSaving(top_k)
+        # Hashes of this instance's own rows, kept only while building so the
+        # caller can count singletons (see profiling.estimate_distinct).
+        self.hashes: List[np.ndarray] = []
+
+    def update(self, values: Sequence) -> None:
+        column = np.asarray(values, dtype=object)
+        present = column[~np.equal(column, None)]
+        self.rows += column.size
+        self.nulls += column.size - present.size
+        if present.size == 0:
+            return
+
+        numbers = None
+        if self.kind == "numeric":
+            numbers = present.astype(np.float64)
+        elif self.kind == "temporal":
+            try:
+                numbers = _epoch_seconds(present)
+            except (TypeError, ValueError):
+                # Values the driver returns as text in an unexpected format.
+                self.kind, self.digest = "text", None
+
+        strings = present.astype(str)
+        hashes = hash_numbers(numbers) if self.kind == "numeric" else hash_strings(strings)
+        self.hashes.append(hashes)
+        self.hll.update(hashes)
+        self.top.update(strings)
+        if self.digest is not None and numbers is not None:
+            self.digest.update(numbers)
+
+    def merge(self, other: "ColumnSketch") -> None:
+        self.rows += other.rows
+        self.nulls += other.nulls
+        self.hll.merge(other.hll)
+        self.top.merge(other.top)
+        if self.digest is not None and other.digest is not None:
+            self.digest.merge(other.digest)
+        elif other.digest is None:
+            self.digest = None
+
+    def summary(self) -> Dict:
+        non_null = self.rows - self.nulls
+        out = {
+            "kind": self.kind,
+            "rows_sketched": self.rows,
+            "distinct_sketch": round(self.hll.estimate()),
+            # Only values certain to repeat; on near-unique columns the
+            # tracked counts are mostly inherited error.
+            "top_values": [
+                {**item, "fraction": item["count"] / non_null if non_null else 0.0}
+                for item in self.top.top()
+                if item["count"] - item["error"] >= 2
+            ],
+        }
+        if self.digest is not None:
+            values = self.digest.quantiles(QUANTILES)
+            if values is not None:
+                if self.kind == "temporal":
+                    values = [_iso(v) for v in values]
+                out["quantiles"] = {f"p{round(q * 100):02d}": v for q, v in zip(QUANTILES, values)}
+        return out
+
+    # -- serialization --------------------------------------------------
+    def to_bytes(self) -> bytes:
+        digest = self.digest
+        if digest is not None:
+            digest._compress()
+        meta = {
+            "kind": self.kind,
+            "rows": self.rows,
+            "nulls": self.nulls,
+            "p": self.hll.p,
+            "top_k": self.top.k,
+            "capacity": self.top.capacity,
+            "top_n": self.top.n,
+            "compression": digest.compression if digest is not None else None,
+            "min": digest.min if digest is not None else None,
+            "max": digest.max if digest is not None else None,
+        }
+        keys = list(self.top.counts)
+        buffer = io.BytesIO()
+        np.savez_compressed(
+            buffer,
+            meta=np.array(json.dumps(meta)),
+            registers=self.hll.registers,
+            means=digest.means if digest is not None else np.zeros(0),
+            weights=digest.weights if digest is not None else np.zeros(0),
+            top_keys=np.array(keys, dtype=str),
+            top_counts=np.array([self.top.counts[k] for k in keys], dtype=np.int64),
+            top_errors=np.array([self.top.errors[k] for k in keys], dtype=np.int64),
+        )
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "ColumnSketch":
+        with np.load(io.BytesIO(data), allow_pickle=False) as arrays:
+            meta = json.loads(str(arrays["meta"]))
+            sketch = cls(meta["kind"], p=meta["p"], compression=meta["compression"] or 100.0, top_k=meta["top_k"])
+            sketch.rows, sketch.nulls = meta["rows"], meta["nulls"]
+            sketch.hll.registers = arrays["registers"].copy()
+            if sketch.digest is not None:
+                sketch.digest.means = arrays["means"].copy()
+                sketch.digest.weights = arrays["weights"].copy()
+                sketch.digest.min = meta["min"] if meta["min"] is not None else math.inf
+                sketch.digest.max = meta["max"] if meta["max"] is not None else -math.inf
+            sketch.top.capacity = meta["capacity"]
+            sketch.top.n = meta["top_n"]
+            keys = arrays["top_keys"].tolist()
+            sketch.top.counts = dict(zip(keys, arrays["top_counts"].tolist()))
+            sketch.top.errors = dict(zip(keys, arrays["top_errors"].tolist()))
+        return sketch
@@ -0,0 +1,192 @@
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from sqlalchemy import text
+
+from app.warehouse.catalog import table_key
+
+
+@dataclass
+class ColumnStats:
+    null_fraction: Optional[float] = None
+    distinct_estimate: Optional[float] = None
+    last_analyzed: Optional[datetime] = None
+
+
+@dataclass
+class TableStats:
+    table: str
+    row_count: Optional[int] = None
+    last_analyzed: Optional[datetime] = None
+    columns: Dict[str, ColumnStats] = field(default_factory=dict)
+
+
+def stats_age_seconds(last_analyzed: Optional[datetime]) -> Optional[float]:
+    if last_analyzed is None:
+        return None
+    if last_analyzed.tzinfo is None:
+        last_analyzed = last_analyzed.replace(tzinfo=timezone.utc)
+    return round((datetime.now(timezone.utc) - last_analyzed).total_seconds())
+
+
+# ----------------------------------------------------------------------
+# Postgres: pg_class.reltuples + pg_stats
+# ----------------------------------------------------------------------
+_PG_TABLE_STATS = """
+SELECT n.nspname AS schema_name,
+       c.relname AS table_name,
+       c.reltuples AS row_estimate,
+       GREATEST(s.last_analyze, s.last_autoanalyze) AS last_analyzed
+FROM pg_class c
+JOIN pg_namespace n ON n.oid = c.relnamespace
+LEFT JOIN pg_stat_user_tables s ON s.relid = c.oid
+WHERE c.relkind IN ('r', 'p')
+  AND NOT c.relispartition
+  AND n.nspname NOT IN ('pg_catalog', 'information_schema')
+  AND n.nspname NOT LIKE 'pg_toast%'
+  {filter}
+"""
+
+_PG_COLUMN_STATS = """
+SELECT schemaname AS schema_name,
+       tablename AS table_name,
+       attname AS column_name,
+       null_frac,
+       n_distinct,
+       inherited
+FROM pg_stats
+WHERE schemaname NOT IN ('pg_catalog', 'information_schema')
+  {filter}
+"""
+
+
+def _load_postgres(conn, default_schema, only: Optional[Dict] = None) -> Dict[str, TableStats]:
+    stats: Dict[str, TableStats] = {}
+    table_filter = "AND n.nspname = :schema AND c.relname = :name" if only else ""
+    column_filter = "AND schemaname = :schema AND tablename = :name" if only else ""
+
+    for row in conn.execute(text(_PG_TABLE_STATS.format(filter=table_filter)), only or {}).mappings():
+        key = table_key(row["schema_name"], row["table_name"], default_schema)
+        # reltuples is -1 (PG14+) or 0 before the first ANALYZE.
+        rows = row["row_estimate"]
+        stats[key] = TableStats(
+            table=key,
+            row_count=int(rows) if rows is not None and rows >= 0 and row["last_analyzed"] else None,
+            last_analyzed=row["last_analyzed"],
+        )
+
+    for row in conn.execute(text(_PG_COLUMN_STATS.format(filter=column_filter)), only or {}).mappings():
+        key = table_key(row["schema_name"], row["table_name"], default_schema)
+        table = stats.get(key)
+        if table is None:
+            continue
+        # Partitioned parents only have inherited (whole-tree) stats; for
+        # plain tables prefer the non-inherited row.
+        if row["inherited"] and row["column_name"] in table.columns:
+            continue
+
+        distinct = row["n_distinct"]
+        if distinct is not None and distinct < 0:
+            # Negative n_distinct is a fraction of the row count.
+            distinct = -distinct * table.row_count if table.row_count is not None else None
+
+        table.columns[row["column_name"]] = ColumnStats(
+            null_fraction=row["null_frac"],
+            distinct_estimate=distinct,
+            last_analyzed=table.last_analyzed,
+        )
+
+    return stats
+
+
+# ----------------------------------------------------------------------
+# SQL Server: partition stats + statistics histograms
+# ----------------------------------------------------------------------
+_MSSQL_TABLE_STATS = """
+SELECT s.name AS schema_name,
+       t.name AS table_name,
+       SUM(ps.row_count) AS row_count
+FROM sys.tables t
+JOIN sys.schemas s ON s.schema_id = t.schema_id
+JOIN sys.dm_db_partition_stats ps ON ps.object_id = t.object_id AND ps.index_id IN (0, 1)
+WHERE t.is_ms_shipped = 0
+  {filter}
+GROUP BY s.name, t.name
+"""
+
+# Statistics whose leading column is the column of interest. The NULL step
+# of the histogram holds the NULL count; steps plus distinct_range_rows
+# approximate the distinct count. Needs SQL Server 2016 SP1 CU2+.
+_MSSQL_COLUMN_STATS = """
+SELECT s.name AS schema_name,
+       t.name AS table_name,
+       c.name AS column_name,
+       sp.last_updated,
+       sp.rows,
+       SUM(CASE WHEN h.range_high_key IS NULL THEN h.equal_rows ELSE 0 END) AS null_rows,
+       SUM(h.distinct_range_rows)
+         + SUM(CASE WHEN h.range_high_key IS NULL THEN 0 ELSE 1 END) AS distinct_estimate
+FROM sys.stats st
+JOIN sys.stats_columns sc
+     ON sc.object_id = st.object_id AND sc.stats_id = st.stats_id AND sc.stats_column_id = 1
+JOIN sys.tables t ON t.object_id = st.object_id
+JOIN sys.schemas s ON s.schema_id = t.schema_id
+JOIN sys.columns c ON c.object_id = sc.object_id AND c.column_id = sc.column_id
+CROSS APPLY sys.dm_db_stats_properties(st.object_id, st.stats_id) sp
+CROSS APPLY sys.dm_db_stats_histogram(st.object_id, st.stats_id) h
+WHERE t.is_ms_shipped = 0
+  {filter}
+GROUP BY s.name, t.name, c.name, st.stats_id, sp.last_updated, sp.rows
+"""
+
+
+def _load_mssql(conn, default_schema, only: Optional[Dict] = None) -> Dict[str, TableStats]:
+    stats: Dict[str, TableStats] = {}
+    table_filter = "AND s.name = :schema AND t.name = :name" if only else ""
+
+    for row in conn.execute(text(_MSSQL_TABLE_STATS.format(filter=table_filter)), only or {}).mappings():
+        key = table_key(row["schema_name"], row["table_name"], default_schema)
+        stats[key] = TableStats(table=key, row_count=int(row["row_count"] or 0))
+
+    for row in conn.execute(text(_MSSQL_COLUMN_STATS.format(filter=table_filter)), only or {}).mappings():
+        key = table_key(row["schema_name"], row["table_name"], default_schema)
+        table = stats.get(key)
+        if table is None:
+            continue
+        current = table.columns.get(row["column_name"])
+        # Several statistics can lead with the same column; keep the newest.
+        if current is not None and current.last_analyzed and row["last_updated"] \
+                and current.last_analyzed >= row["last_updated"]:
+            continue
+
+        rows = row["rows"] or 0
+        table.columns[row["column_name"]] = ColumnStats(
+            null_fraction=(row["null_rows"] or 0) / rows if rows else None,
+            distinct_estimate=row["distinct_estimate"],
+            last_analyzed=row["last_updated"],
+        )
+        if row["last_updated"] and (table.last_analyzed is None or row["last_updated"] > table.last_analyzed):
+            table.last_analyzed = row["last_updated"]
+
+    return stats
+
+
+def load_warehouse_stats(client, table: Optional[str] = None) -> Dict[str, TableStats]:
+    """
+    Row counts, null fractions and distinct estimates for every table (or
+    only `table`), from catalog statistics only.
+    """
+    snapshot = client.catalog()
+    default_schema = snapshot.default_schema
+    only = None
+    if table is not None:
+        info = snapshot.get_table(table)
+        only = {"schema": info.schema or default_schema, "name": info.name}
+
+    with client.connect() as conn:
+        if client.dialect == "postgresql":
+            return _load_postgres(conn, default_schema, only)
+        if client.dialect == "mssql":
+            return _load_mssql(conn, default_schema, only)
+    raise ValueError(f"Stats mode is not supported on {client.dialect}")
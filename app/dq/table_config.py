@@ -0,0 +1,82 @@
+from typing import List, Optional
+
+from app.db.models import DQTableConfig
+from app.dq.memo import invalidate_dq_results
+
+
+def get_table_config(db, connection_key: str, table: str) -> Optional[DQTableConfig]:
+    return (
+        db.query(DQTableConfig)
+        .filter(DQTableConfig.connection_key == connection_key, DQTableConfig.table_name == table)
+        .first()
+    )
+
+
+def get_or_create_table_config(db, connection_key: str, table: str) -> DQTableConfig:
+    config = get_table_config(db, connection_key, table)
+    if config is None:
+        config = DQTableConfig(connection_key=connection_key, table_name=table)
+        db.add(config)
+    return config
+
+
+def load_table_config(connection_key: str, table: str) -> Optional[DQTableConfig]:
+    """Read a table's config in a short-lived session (safe from worker threads)."""
+    from app.core.db_connection import SessionLocal
+
+    db = SessionLocal()
+    try:
+        config = get_table_config(db, connection_key, table)
+        if config is not None:
+            db.expunge(config)
+        return config
+    finally:
+        db.close()
+
+
+def configure_key_columns(db, client, table: str, columns: Optional[List[str]]) -> DQTableConfig:
+    """Declare the business key used for duplicate detection (None clears it)."""
+    if columns:
+        known = {c["name"] for c in client.get_columns(table)}
+        missing = [c for c in columns if c not in known]
+        if missing:
+            raise ValueError(f"Columns not found in '{table}': {', '.join(missing)}")
+
+    config = get_or_create_table_config(db, client.connection_key, table)
+    config.key_columns = columns or None
+    # Duplicate results computed with the old key no longer apply.
+    invalidate_dq_results(db, client.connection_key, table)
+    db.commit()
+    return config
+
+
+def configure_freshness(
+    db, client, table: str, column: Optional[str], sla_seconds: Optional[int]
+) -> DQTableConfig:
+    """Set the column FreshnessCheck reads and the table's SLA (None falls back to detection / the default)."""
+    if column:
+        known = {c["name"] for c in client.get_columns(table)}
+        if column not in known:
+            raise ValueError(f"Column '{column}' not found in table '{table}'")
+    if sla_seconds is not None and sla_seconds <= 0:
+        raise ValueError("sla_seconds must be positive")
+
+    config = get_or_create_table_config(db, client.connection_key, table)
+    config.freshness_column = column or None
+    config.freshness_sla_seconds = sla_seconds
+    invalidate_dq_results(db, client.connection_key, table)
+    db.commit()
+    return config
+
+
+def configure_tier(db, client, table: str, tier: Optional[int]) -> DQTableConfig:
+    """Set the table's business tier for the DQ scheduler (None restores the default)."""
+    if tier is not None and tier not in (1, 2, 3):
+        raise ValueError("tier must be 1 (critical), 2 or 3 (low)")
+    if table not in client.list_tables():
+        raise ValueError(f"Table '{table}' not found")
+
+    config = get_or_create_table_config(db, client.connection_key, table)
+    config.tier = tier
+    db.commit()
+    return config
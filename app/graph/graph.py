@@ -1,9 +1,18 @@
-from typing import Dict, Any, Callable
-from langgraph.graph import StateGraph, END
+import asyncio
+import time
+from functools import lru_cache
+from typing import Any, AsyncIterator, Callable, Dict, Optional, Tuple
+from langchain_core.runnables import RunnableConfig
+from langgraph.config import get_stream_writer
+from langgraph.graph import StateGraph, START, END
 from sqlalchemy.orm import Session
 
 from app.graph.nodes import (
     classify_intent_node,
+    prefetch_catalog_node,
+    plan_node,
+    route_after_plan,
+    dq_table_node,
     metadata_node,
     dq_node,
     sql_node,
@@ -11,59 +20,70 @@ from app.graph.nodes import (
     final_node
 )
 
+from app.agents.base import get_llm
+from app.dq.runner import _pool_workers
+from app.graph.state import DrDBOutput, DrDBState
 from app.warehouse.client import get_warehouse_client
 
 
 # --------------------------------------------------------
-# Graph state typing
+# Node enter/exit events for the streaming endpoint
 # --------------------------------------------------------
-class GraphState(Dict[str, Any]):
-    """
-    Expected fields:
-      question: str
-      tables: list[str]
-      sql_text: str | None
-      intent: str
-      answer: str
-      debug: list[str]
-    """
-    pass
-
-
-# --------------------------------------------------------
-# Helper to wrap nodes with DB
-# --------------------------------------------------------
-def wrap(node_fn: Callable, db: Session):
-    def wrapped(state: Dict[str, Any]):
-        return node_fn(state, db)
-    return wrapped
+def traced(name: str, node_fn: Callable):
+    async def node(state, config: RunnableConfig):
+        writer = get_stream_writer()
+        writer({"event": "node_start", "node": name})
+        started = time.perf_counter()
+        result = await node_fn(state, config)
+        writer({
+            "event": "node_end",
+            "node": name,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000),
+        })
+        return result
+    return node
 
 
 # --------------------------------------------------------
 # Build graph
 # --------------------------------------------------------
-def build_graph(db: Session):
-    graph = StateGraph(GraphState)
+def build_graph():
+    """
+    Nodes receive their per-request dependencies (db session, warehouse
+    client, LLM) through config["configurable"], so the compiled graph
+    holds no request state and can be shared. Nodes are coroutines: run
+    the graph with ainvoke / astream.
+    """
+    graph = StateGraph(DrDBState, output_schema=DrDBOutput)
 
     # Nodes
-    graph.add_node("classify_intent", wrap(classify_intent_node, db))
-    graph.add_node("metadata", wrap(metadata_node, db))
-    graph.add_node("dq", wrap(dq_node, db))
-    graph.add_node("sql", wrap(sql_node, db))
-    graph.add_node("rootcause", wrap(rootcause_node, db))
-    graph.add_node("final", wrap(final_node, db))
-
-    # Start → Intent
-    graph.set_entry_point("classify_intent")
-
-    # Branching based on intent
+    graph.add_node("classify_intent", traced("classify_intent", classify_intent_node))
+    graph.add_node("prefetch_catalog", traced("prefetch_catalog", prefetch_catalog_node))
+    graph.add_node("plan", traced("plan", plan_node))
+    graph.add_node("dq_table", traced("dq_table", dq_table_node))
+    graph.add_node("metadata", traced("metadata", metadata_node))
+    graph.add_node("dq", traced("dq", dq_node))
+    graph.add_node("sql", traced("sql", sql_node))
+    graph.add_node("rootcause", traced("rootcause", rootcause_node))
+    graph.add_node("final", traced("final", final_node))
+
+    # Start → intent and catalog in parallel, joined at plan
+    graph.add_edge(START, "classify_intent")
+    graph.add_edge(START, "prefetch_catalog")
+    graph.add_edge(["classify_intent", "prefetch_catalog"], "plan")
+
+    # Branching based on intent; dq / rootcause first fan out one
+    # dq_table branch per table, which all join before the agent
     graph.add_conditional_edges(
-        "classify_intent",
+        "plan",
+        route_after_plan,
+        ["metadata", "dq", "sql", "rootcause", "dq_table"],
+    )
+    graph.add_conditional_edges(
+        "dq_table",
         lambda state: state.get("intent"),
         {
-            "metadata": "metadata",
             "dq": "dq",
-            "sql": "sql",
             "rootcause": "rootcause",
         }
     )
@@ -80,14 +100,17 @@ def build_graph(db: Session):
     return graph.compile()
 
 
+@lru_cache(maxsize=1)
+def get_graph():
+    """The process-wide compiled graph (built on first use / at startup)."""
+    return build_graph()
+
+
 # --------------------------------------------------------
-# Public function used by FastAPI
+# Public functions used by FastAPI
 # --------------------------------------------------------
-def run_langgraph_query(question: str, tables, sql_text, db: Session):
-    """
-    This is called by routes_ui to execute the entire LangGraph pipeline.
-    """
-    state: GraphState = {
+def _initial_state(question: str, tables, sql_text) -> DrDBState:
+    return {
         "question": question,
         "tables": tables or [],
         "sql_text": sql_text,
@@ -96,6 +119,60 @@ def run_langgraph_query(question: str, tables, sql_text, db: Session):
         "debug": [],
     }
 
-    app = build_graph(db)
-    result = app.invoke(state)
+
+def _config(db: Session, no_cache: bool = False, connection: Optional[str] = None) -> Dict[str, Any]:
+    client = get_warehouse_client(db, connection)
+    config = {
+        "configurable": {
+            "db": db,
+            "warehouse_client": client,
+            "llm": get_llm(bypass_cache=no_cache),
+        }
+    }
+    if client.engine is not None:
+        # Parallel branches per step (the DQ fan-out): no more than the
+        # warehouse admits, so queued scans do not pin worker threads.
+        config["max_concurrency"] = _pool_workers(client.engine)
+    return config
+
+
+async def run_langgraph_query(
+    question: str, tables, sql_text, db: Session, no_cache: bool = False, connection: Optional[str] = None
+):
+    """
+    This is called by routes_agents to execute the entire LangGraph pipeline.
+    no_cache=True skips cached LLM answers for this request; `connection`
+    names the warehouse (the default one when None).
+    """
+    state = _initial_state(question, tables, sql_text)
+    config = await asyncio.to_thread(_config, db, no_cache, connection)
+    result = await get_graph().ainvoke(state, config=config)
     return result
+
+
+async def stream_langgraph_query(
+    question: str, tables, sql_text, db: Session, no_cache: bool = False, connection: Optional[str] = None
+) -> AsyncIterator[Tuple[str, Dict]]:
+    """
+    Run the pipeline and yield (event, data) pairs as it progresses:
+    node_start / node_end, schema_loaded, dq_table_start / dq_table_done,
+    token (answer text as the LLM produces it), and finally `final` with
+    the same fields run_langgraph_query returns.
+    """
+    state = _initial_state(question, tables, sql_text)
+    final_state: Dict[str, Any] = state
+
+    config = await asyncio.to_thread(_config, db, no_cache, connection)
+    async for mode, chunk in get_graph().astream(state, config=config, stream_mode=["custom", "values"]):
+        if mode == "custom":
+            event = dict(chunk)
+            yield event.pop("event", "progress"), event
+        else:
+            final_state = chunk
+
+    yield "final", {
+        "intent": final_state.get("intent"),
+        "answer": final_state.get("answer"),
+        "sql": final_state.get("sql"),
+        "debug": final_state.get("debug"),
+    }
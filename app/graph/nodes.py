@@ -1,35 +1,80 @@
-from typing import List, Dict, Any
-from sqlalchemy.orm import Session
+import asyncio
+from typing import List, Dict, Optional
+from langchain_core.runnables import RunnableConfig
+from langgraph.config import get_stream_writer
+from langgraph.types import Send
 
 from app.agents.base import get_llm
+from app.agents.intent import aclassify_intent_fast
 from app.warehouse.client import get_warehouse_client
-from app.dq.runner import run_dq_for_table
+from app.warehouse.schema_index import abuild_schema_context
+from app.dq.memo import describe_cache, run_dq_for_table_memo, without_cache
 
 
 # ----------------------------------------------------------------------
-# Helper: append debug
+# Helpers: progress events and token streaming
 # ----------------------------------------------------------------------
-def _append_debug(state: Dict[str, Any], msg: str) -> None:
-    debug = state.get("debug") or []
-    debug.append(msg)
-    state["debug"] = debug
+def _emit(event: str, **data) -> None:
+    """Send a progress event to stream consumers (no-op for plain invoke)."""
+    get_stream_writer()({"event": event, **data})
+
+
+async def _complete(llm, prompt: str, node: str) -> str:
+    """Run the LLM, forwarding answer tokens to the stream as they arrive."""
+    parts = []
+    async for chunk in llm.astream(prompt):
+        text = getattr(chunk, "content", str(chunk))
+        if text:
+            parts.append(text)
+            _emit("token", node=node, text=text)
+    return "".join(parts)
+
+
+# ----------------------------------------------------------------------
+# Helper: DQ result freshness footnote
+# ----------------------------------------------------------------------
+def _with_freshness(answer: str, freshness: List[str]) -> str:
+    """Tell the reader which DQ results were reused and how old they are."""
+    if not freshness:
+        return answer
+    return f"{answer}\n\n_DQ results: {'; '.join(freshness)}_"
+
+
+# ----------------------------------------------------------------------
+# Helper: per-request dependencies
+# ----------------------------------------------------------------------
+def _deps(config: RunnableConfig):
+    """
+    The graph is compiled once and shared, so the DB session, warehouse
+    client and LLM arrive per invocation through config["configurable"].
+    Nodes return only the keys they change; parallel branches are merged
+    by the reducers in DrDBState.
+    """
+    configurable = (config or {}).get("configurable", {})
+    db = configurable.get("db")
+    client = configurable.get("warehouse_client") or get_warehouse_client(db)
+    llm = configurable.get("llm") or get_llm()
+    return db, client, llm
 
 
 # ----------------------------------------------------------------------
 # Node 1: Intent classifier
 # ----------------------------------------------------------------------
-def classify_intent_node(state, db: Session):
+async def classify_intent_node(state, config: RunnableConfig):
     """
     Decide which agent should handle the query:
     - metadata
     - dq
     - sql
     - rootcause
+
+    A local classifier answers confident cases; the LLM is asked otherwise.
     """
-    llm = get_llm()
+    db, _, llm = _deps(config)
     question = state.get("question", "")
 
-    prompt = f"""
+    async def ask_llm(question: str) -> Optional[str]:
+        prompt = f"""
 You are Dr. Database's intent classifier.
 
 Classify the user request into exactly one of:
@@ -44,97 +89,145 @@ User question:
 Respond with ONLY one word: metadata, dq, sql, or rootcause.
 """
 
-    resp = llm.invoke(prompt)
-    intent = (getattr(resp, "content", str(resp)) or "").strip().lower()
+        resp = await llm.ainvoke(prompt)
+        intent = (getattr(resp, "content", str(resp)) or "").strip().lower()
+
+        # Unrecognized answers fall back to the default intent, unlogged.
+        return intent if intent in ("metadata", "dq", "sql", "rootcause") else None
 
-    if intent not in ("metadata", "dq", "sql", "rootcause"):
-        intent = "metadata"
+    decision = await aclassify_intent_fast(question, ask_llm, db=db)
 
-    state["intent"] = intent
-    _append_debug(state, f"classify_intent → {intent}")
-    return state
+    return {"intent": decision.intent, "debug": [f"classify_intent → {decision.describe()}"]}
 
 
 # ----------------------------------------------------------------------
-# Node 2: Metadata agent
+# Node 1b: Catalog prefetch (runs alongside the intent classifier)
 # ----------------------------------------------------------------------
-def metadata_node(state, db: Session):
+async def prefetch_catalog_node(state, config: RunnableConfig):
     """
-    Answer metadata questions about tables/columns using the connected warehouse.
+    Load the warehouse catalog while the intent is classified; every
+    later node reads it from the (pinned) client snapshot.
     """
-    llm = get_llm()
-    client = get_warehouse_client(db)
+    _, client, _ = _deps(config)
+    if client.engine is None:
+        return {}
+    try:
+        await client.acatalog()
+    except Exception as e:
+        # The node that needs the catalog retries and reports the failure.
+        return {"debug": [f"prefetch_catalog failed: {e}"]}
+    return {}
 
-    all_tables = client.list_tables()
 
-    # user-selected tables from UI (multi-select)
+# ----------------------------------------------------------------------
+# Node 1c: Plan the DQ fan-out
+# ----------------------------------------------------------------------
+async def plan_node(state, config: RunnableConfig):
+    """
+    Join point of the classifier and the prefetch. For dq / rootcause,
+    pick the tables to check: the UI selection, else every table (dq) or
+    the tables most relevant to the question (rootcause).
+    """
+    intent = state.get("intent")
+    if intent not in ("dq", "rootcause"):
+        return {}
+
+    _, client, _ = _deps(config)
     selected_tables: List[str] = state.get("tables") or []
+    if intent == "dq":
+        all_tables = await client.alist_tables()
+        _emit("schema_loaded", tables=len(all_tables))
+        dq_tables = selected_tables or all_tables
+    else:
+        schema = await abuild_schema_context(client, state.get("question", ""), tables=selected_tables)
+        _emit("schema_loaded", tables=schema["total_tables"], selected=schema["tables"])
+        dq_tables = selected_tables or schema["tables"]
+    return {"dq_tables": dq_tables}
 
-    metadata_context = {}
 
-    if selected_tables:
-        for t in selected_tables:
-            try:
-                cols = client.get_columns(t)
-                metadata_context[t] = cols
-            except Exception as e:
-                metadata_context[t] = {"error": str(e)}
-    else:
-        # no specific table selected → summarize all
-        for t in all_tables:
-            try:
-                cols = client.get_columns(t)
-                metadata_context[t] = cols
-            except Exception as e:
-                metadata_context[t] = {"error": str(e)}
+def route_after_plan(state):
+    """Fan DQ out as one parallel `dq_table` branch per table; otherwise go to the agent."""
+    intent = state.get("intent")
+    if intent in ("dq", "rootcause") and state.get("dq_tables"):
+        return [Send("dq_table", {"table": t}) for t in state["dq_tables"]]
+    return intent
+
+
+# ----------------------------------------------------------------------
+# Node 1d: DQ for one table (one parallel branch per table)
+# ----------------------------------------------------------------------
+async def dq_table_node(state, config: RunnableConfig):
+    """
+    Receives {"table": name} from the fan-out. The scan itself runs on the
+    sync pool in a worker thread; the governor bounds warehouse load.
+    """
+    db, client, _ = _deps(config)
+    table = state["table"]
+
+    _emit("dq_table_start", table=table)
+    try:
+        output = await asyncio.to_thread(run_dq_for_table_memo, db, table, client)
+    except Exception as e:
+        output = {"error": str(e)}
+    _emit("dq_table_done", table=table, error=output.get("error"), cache=output.get("cache"))
+    return {"dq_results": {table: output}}
+
+
+def _dq_results_in_order(state) -> Dict[str, Dict]:
+    """Branch outputs in planned table order, so prompts do not depend on finishing order."""
+    results = state.get("dq_results") or {}
+    return {t: results[t] for t in state.get("dq_tables") or [] if t in results}
+
+
+# ----------------------------------------------------------------------
+# Node 2: Metadata agent
+# ----------------------------------------------------------------------
+async def metadata_node(state, config: RunnableConfig):
+    """
+    Answer metadata questions about tables/columns using the connected warehouse.
+    """
+    _, client, llm = _deps(config)
 
     question = state.get("question", "")
 
+    # user-selected tables from UI (multi-select) are always included;
+    # the rest of the context is the tables most relevant to the question
+    selected_tables: List[str] = state.get("tables") or []
+    schema = await abuild_schema_context(client, question, tables=selected_tables)
+    _emit("schema_loaded", tables=schema["total_tables"], selected=schema["tables"])
+
     prompt = f"""
 You are Dr. Database's Metadata Agent.
 
 User question:
 {question}
 
-Available tables:
-{all_tables}
-
-Table metadata:
-{metadata_context}
+Schema ({len(schema["tables"])} of {schema["total_tables"]} tables, most relevant first):
+{schema["text"]}
 
 Explain the schema and answer the question using ONLY this information.
 Keep it concise and practical.
 """
 
-    resp = llm.invoke(prompt)
-    answer = getattr(resp, "content", str(resp))
+    answer = await _complete(llm, prompt, "metadata")
 
-    state["answer"] = answer
-    _append_debug(state, "metadata_node")
-    return state
+    return {"answer": answer, "debug": ["metadata_node"]}
 
 
 # ----------------------------------------------------------------------
 # Node 3: Data Quality agent
 # ----------------------------------------------------------------------
-def dq_node(state, db: Session):
+async def dq_node(state, config: RunnableConfig):
     """
-    Run data-quality checks for selected tables (or all tables if none selected),
-    then interpret them with the LLM.
+    Interpret the data-quality results of the selected tables (or all
+    tables if none selected) with the LLM. The checks ran in the
+    dq_table fan-out.
     """
-    llm = get_llm()
-    client = get_warehouse_client(db)
-
-    all_tables = client.list_tables()
-    selected_tables: List[str] = state.get("tables") or all_tables
+    _, _, llm = _deps(config)
 
-    dq_results = {}
-
-    for t in selected_tables:
-        try:
-            dq_results[t] = run_dq_for_table(db, t)
-        except Exception as e:
-            dq_results[t] = {"error": str(e)}
+    dq_results = _dq_results_in_order(state)
+    freshness = describe_cache(dq_results)
+    dq_context = without_cache(dq_results)
 
     question = state.get("question", "")
 
@@ -145,7 +238,7 @@ User question:
 {question}
 
 Data quality results (per table):
-{dq_results}
+{dq_context}
 
 Explain:
 - Key issues by table
@@ -154,42 +247,34 @@ Explain:
 Use clear, structured bullet points.
 """
 
-    resp = llm.invoke(prompt)
-    answer = getattr(resp, "content", str(resp))
+    answer = await _complete(llm, prompt, "dq")
 
-    state["answer"] = answer
-    _append_debug(state, "dq_node")
-    return state
+    return {
+        "answer": _with_freshness(answer, freshness),
+        "debug": [f"dq_node ({'; '.join(freshness) or 'no DQ results'})"],
+    }
 
 
 # ----------------------------------------------------------------------
 # Node 4: SQL agent (schema-aware)
 # ----------------------------------------------------------------------
-def sql_node(state, db: Session):
+async def sql_node(state, config: RunnableConfig):
     """
     Generate or explain SQL grounded in the actual warehouse schema.
     """
-    llm = get_llm()
-    client = get_warehouse_client(db)
-
-    all_tables = client.list_tables()
-    schema_map = {}
-
-    for t in all_tables:
-        try:
-            cols = client.get_columns(t)
-            schema_map[t] = [c.get("name") for c in cols]
-        except Exception as e:
-            schema_map[t] = [f"ERROR: {e}"]
+    _, client, llm = _deps(config)
 
     # Either explicit SQL snippet or user question
     sql_text = state.get("sql_text") or state.get("question", "")
 
+    schema = await abuild_schema_context(client, sql_text, tables=state.get("tables") or [])
+    _emit("schema_loaded", tables=schema["total_tables"], selected=schema["tables"])
+
     prompt = f"""
 You are Dr. Database, an expert SQL assistant for SQL Server.
 
 ### DATABASE SCHEMA
-{schema_map}
+{schema["text"]}
 
 ### RULES
 - Use ONLY the tables and columns shown in the schema.
@@ -204,45 +289,35 @@ You are Dr. Database, an expert SQL assistant for SQL Server.
 Return ONLY the final SQL (no commentary).
 """
 
-    resp = llm.invoke(prompt)
-    sql_answer = getattr(resp, "content", str(resp))
+    sql_answer = await _complete(llm, prompt, "sql")
 
-    state["answer"] = sql_answer
-    state["sql"] = sql_answer  # optional convenience
-    _append_debug(state, "sql_node")
-    return state
+    return {
+        "answer": sql_answer,
+        "sql": sql_answer,  # optional convenience
+        "debug": ["sql_node"],
+    }
 
 
 # ----------------------------------------------------------------------
 # Node 5: Root-cause agent
 # ----------------------------------------------------------------------
-def rootcause_node(state, db: Session):
+async def rootcause_node(state, config: RunnableConfig):
     """
-    Use metadata + DQ context to hypothesize root-cause of issues.
+    Use metadata + DQ context to hypothesize root-cause of issues. The
+    tables were picked by plan_node and checked in the dq_table fan-out.
     """
-    llm = get_llm()
-    client = get_warehouse_client(db)
-
-    all_tables = client.list_tables()
-    selected_tables: List[str] = state.get("tables") or all_tables
-
-    schema_map = {}
-    for t in selected_tables:
-        try:
-            cols = client.get_columns(t)
-            schema_map[t] = [c.get("name") for c in cols]
-        except Exception as e:
-            schema_map[t] = [f"ERROR: {e}"]
-
-    dq_results = {}
-    for t in selected_tables:
-        try:
-            dq_results[t] = run_dq_for_table(db, t)
-        except Exception as e:
-            dq_results[t] = {"error": str(e)}
+    _, client, llm = _deps(config)
 
     question = state.get("question", "")
 
+    # Same ranking plan_node used; the catalog and index are already cached.
+    schema = await abuild_schema_context(client, question, tables=state.get("tables") or [])
+    selected_tables: List[str] = state.get("dq_tables") or []
+
+    dq_results = _dq_results_in_order(state)
+    freshness = describe_cache(dq_results)
+    dq_context = without_cache(dq_results)
+
     prompt = f"""
 You are Dr. Database's Root-Cause Analysis Agent.
 
@@ -253,29 +328,28 @@ Relevant tables:
 {selected_tables}
 
 Schema:
-{schema_map}
+{schema["text"]}
 
 Data Quality results:
-{dq_results}
+{dq_context}
 
 Infer the MOST LIKELY root causes.
 Explain your reasoning in 3–6 bullet points, and suggest concrete next steps.
 """
 
-    resp = llm.invoke(prompt)
-    answer = getattr(resp, "content", str(resp))
+    answer = await _complete(llm, prompt, "rootcause")
 
-    state["answer"] = answer
-    _append_debug(state, "rootcause_node")
-    return state
+    return {
+        "answer": _with_freshness(answer, freshness),
+        "debug": [f"rootcause_node ({'; '.join(freshness) or 'no DQ results'})"],
+    }
 
 
 # ----------------------------------------------------------------------
 # Node 6: Final node
 # ----------------------------------------------------------------------
-def final_node(state, db: Session):
+async def final_node(state, config: RunnableConfig):
     """
     No extra work – just mark that the final node was reached.
     """
-    _append_debug(state, "final_node")
-    return state
+    return {"debug": ["final_node"]}
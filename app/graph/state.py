@@ -1,10 +1,24 @@
-from typing import List, Optional, TypedDict
+import operator
+from typing import Annotated, Dict, List, Optional, TypedDict
 
 
-class DrDBState(TypedDict, total=False):
+def merge_dicts(left: Optional[Dict], right: Optional[Dict]) -> Dict:
+    """Reducer for keys written by parallel branches (one entry per branch)."""
+    return {**(left or {}), **(right or {})}
+
+
+class DrDBOutput(TypedDict, total=False):
     question: str
     tables: List[str]
     sql_text: Optional[str]
     intent: str
     answer: str
-    debug: List[str]
+    sql: str
+    # Parallel branches append to the debug trail.
+    debug: Annotated[List[str], operator.add]
+
+
+class DrDBState(DrDBOutput, total=False):
+    # Internal: tables the DQ fan-out runs on, and their per-table outputs.
+    dq_tables: List[str]
+    dq_results: Annotated[Dict[str, Dict], merge_dicts]
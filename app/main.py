@@ -1,3 +1,5 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.responses import RedirectResponse
 from fastapi.middleware.cors import CORSMiddleware
@@ -7,16 +9,41 @@ from app.api import (
     routes_run,
     routes_reports,
     routes_agents,
+    routes_jobs,
 )
 
+from app.db.connection import registry
+from app.db.init_db import init_db
+from app.core.settings import settings
+from app.dq.jobs import recover_interrupted_jobs
+from app.dq.scheduler import scheduler
+from app.graph.graph import get_graph
+
 from dotenv import load_dotenv
 load_dotenv()
 
 
+# -----------------------------
+# Startup: create internal tables, compile the LangGraph pipeline once,
+# start the DQ scheduler when enabled
+# -----------------------------
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    init_db()
+    recover_interrupted_jobs()
+    get_graph()
+    if settings.DQ_SCHEDULER_ENABLED:
+        scheduler.start()
+    yield
+    scheduler.stop()
+    await registry.adispose_all()
+
+
 app = FastAPI(
     title="Dr Database",
     version="1.0",
-    description="AI-driven data assistant with metadata, SQL, DQ, RCA agents."
+    description="AI-driven data assistant with metadata, SQL, DQ, RCA agents.",
+    lifespan=lifespan,
 )
 
 # Optional: CORS for Streamlit
@@ -43,3 +70,4 @@ app.include_router(routes_config.router, prefix="/config", tags=["config"])
 app.include_router(routes_run.router, prefix="/run", tags=["run"])
 app.include_router(routes_reports.router, prefix="/reports", tags=["reports"])
 app.include_router(routes_agents.router, prefix="/agents", tags=["agents"])
+app.include_router(routes_jobs.router, prefix="/jobs", tags=["jobs"])
@@ -0,0 +1,248 @@
+# app/warehouse/cache.py
+import asyncio
+import contextvars
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.core.settings import settings
+from app.warehouse.catalog import CatalogSnapshot, aload_catalog, load_catalog
+from app.warehouse.governor import governed_async_connection, governed_connection
+
+
+# ----------------------------------------------------------------------
+# Catalog version probes: one cheap query that changes whenever DDL runs
+# ----------------------------------------------------------------------
+# xmin of a catalog row is the transaction that last wrote it, so any
+# CREATE/ALTER/DROP moves one of these maxima (or the relation count).
+_PG_VERSION = """
+SELECT (SELECT COUNT(*) FROM pg_class),
+       (SELECT MAX(xmin::text::bigint) FROM pg_class),
+       (SELECT MAX(xmin::text::bigint) FROM pg_attribute),
+       (SELECT MAX(xmin::text::bigint) FROM pg_constraint),
+       (SELECT MAX(xmin::text::bigint) FROM pg_index)
+"""
+
+# ALTER TABLE bumps the table's modify_date; creates and drops move the
+# count or the maximum.
+_MSSQL_VERSION = """
+SELECT COUNT(*), MAX(modify_date)
+FROM sys.objects
+WHERE is_ms_shipped = 0
+"""
+
+
+def _version_query(dialect: str) -> Optional[str]:
+    if dialect == "postgresql":
+        return _PG_VERSION
+    if dialect == "mssql":
+        return _MSSQL_VERSION
+    return None
+
+
+def catalog_version(engine: Engine) -> Optional[str]:
+    """Return a token that changes on DDL, or None when the dialect has no probe."""
+    query = _version_query(engine.dialect.name)
+    if query is None:
+        return None
+
+    with governed_connection(engine) as conn:
+        row = conn.execute(text(query)).one()
+    return "|".join(str(v) for v in row)
+
+
+async def acatalog_version(engine: AsyncEngine) -> Optional[str]:
+    query = _version_query(engine.dialect.name)
+    if query is None:
+        return None
+
+    async with governed_async_connection(engine) as conn:
+        row = (await conn.execute(text(query))).one()
+    return "|".join(str(v) for v in row)
+
+
+def connection_key(engine: Engine) -> str:
+    return engine.url.render_as_string(hide_password=True)
+
+
+# ----------------------------------------------------------------------
+# Process-wide cache
+# ----------------------------------------------------------------------
+@dataclass
+class _Entry:
+    snapshot: CatalogSnapshot
+    version: Optional[str]
+    loaded_at: float
+    checked_at: float
+
+
+class MetadataCache:
+    """
+    Catalog snapshots keyed by connection, with LRU eviction and a hard TTL.
+
+    Entries older than `revalidate_seconds` are checked against the
+    warehouse's catalog version before being served; they are reloaded
+    only if DDL has run since they were loaded.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, revalidate_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.revalidate_seconds = revalidate_seconds
+
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks: Dict[str, threading.Lock] = {}
+        self._async_loads: Dict[str, asyncio.Task] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+    def get_catalog(
+        self,
+        engine: Engine,
+        loader: Callable[[Engine], CatalogSnapshot] = load_catalog,
+    ) -> CatalogSnapshot:
+        key = connection_key(engine)
+
+        with self._lock:
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        # One loader per connection at a time; concurrent callers wait and
+        # then hit the fresh entry.
+        with load_lock:
+            snapshot = self._lookup(key, engine)
+            if snapshot is not None:
+                return snapshot
+
+            version = catalog_version(engine)
+            snapshot = loader(engine)
+            self._store(key, snapshot, version)
+            return snapshot
+
+    async def aget_catalog(self, engine: Engine, async_engine: AsyncEngine) -> CatalogSnapshot:
+        """
+        get_catalog for the event loop: probes and loads through the async
+        engine. Entries are shared with the sync path (keyed by `engine`),
+        and concurrent cold loads of one connection share a single task.
+        """
+        key = connection_key(engine)
+        entry = self._live_entry(key)
+        if entry is not None:
+            if not self._stale(entry):
+                return self._hit(key, entry)
+            version = await acatalog_version(async_engine) if entry.version is not None else None
+            if self._revalidated(key, entry, version):
+                return self._hit(key, entry)
+
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            task = self._async_loads.get(key)
+            if task is None or task.done() or task.get_loop() is not loop:
+                # Outside any caller's cancel scope: one caller going away
+                # must not abort the load the others are waiting on.
+                task = loop.create_task(self._aload(key, async_engine), context=contextvars.Context())
+                self._async_loads[key] = task
+        return await asyncio.shield(task)
+
+    async def _aload(self, key: str, async_engine: AsyncEngine) -> CatalogSnapshot:
+        version = await acatalog_version(async_engine)
+        snapshot = await aload_catalog(async_engine)
+        self._store(key, snapshot, version)
+        return snapshot
+
+    def _store(self, key: str, snapshot: CatalogSnapshot, version: Optional[str]) -> None:
+        now = time.time()
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = _Entry(snapshot, version, now, now)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _lookup(self, key: str, engine: Engine) -> Optional[CatalogSnapshot]:
+        entry = self._live_entry(key)
+        if entry is None:
+            return None
+
+        if self._stale(entry):
+            version = catalog_version(engine) if entry.version is not None else None
+            if not self._revalidated(key, entry, version):
+                return None
+        return self._hit(key, entry)
+
+    def _live_entry(self, key: str) -> Optional[_Entry]:
+        """The entry for `key`, unless it is missing or past the hard TTL."""
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if time.time() - entry.loaded_at > self.ttl_seconds:
+            self._drop(key)
+            return None
+        return entry
+
+    def _stale(self, entry: _Entry) -> bool:
+        return time.time() - entry.checked_at > self.revalidate_seconds
+
+    def _revalidated(self, key: str, entry: _Entry, version: Optional[str]) -> bool:
+        """Keep the entry if the warehouse's catalog version has not moved."""
+        with self._lock:
+            self.revalidations += 1
+        if entry.version is None or version != entry.version:
+            self._drop(key)
+            return False
+        entry.checked_at = time.time()
+        return True
+
+    def _hit(self, key: str, entry: _Entry) -> CatalogSnapshot:
+        with self._lock:
+            self.hits += 1
+            if key in self._entries:
+                self._entries.move_to_end(key)
+        return entry.snapshot
+
+    def _drop(self, key: str) -> None:
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self.invalidations += 1
+
+    def invalidate(self, engine: Optional[Engine] = None) -> None:
+        """Drop one connection's snapshot, or every snapshot when no engine is given."""
+        if engine is not None:
+            self._drop(connection_key(engine))
+            return
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "revalidations": self.revalidations,
+                "invalidations": self.invalidations,
+                "evictions": self.evictions,
+            }
+
+
+metadata_cache = MetadataCache(
+    max_entries=settings.METADATA_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.METADATA_CACHE_TTL_SECONDS,
+    revalidate_seconds=settings.METADATA_CACHE_REVALIDATE_SECONDS,
+)
@@ -0,0 +1,122 @@
+# app/warehouse/cancel.py
+import contextvars
+import threading
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class QueryCancelled(Exception):
+    """Raised when work is attempted inside a cancelled scope."""
+
+
+class CancelScope:
+    """
+    Groups the warehouse statements issued on behalf of one unit of work
+    (a DQ job, an HTTP request) so they can all be cancelled at once,
+    including statements that are already running on the server.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._cursors = set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def check(self) -> None:
+        if self.cancelled:
+            raise QueryCancelled("Cancelled")
+
+    def cancel(self) -> None:
+        self._event.set()
+        with self._lock:
+            cursors = list(self._cursors)
+        for cursor, dbapi_conn in cursors:
+            _cancel_statement(cursor, dbapi_conn)
+
+    def _register(self, cursor, dbapi_conn) -> None:
+        with self._lock:
+            self._cursors.add((cursor, dbapi_conn))
+
+    def _unregister(self, cursor, dbapi_conn) -> None:
+        with self._lock:
+            self._cursors.discard((cursor, dbapi_conn))
+
+
+def _cancel_statement(cursor, dbapi_conn) -> None:
+    """Ask the server to abort the statement running on this cursor."""
+    try:
+        if hasattr(dbapi_conn, "cancel"):
+            # psycopg2: sends a cancel request on a side channel.
+            dbapi_conn.cancel()
+        elif hasattr(cursor, "cancel"):
+            # pyodbc: SQLCancel on the executing statement.
+            cursor.cancel()
+        elif hasattr(dbapi_conn, "interrupt"):
+            # sqlite3
+            dbapi_conn.interrupt()
+    except Exception:
+        # The statement may have finished in the meantime.
+        pass
+
+
+# ----------------------------------------------------------------------
+# Current scope (per thread / task)
+# ----------------------------------------------------------------------
+_current_scope: contextvars.ContextVar = contextvars.ContextVar("cancel_scope", default=None)
+
+
+def current_cancel_scope() -> Optional[CancelScope]:
+    return _current_scope.get()
+
+
+def raise_if_cancelled() -> None:
+    scope = current_cancel_scope()
+    if scope is not None:
+        scope.check()
+
+
+@contextmanager
+def use_cancel_scope(scope: Optional[CancelScope]) -> Iterator[Optional[CancelScope]]:
+    token = _current_scope.set(scope)
+    try:
+        yield scope
+    finally:
+        _current_scope.reset(token)
+
+
+# ----------------------------------------------------------------------
+# Engine hooks: track executing cursors in the current scope
+# ----------------------------------------------------------------------
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    scope = current_cancel_scope()
+    if scope is None:
+        return
+    scope.check()
+    scope._register(cursor, conn.connection.dbapi_connection)
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    scope = current_cancel_scope()
+    if scope is not None:
+        scope._unregister(cursor, conn.connection.dbapi_connection)
+
+
+def _handle_error(context):
+    scope = current_cancel_scope()
+    cursor = getattr(context, "cursor", None)
+    conn = getattr(context, "connection", None)
+    if scope is not None and cursor is not None and conn is not None:
+        scope._unregister(cursor, conn.connection.dbapi_connection)
+
+
+def install_cancel_hooks(engine: Engine) -> None:
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(engine, "handle_error", _handle_error)
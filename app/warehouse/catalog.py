@@ -0,0 +1,419 @@
+# app/warehouse/catalog.py
+"""
+Bulk catalog snapshot: every schema, table, column, key and index of the
+warehouse loaded with a handful of catalog queries instead of one
+reflection round trip per table.
+"""
+import time
+from dataclasses import dataclass, field, asdict
+from typing import Dict, List, Optional
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import NoSuchTableError
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.warehouse.governor import governed_async_connection, governed_connection
+
+
+@dataclass
+class ColumnInfo:
+    name: str
+    type: str
+    nullable: bool = True
+    default: Optional[str] = None
+    comment: Optional[str] = None
+    primary_key: bool = False
+    identity: bool = False
+
+    def as_dict(self) -> Dict:
+        return asdict(self)
+
+
+@dataclass
+class ForeignKeyInfo:
+    name: Optional[str]
+    columns: List[str]
+    referred_table: str
+    referred_columns: List[str]
+
+
+@dataclass
+class IndexInfo:
+    name: Optional[str]
+    columns: List[str]
+    unique: bool = False
+    primary_key: bool = False
+
+
+@dataclass
+class TableInfo:
+    schema: Optional[str]
+    name: str
+    key: str
+    comment: Optional[str] = None
+    columns: List[ColumnInfo] = field(default_factory=list)
+    primary_key: List[str] = field(default_factory=list)
+    foreign_keys: List[ForeignKeyInfo] = field(default_factory=list)
+    indexes: List[IndexInfo] = field(default_factory=list)
+
+    def as_dict(self) -> Dict:
+        return asdict(self)
+
+
+@dataclass
+class CatalogSnapshot:
+    dialect: str
+    default_schema: Optional[str]
+    tables: Dict[str, TableInfo] = field(default_factory=dict)
+    loaded_at: float = field(default_factory=time.time)
+
+    def list_tables(self) -> List[str]:
+        return list(self.tables)
+
+    def get_table(self, table: str) -> TableInfo:
+        try:
+            return self.tables[table]
+        except KeyError:
+            raise NoSuchTableError(table)
+
+    def get_columns(self, table: str) -> List[Dict]:
+        return [c.as_dict() for c in self.get_table(table).columns]
+
+
+# ----------------------------------------------------------------------
+# Helpers
+# ----------------------------------------------------------------------
+def table_key(schema: Optional[str], name: str, default_schema: Optional[str]) -> str:
+    """Tables in the default schema keep their bare name; others get `schema.name`."""
+    if not schema or schema == default_schema:
+        return name
+    return f"{schema}.{name}"
+
+
+def _table(snapshot: CatalogSnapshot, schema: str, name: str) -> TableInfo:
+    key = table_key(schema, name, snapshot.default_schema)
+    table = snapshot.tables.get(key)
+    if table is None:
+        table = TableInfo(schema=schema, name=name, key=key)
+        snapshot.tables[key] = table
+    return table
+
+
+def _mark_primary_key(table: TableInfo, columns: List[str]) -> None:
+    table.primary_key = list(columns)
+    for col in table.columns:
+        col.primary_key = col.name in table.primary_key
+
+
+# ----------------------------------------------------------------------
+# Postgres (pg_catalog)
+# ----------------------------------------------------------------------
+_PG_EXCLUDED_SCHEMAS = "('pg_catalog', 'information_schema')"
+
+_PG_COLUMNS = f"""
+SELECT n.nspname AS schema_name,
+       c.relname AS table_name,
+       obj_description(c.oid, 'pg_class') AS table_comment,
+       a.attname AS column_name,
+       format_type(a.atttypid, a.atttypmod) AS data_type,
+       NOT a.attnotnull AS nullable,
+       pg_get_expr(d.adbin, d.adrelid) AS column_default,
+       col_description(c.oid, a.attnum) AS column_comment,
+       a.attidentity <> '' AS is_identity
+FROM pg_class c
+JOIN pg_namespace n ON n.oid = c.relnamespace
+JOIN pg_attribute a ON a.attrelid = c.oid AND a.attnum > 0 AND NOT a.attisdropped
+LEFT JOIN pg_attrdef d ON d.adrelid = c.oid AND d.adnum = a.attnum
+WHERE c.relkind IN ('r', 'p')
+  AND NOT c.relispartition
+  AND n.nspname NOT IN {_PG_EXCLUDED_SCHEMAS}
+  AND n.nspname NOT LIKE 'pg_toast%'
+ORDER BY n.nspname, c.relname, a.attnum
+"""
+
+_PG_CONSTRAINTS = f"""
+SELECT n.nspname AS schema_name,
+       c.relname AS table_name,
+       con.conname AS constraint_name,
+       con.contype AS constraint_type,
+       ARRAY(SELECT a.attname
+             FROM unnest(con.conkey) WITH ORDINALITY AS k(attnum, ord)
+             JOIN pg_attribute a ON a.attrelid = con.conrelid AND a.attnum = k.attnum
+             ORDER BY k.ord) AS columns,
+       rn.nspname AS ref_schema,
+       rc.relname AS ref_table,
+       ARRAY(SELECT a.attname
+             FROM unnest(con.confkey) WITH ORDINALITY AS k(attnum, ord)
+             JOIN pg_attribute a ON a.attrelid = con.confrelid AND a.attnum = k.attnum
+             ORDER BY k.ord) AS ref_columns
+FROM pg_constraint con
+JOIN pg_class c ON c.oid = con.conrelid
+JOIN pg_namespace n ON n.oid = c.relnamespace
+LEFT JOIN pg_class rc ON rc.oid = con.confrelid
+LEFT JOIN pg_namespace rn ON rn.oid = rc.relnamespace
+WHERE con.contype IN ('p', 'f')
+  AND n.nspname NOT IN {_PG_EXCLUDED_SCHEMAS}
+"""
+
+_PG_INDEXES = f"""
+SELECT n.nspname AS schema_name,
+       t.relname AS table_name,
+       i.relname AS index_name,
+       ix.indisunique AS is_unique,
+       ix.indisprimary AS is_primary,
+       ARRAY(SELECT a.attname
+             FROM unnest(ix.indkey::int2[]) WITH ORDINALITY AS k(attnum, ord)
+             JOIN pg_attribute a ON a.attrelid = ix.indrelid AND a.attnum = k.attnum
+             ORDER BY k.ord) AS columns
+FROM pg_index ix
+JOIN pg_class i ON i.oid = ix.indexrelid
+JOIN pg_class t ON t.oid = ix.indrelid
+JOIN pg_namespace n ON n.oid = t.relnamespace
+WHERE n.nspname NOT IN {_PG_EXCLUDED_SCHEMAS}
+  AND n.nspname NOT LIKE 'pg_toast%'
+"""
+
+
+def _load_postgres(conn) -> CatalogSnapshot:
+    snapshot = CatalogSnapshot(
+        dialect="postgresql",
+        default_schema=conn.execute(text("SELECT current_schema()")).scalar(),
+    )
+
+    for row in conn.execute(text(_PG_COLUMNS)).mappings():
+        table = _table(snapshot, row["schema_name"], row["table_name"])
+        table.comment = row["table_comment"]
+        table.columns.append(ColumnInfo(
+            name=row["column_name"],
+            type=row["data_type"],
+            nullable=row["nullable"],
+            default=row["column_default"],
+            comment=row["column_comment"],
+            identity=row["is_identity"],
+        ))
+
+    for row in conn.execute(text(_PG_CONSTRAINTS)).mappings():
+        key = table_key(row["schema_name"], row["table_name"], snapshot.default_schema)
+        table = snapshot.tables.get(key)
+        if table is None:
+            continue
+        if row["constraint_type"] == "p":
+            _mark_primary_key(table, row["columns"])
+        else:
+            table.foreign_keys.append(ForeignKeyInfo(
+                name=row["constraint_name"],
+                columns=list(row["columns"]),
+                referred_table=table_key(row["ref_schema"], row["ref_table"], snapshot.default_schema),
+                referred_columns=list(row["ref_columns"]),
+            ))
+
+    for row in conn.execute(text(_PG_INDEXES)).mappings():
+        key = table_key(row["schema_name"], row["table_name"], snapshot.default_schema)
+        table = snapshot.tables.get(key)
+        if table is None:
+            continue
+        table.indexes.append(IndexInfo(
+            name=row["index_name"],
+            columns=list(row["columns"]),
+            unique=row["is_unique"],
+            primary_key=row["is_primary"],
+        ))
+
+    return snapshot
+
+
+# ----------------------------------------------------------------------
+# SQL Server (sys.*)
+# ----------------------------------------------------------------------
+_MSSQL_COLUMNS = """
+SELECT s.name AS schema_name,
+       t.name AS table_name,
+       CAST(tep.value AS NVARCHAR(4000)) AS table_comment,
+       c.name AS column_name,
+       ty.name AS data_type,
+       c.max_length,
+       c.precision,
+       c.scale,
+       c.is_nullable AS nullable,
+       dc.definition AS column_default,
+       CAST(cep.value AS NVARCHAR(4000)) AS column_comment,
+       c.is_identity
+FROM sys.tables t
+JOIN sys.schemas s ON s.schema_id = t.schema_id
+JOIN sys.columns c ON c.object_id = t.object_id
+JOIN sys.types ty ON ty.user_type_id = c.user_type_id
+LEFT JOIN sys.default_constraints dc ON dc.object_id = c.default_object_id
+LEFT JOIN sys.extended_properties tep
+       ON tep.class = 1 AND tep.major_id = t.object_id AND tep.minor_id = 0
+      AND tep.name = 'MS_Description'
+LEFT JOIN sys.extended_properties cep
+       ON cep.class = 1 AND cep.major_id = t.object_id AND cep.minor_id = c.column_id
+      AND cep.name = 'MS_Description'
+WHERE t.is_ms_shipped = 0
+ORDER BY s.name, t.name, c.column_id
+"""
+
+_MSSQL_INDEXES = """
+SELECT s.name AS schema_name,
+       t.name AS table_name,
+       i.name AS index_name,
+       i.is_unique,
+       i.is_primary_key,
+       c.name AS column_name
+FROM sys.indexes i
+JOIN sys.tables t ON t.object_id = i.object_id
+JOIN sys.schemas s ON s.schema_id = t.schema_id
+JOIN sys.index_columns ic
+     ON ic.object_id = i.object_id AND ic.index_id = i.index_id AND ic.is_included_column = 0
+JOIN sys.columns c ON c.object_id = ic.object_id AND c.column_id = ic.column_id
+WHERE t.is_ms_shipped = 0 AND i.type > 0
+ORDER BY s.name, t.name, i.name, ic.key_ordinal
+"""
+
+_MSSQL_FOREIGN_KEYS = """
+SELECT ps.name AS schema_name,
+       pt.name AS table_name,
+       fk.name AS constraint_name,
+       pc.name AS column_name,
+       rs.name AS ref_schema,
+       rt.name AS ref_table,
+       rc.name AS ref_column
+FROM sys.foreign_key_columns fkc
+JOIN sys.foreign_keys fk ON fk.object_id = fkc.constraint_object_id
+JOIN sys.tables pt ON pt.object_id = fkc.parent_object_id
+JOIN sys.schemas ps ON ps.schema_id = pt.schema_id
+JOIN sys.columns pc ON pc.object_id = fkc.parent_object_id AND pc.column_id = fkc.parent_column_id
+JOIN sys.tables rt ON rt.object_id = fkc.referenced_object_id
+JOIN sys.schemas rs ON rs.schema_id = rt.schema_id
+JOIN sys.columns rc ON rc.object_id = fkc.referenced_object_id AND rc.column_id = fkc.referenced_column_id
+ORDER BY ps.name, pt.name, fk.name, fkc.constraint_column_id
+"""
+
+
+def _mssql_type(row) -> str:
+    name = row["data_type"]
+    if name in ("varchar", "char", "varbinary", "binary", "nvarchar", "nchar"):
+        if row["max_length"] == -1:
+            return f"{name}(max)"
+        length = row["max_length"] // 2 if name.startswith("n") else row["max_length"]
+        return f"{name}({length})"
+    if name in ("decimal", "numeric"):
+        return f"{name}({row['precision']},{row['scale']})"
+    return name
+
+
+def _load_mssql(conn) -> CatalogSnapshot:
+    snapshot = CatalogSnapshot(
+        dialect="mssql",
+        default_schema=conn.execute(text("SELECT SCHEMA_NAME()")).scalar(),
+    )
+
+    for row in conn.execute(text(_MSSQL_COLUMNS)).mappings():
+        table = _table(snapshot, row["schema_name"], row["table_name"])
+        table.comment = row["table_comment"]
+        table.columns.append(ColumnInfo(
+            name=row["column_name"],
+            type=_mssql_type(row),
+            nullable=bool(row["nullable"]),
+            default=row["column_default"],
+            comment=row["column_comment"],
+            identity=bool(row["is_identity"]),
+        ))
+
+    indexes: Dict[tuple, IndexInfo] = {}
+    for row in conn.execute(text(_MSSQL_INDEXES)).mappings():
+        key = table_key(row["schema_name"], row["table_name"], snapshot.default_schema)
+        table = snapshot.tables.get(key)
+        if table is None:
+            continue
+        index = indexes.get((key, row["index_name"]))
+        if index is None:
+            index = IndexInfo(
+                name=row["index_name"],
+                columns=[],
+                unique=bool(row["is_unique"]),
+                primary_key=bool(row["is_primary_key"]),
+            )
+            indexes[(key, row["index_name"])] = index
+            table.indexes.append(index)
+        index.columns.append(row["column_name"])
+
+    for (key, _), index in indexes.items():
+        if index.primary_key:
+            _mark_primary_key(snapshot.tables[key], index.columns)
+
+    foreign_keys: Dict[tuple, ForeignKeyInfo] = {}
+    for row in conn.execute(text(_MSSQL_FOREIGN_KEYS)).mappings():
+        key = table_key(row["schema_name"], row["table_name"], snapshot.default_schema)
+        table = snapshot.tables.get(key)
+        if table is None:
+            continue
+        fk = foreign_keys.get((key, row["constraint_name"]))
+        if fk is None:
+            fk = ForeignKeyInfo(
+                name=row["constraint_name"],
+                columns=[],
+                referred_table=table_key(row["ref_schema"], row["ref_table"], snapshot.default_schema),
+                referred_columns=[],
+            )
+            foreign_keys[(key, row["constraint_name"])] = fk
+            table.foreign_keys.append(fk)
+        fk.columns.append(row["column_name"])
+        fk.referred_columns.append(row["ref_column"])
+
+    return snapshot
+
+
+# ----------------------------------------------------------------------
+# Any other dialect: one inspector, default schema only
+# ----------------------------------------------------------------------
+def _load_generic(conn) -> CatalogSnapshot:
+    insp = inspect(conn)
+    snapshot = CatalogSnapshot(dialect=conn.dialect.name, default_schema=insp.default_schema_name)
+
+    for name in insp.get_table_names():
+        table = _table(snapshot, insp.default_schema_name, name)
+        for col in insp.get_columns(name):
+            table.columns.append(ColumnInfo(
+                name=col["name"],
+                type=str(col["type"]),
+                nullable=col.get("nullable", True),
+                default=col.get("default"),
+                comment=col.get("comment"),
+            ))
+        _mark_primary_key(table, insp.get_pk_constraint(name).get("constrained_columns") or [])
+        for fk in insp.get_foreign_keys(name):
+            table.foreign_keys.append(ForeignKeyInfo(
+                name=fk.get("name"),
+                columns=fk["constrained_columns"],
+                referred_table=table_key(fk.get("referred_schema"), fk["referred_table"], snapshot.default_schema),
+                referred_columns=fk["referred_columns"],
+            ))
+        for ix in insp.get_indexes(name):
+            table.indexes.append(IndexInfo(
+                name=ix.get("name"),
+                columns=[c for c in ix["column_names"] if c],
+                unique=bool(ix.get("unique")),
+            ))
+
+    return snapshot
+
+
+def _loader(dialect: str):
+    if dialect == "postgresql":
+        return _load_postgres
+    if dialect == "mssql":
+        return _load_mssql
+    return _load_generic
+
+
+def load_catalog(engine: Engine) -> CatalogSnapshot:
+    with governed_connection(engine) as conn:
+        return _loader(engine.dialect.name)(conn)
+
+
+async def aload_catalog(engine: AsyncEngine) -> CatalogSnapshot:
+    """load_catalog over an async driver; the same loaders run via run_sync."""
+    async with governed_async_connection(engine) as conn:
+        return await conn.run_sync(_loader(engine.dialect.name))
@@ -1,14 +1,93 @@
 # app/warehouse/client.py
-from typing import List, Dict
-from sqlalchemy import inspect, text
-from sqlalchemy.exc import SQLAlchemyError
+import asyncio
+import re
+import time
+from typing import Iterator, List, Dict, Optional
 
-from app.db.connection import get_engine
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.core.settings import settings
+from app.db.connection import get_async_engine, get_engine
+from app.warehouse.cache import connection_key, metadata_cache
+from app.warehouse.catalog import CatalogSnapshot, TableInfo
+from app.warehouse.governor import governed_async_connection, governed_connection
+
+_UNSET = object()
 
 
 class WarehouseClient:
-    def __init__(self):
-        self.engine = get_engine()
+    def __init__(self, db=None, connection: Optional[str] = None):
+        # `db` is the internal app session; the warehouse itself is reached
+        # through the named connection's pooled engine (default if None).
+        self.db = db
+        self.connection = connection
+        self.engine = get_engine(connection)
+        self._async_engine = _UNSET
+        self._catalog: Optional[CatalogSnapshot] = None
+
+    # ----------------------------------------
+    # Dialect helpers
+    # ----------------------------------------
+    @property
+    def dialect(self) -> Optional[str]:
+        if not self.engine:
+            return None
+        return self.engine.dialect.name
+
+    @property
+    def connection_key(self) -> Optional[str]:
+        """Stable id of the warehouse connection (URL without password)."""
+        if not self.engine:
+            return None
+        return connection_key(self.engine)
+
+    def connect(self, timeout: Optional[float] = None):
+        """
+        A governed connection: waits for a query slot on this warehouse and
+        limits each statement to `timeout` seconds (see app.warehouse.governor).
+        """
+        if not self.engine:
+            raise ValueError("Engine not initialized.")
+        return governed_connection(self.engine, timeout)
+
+    @property
+    def async_engine(self) -> Optional[AsyncEngine]:
+        """The connection's AsyncEngine; None when no async driver is available."""
+        if self._async_engine is _UNSET:
+            self._async_engine = get_async_engine(self.connection) if self.engine else None
+        return self._async_engine
+
+    def aconnect(self, timeout: Optional[float] = None):
+        """`async with client.aconnect() as conn`: connect() for the event loop."""
+        if self.async_engine is None:
+            raise ValueError("Async engine not available.")
+        return governed_async_connection(self.async_engine, timeout)
+
+    def quote_identifier(self, name: str) -> str:
+        return self.engine.dialect.identifier_preparer.quote(name)
+
+    def quote_table(self, table: str) -> str:
+        """Quote a table name, keeping an optional `schema.` prefix."""
+        parts = table.split(".")
+        return ".".join(self.quote_identifier(p) for p in parts)
+
+    # ----------------------------------------
+    # Catalog snapshot (process-wide cache, pinned per client)
+    # ----------------------------------------
+    def catalog(self) -> CatalogSnapshot:
+        if self._catalog is None:
+            self._catalog = metadata_cache.get_catalog(self.engine)
+        return self._catalog
+
+    async def acatalog(self) -> CatalogSnapshot:
+        """catalog() without blocking the event loop."""
+        if self._catalog is None:
+            if self.async_engine is not None:
+                self._catalog = await metadata_cache.aget_catalog(self.engine, self.async_engine)
+            else:
+                # No async driver: load through the sync pool on a worker thread.
+                self._catalog = await asyncio.to_thread(metadata_cache.get_catalog, self.engine)
+        return self._catalog
 
     # ----------------------------------------
     # List tables
@@ -16,8 +95,12 @@ class WarehouseClient:
     def list_tables(self) -> List[str]:
         if not self.engine:
             return []
-        insp = inspect(self.engine)
-        return insp.get_table_names()
+        return self.catalog().list_tables()
+
+    async def alist_tables(self) -> List[str]:
+        if not self.engine:
+            return []
+        return (await self.acatalog()).list_tables()
 
     # ----------------------------------------
     # Get columns for a specific table
@@ -25,23 +108,165 @@ class WarehouseClient:
     def get_columns(self, table_name: str) -> List[Dict]:
         if not self.engine:
             return []
-        insp = inspect(self.engine)
-        return insp.get_columns(table_name)
+        return self.catalog().get_columns(table_name)
+
+    # ----------------------------------------
+    # Full table metadata (columns, keys, indexes)
+    # ----------------------------------------
+    def get_table(self, table_name: str) -> TableInfo:
+        if not self.engine:
+            raise ValueError("Engine not initialized.")
+        return self.catalog().get_table(table_name)
 
     # ----------------------------------------
-    # Run safe SQL (SELECT only)
+    # Run safe SQL (SELECT only), streamed under a row/byte budget
     # ----------------------------------------
-    def run_readonly_sql(self, sql: str):
+    def iter_readonly_sql(
+        self,
+        sql: str,
+        max_rows: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        batch_rows: Optional[int] = None,
+        max_seconds: Optional[float] = None,
+    ) -> Iterator[Dict]:
+        """
+        Stream a SELECT through a server-side cursor. Yields
+        {"columns": [...]} first, then {"rows": [[...], ...]} batches, and
+        finally {"row_count": n, "truncated": bool}. Reading stops (and
+        the cursor is closed) as soon as the row or byte budget is spent,
+        or `max_seconds` (SQL_STREAM_MAX_SECONDS) after the query started,
+        however slowly the caller reads; the summary then also carries
+        "deadline_exceeded": true.
+        """
         if not self.engine:
             raise ValueError("Engine not initialized.")
+        sql = check_readonly_sql(sql)
+
+        max_rows = max_rows or settings.SQL_MAX_ROWS
+        max_bytes = max_bytes or settings.SQL_MAX_BYTES
+        batch_rows = batch_rows or settings.SQL_BATCH_ROWS
+        max_seconds = max_seconds or settings.SQL_STREAM_MAX_SECONDS
+
+        row_count, byte_count, truncated, expired = 0, 0, False, False
+        deadline = time.monotonic() + max_seconds
+        with self.connect() as conn:
+            if conn.dialect.name == "postgresql":
+                # The text check cannot see what functions do: writes
+                # (nextval, SELECT INTO, writable CTEs ...) fail server-side.
+                conn.exec_driver_sql("SET TRANSACTION READ ONLY")
+            # Raw driver SQL: no bind-parameter parsing of the user's text,
+            # and no parameters passed, so drivers such as psycopg2 do not
+            # %-format it (LIKE 'a%' stays literal).
+            result = conn.exec_driver_sql(
+                sql, execution_options={"yield_per": batch_rows, "no_parameters": True}
+            )
+            try:
+                yield {"columns": list(result.keys())}
+
+                for partition in result.partitions(batch_rows):
+                    if time.monotonic() > deadline:
+                        truncated = expired = True
+                        break
+                    batch = []
+                    for row in partition:
+                        if row_count >= max_rows or byte_count >= max_bytes:
+                            truncated = True
+                            break
+                        values = list(row)
+                        byte_count += _approx_row_bytes(values)
+                        row_count += 1
+                        batch.append(values)
+                    if batch:
+                        yield {"rows": batch}
+                    if truncated:
+                        break
+            finally:
+                result.close()
+
+        summary = {"row_count": row_count, "truncated": truncated}
+        if expired:
+            summary["deadline_exceeded"] = True
+        yield summary
+
+    def run_readonly_sql(self, sql: str, max_rows: Optional[int] = None):
+        """Bounded, fully materialised variant of iter_readonly_sql."""
+        output = {"columns": [], "rows": [], "truncated": False}
+        for chunk in self.iter_readonly_sql(sql, max_rows=max_rows):
+            if "columns" in chunk:
+                output["columns"] = chunk["columns"]
+            elif "rows" in chunk:
+                output["rows"].extend(chunk["rows"])
+            else:
+                output["truncated"] = chunk["truncated"]
+        return output
+
+
+# ----------------------------------------
+# Read-only SQL guard
+# ----------------------------------------
+_LEADING_COMMENTS = re.compile(r"^(\s+|--[^\n]*(\n|$)|/\*.*?\*/)*", re.S)
+
+
+def _split_statements(sql: str, blank_quoted: bool = False) -> List[str]:
+    """
+    Split on semicolons outside quotes and comments. With `blank_quoted`
+    the contents of quoted literals and identifiers become spaces, leaving
+    only the SQL keywords to search.
+    """
+    statements, current, i, quote = [], [], 0, None
+    while i < len(sql):
+        ch = sql[i]
+        if quote:
+            if ch == quote:
+                quote = None
+                current.append(ch)
+            else:
+                current.append(" " if blank_quoted else ch)
+        elif ch in ("'", '"', "["):
+            quote = "]" if ch == "[" else ch
+            current.append(ch)
+        elif sql.startswith("--", i):
+            end = sql.find("\n", i)
+            i = len(sql) if end == -1 else end
+            continue
+        elif sql.startswith("/*", i):
+            end = sql.find("*/", i + 2)
+            i = len(sql) if end == -1 else end + 2
+            continue
+        elif ch == ";":
+            statements.append("".join(current))
+            current = []
+        else:
+            current.append(ch)
+        i += 1
+    statements.append("".join(current))
+    return [s for s in statements if s.strip()]
+
+
+def check_readonly_sql(sql: str) -> str:
+    """Return the statement unchanged if it is a single SELECT, else raise."""
+    statements = _split_statements(sql)
+    if len(statements) != 1:
+        raise ValueError("Read-only mode: exactly one statement is allowed.")
+
+    body = _LEADING_COMMENTS.sub("", sql, count=1)
+    if not re.match(r"select\b", body, re.I):
+        raise ValueError("Read-only mode: Only SELECT statements allowed.")
+    # SELECT ... INTO creates a table (SQL Server has no read-only
+    # transaction to stop it).
+    if re.search(r"\binto\b", _split_statements(sql, blank_quoted=True)[0], re.I):
+        raise ValueError("Read-only mode: SELECT ... INTO is not allowed.")
+    return sql.strip().rstrip(";").strip()
+
+
+def _approx_row_bytes(values: List) -> int:
+    return sum(len(v) if isinstance(v, (str, bytes)) else 8 for v in values if v is not None)
+
 
-        sql = sql.strip().lower()
-        if not sql.startswith("select"):
-            raise ValueError("Read-only mode: Only SELECT statements allowed.")
+def get_warehouse_client(db=None, connection: Optional[str] = None) -> WarehouseClient:
+    return WarehouseClient(db, connection)
 
-        with self.engine.connect() as conn:
-            result = conn.execute(text(sql))
-            rows = result.fetchall()
-            cols = result.keys()
 
-        return {"columns": cols, "rows": rows}
+async def aget_warehouse_client(db=None, connection: Optional[str] = None) -> WarehouseClient:
+    """get_warehouse_client for async code: resolving the connection reads the internal DB."""
+    return await asyncio.to_thread(WarehouseClient, db, connection)
@@ -0,0 +1,112 @@
+# app/warehouse/export.py
+import io
+import json
+from typing import Dict, Iterator, List
+
+try:
+    import pyarrow as pa
+except ImportError:  # Arrow output is optional
+    pa = None
+
+
+# ----------------------------------------
+# Encoders for WarehouseClient.iter_readonly_sql chunks
+# ----------------------------------------
+def ndjson_lines(chunks: Iterator[Dict]) -> Iterator[str]:
+    """
+    One JSON object per line: a header with the columns, one line per
+    row (as a column -> value object) and a trailing summary line.
+    """
+    columns: List[str] = []
+    for chunk in chunks:
+        if "columns" in chunk:
+            columns = chunk["columns"]
+            yield json.dumps({"columns": columns}) + "\n"
+        elif "rows" in chunk:
+            for row in chunk["rows"]:
+                yield json.dumps(dict(zip(columns, row)), default=str) + "\n"
+        else:
+            yield json.dumps(chunk) + "\n"
+
+
+def arrow_available() -> bool:
+    return pa is not None
+
+
+def _record_batch(columns: List[str], rows: List[List]):
+    arrays = []
+    for i in range(len(columns)):
+        values = [row[i] for row in rows]
+        try:
+            array = pa.array(values)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            array = pa.array([None if v is None else str(v) for v in values])
+        arrays.append(array)
+    return pa.RecordBatch.from_arrays(arrays, names=columns)
+
+
+def _unify(batch, schema):
+    """Cast a batch to the stream schema, falling back to strings."""
+    if batch.schema.equals(schema):
+        return batch
+    arrays = []
+    for array, field in zip(batch.columns, schema):
+        try:
+            arrays.append(array.cast(field.type))
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+            arrays.append(pa.array([None if v is None else str(v) for v in array.to_pylist()]))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def arrow_ipc_stream(chunks: Iterator[Dict]) -> Iterator[bytes]:
+    """
+    Arrow IPC stream format, one record batch per fetched partition. The
+    schema is taken from the first batch; columns whose types cannot be
+    inferred there (all-NULL) or change later are sent as strings.
+    """
+    if pa is None:
+        raise RuntimeError("pyarrow is not installed; Arrow output is unavailable.")
+
+    columns: List[str] = []
+    sink, writer, schema = None, None, None
+    for chunk in chunks:
+        if "columns" in chunk:
+            columns = chunk["columns"]
+            continue
+        if "rows" not in chunk:
+            continue
+
+        batch = _record_batch(columns, chunk["rows"])
+        if writer is None:
+            schema = pa.schema([
+                pa.field(f.name, pa.string() if pa.types.is_null(f.type) else f.type)
+                for f in batch.schema
+            ])
+            sink = _Sink()
+            writer = pa.ipc.new_stream(sink, schema)
+        writer.write_batch(_unify(batch, schema))
+        yield sink.drain()
+
+    if writer is None:
+        sink = _Sink()
+        writer = pa.ipc.new_stream(sink, pa.schema([pa.field(c, pa.string()) for c in columns]))
+    writer.close()
+    yield sink.drain()
+
+
+class _Sink(io.RawIOBase):
+    """Write-only buffer that hands back what was written since the last drain."""
+
+    def __init__(self):
+        self._buffer = bytearray()
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._buffer.extend(data)
+        return len(data)
+
+    def drain(self) -> bytes:
+        data, self._buffer = bytes(self._buffer), bytearray()
+        return data
@@ -0,0 +1,330 @@
+# app/warehouse/governor.py
+"""
+Query governor: every warehouse statement runs through
+`governed_connection`, which
+- waits for one of the warehouse's concurrency slots (bounded queue),
+- sets a server-side statement/lock timeout on the connection,
+- arms a client-side watchdog that cancels the statement through the
+  driver if the server does not stop it in time,
+- turns driver errors caused by cancellation into QueryCancelled /
+  QueryTimeout.
+`governed_async_connection` does the same for an AsyncEngine, waiting on
+the event loop instead of a thread.
+"""
+import asyncio
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Dict, Iterator, Optional
+
+from sqlalchemy import event, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from app.core.settings import settings
+from app.warehouse.cancel import QueryCancelled, _cancel_statement, current_cancel_scope
+
+
+class QueryTimeout(QueryCancelled):
+    """The statement ran past its timeout and was cancelled."""
+
+
+class WarehouseBusy(Exception):
+    """The warehouse's query queue is full, or the wait for a slot timed out."""
+
+
+# ----------------------------------------------------------------------
+# Admission control: a concurrency semaphore with a bounded queue
+# ----------------------------------------------------------------------
+# How often queued callers re-check their cancel scope.
+_QUEUE_POLL_SECONDS = 0.2
+
+
+class QueryGovernor:
+    def __init__(self, max_concurrent: int, max_queued: int, queue_timeout: float):
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+
+        self._cond = threading.Condition()
+        self._running = 0
+        self._queued = 0
+
+        self.admitted = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.cancelled = 0
+        self.total_wait_seconds = 0.0
+
+    def acquire(self) -> None:
+        scope = current_cancel_scope()
+        started = time.monotonic()
+        with self._cond:
+            if self._running >= self.max_concurrent and self._queued >= self.max_queued:
+                self.rejected += 1
+                raise WarehouseBusy(
+                    f"Warehouse busy: {self._running} queries running, {self._queued} queued"
+                )
+
+            self._queued += 1
+            try:
+                while self._running >= self.max_concurrent:
+                    if scope is not None and scope.cancelled:
+                        self.cancelled += 1
+                        raise QueryCancelled("Cancelled while queued")
+                    waited = time.monotonic() - started
+                    if waited >= self.queue_timeout:
+                        self.rejected += 1
+                        raise WarehouseBusy(f"Warehouse busy: no query slot after {waited:.0f}s")
+                    self._cond.wait(min(_QUEUE_POLL_SECONDS, self.queue_timeout - waited))
+            finally:
+                self._queued -= 1
+
+            self._running += 1
+            self.admitted += 1
+            self.total_wait_seconds += time.monotonic() - started
+
+    async def acquire_async(self) -> None:
+        """acquire() for the event loop: queued callers sleep instead of holding a thread."""
+        scope = current_cancel_scope()
+        started = time.monotonic()
+        with self._cond:
+            if self._running >= self.max_concurrent and self._queued >= self.max_queued:
+                self.rejected += 1
+                raise WarehouseBusy(
+                    f"Warehouse busy: {self._running} queries running, {self._queued} queued"
+                )
+            self._queued += 1
+
+        try:
+            while True:
+                with self._cond:
+                    if self._running < self.max_concurrent:
+                        self._running += 1
+                        self.admitted += 1
+                        self.total_wait_seconds += time.monotonic() - started
+                        return
+                    if scope is not None and scope.cancelled:
+                        self.cancelled += 1
+                        raise QueryCancelled("Cancelled while queued")
+                    waited = time.monotonic() - started
+                    if waited >= self.queue_timeout:
+                        self.rejected += 1
+                        raise WarehouseBusy(f"Warehouse busy: no query slot after {waited:.0f}s")
+                await asyncio.sleep(min(_QUEUE_POLL_SECONDS, self.queue_timeout - waited))
+        finally:
+            with self._cond:
+                self._queued -= 1
+
+    def release(self) -> None:
+        with self._cond:
+            self._running -= 1
+            self._cond.notify()
+
+    def stats(self) -> Dict:
+        with self._cond:
+            return {
+                "running": self._running,
+                "queued": self._queued,
+                "max_concurrent": self.max_concurrent,
+                "max_queued": self.max_queued,
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+                "statement_timeouts": self.timeouts,
+                "cancelled_while_queued": self.cancelled,
+                "avg_wait_seconds": self.total_wait_seconds / self.admitted if self.admitted else 0.0,
+            }
+
+
+_governors: Dict[str, QueryGovernor] = {}
+_governors_lock = threading.Lock()
+
+
+def get_governor(engine) -> QueryGovernor:
+    """
+    One governor per warehouse (connection URL without the driver), shared
+    by every pool user, sync or async.
+    """
+    url = engine.url
+    key = url.set(drivername=url.get_backend_name()).render_as_string(hide_password=True)
+    with _governors_lock:
+        governor = _governors.get(key)
+        if governor is None:
+            governor = QueryGovernor(
+                max_concurrent=settings.WAREHOUSE_MAX_CONCURRENT_QUERIES,
+                max_queued=settings.WAREHOUSE_MAX_QUEUED_QUERIES,
+                queue_timeout=settings.WAREHOUSE_QUEUE_TIMEOUT_SECONDS,
+            )
+            _governors[key] = governor
+        return governor
+
+
+def governor_stats() -> Dict[str, Dict]:
+    with _governors_lock:
+        governors = dict(_governors)
+    return {key: g.stats() for key, g in governors.items()}
+
+
+# ----------------------------------------------------------------------
+# Timeouts
+# ----------------------------------------------------------------------
+# Extra time the server gets to enforce its own timeout before the
+# client-side watchdog cancels the statement.
+_WATCHDOG_GRACE_SECONDS = 2.0
+
+_TIMEOUT_KEY = "drdb_statement_timeout"
+_WATCHDOG_KEY = "drdb_watchdog"
+_TIMED_OUT_KEY = "drdb_timed_out"
+
+
+def _apply_server_timeouts(conn: Connection, timeout: float, driver_timeout: bool = True) -> None:
+    """
+    Server-side statement/lock limits. `driver_timeout` also sets the
+    pyodbc query timeout; async adapters (aioodbc) do not expose it and
+    rely on the caller's asyncio deadline instead.
+    """
+    dialect = conn.dialect.name
+    lock_ms = int(settings.WAREHOUSE_LOCK_TIMEOUT_SECONDS * 1000)
+    if dialect == "postgresql":
+        # SET LOCAL ends with the transaction, so pooled connections come
+        # back clean.
+        conn.execute(text(f"SET LOCAL statement_timeout = {int(timeout * 1000)}"))
+        conn.execute(text(f"SET LOCAL lock_timeout = {lock_ms}"))
+    elif dialect == "mssql":
+        conn.execute(text(f"SET LOCK_TIMEOUT {lock_ms}"))
+        if driver_timeout:
+            # pyodbc query timeout (seconds), enforced by the driver per statement.
+            conn.connection.dbapi_connection.timeout = max(1, int(timeout))
+
+
+def _clear_server_timeouts(conn: Connection) -> None:
+    if conn.dialect.name == "mssql":
+        try:
+            conn.connection.dbapi_connection.timeout = 0
+        except Exception:
+            pass
+
+
+def _is_timeout_error(e: Exception) -> bool:
+    message = str(e).lower()
+    return (
+        "statement timeout" in message      # Postgres
+        or "lock timeout" in message
+        or "hyt00" in message               # ODBC query timeout
+        or "lock request time out" in message
+    )
+
+
+def _start_watchdog(conn, cursor, statement, parameters, context, executemany):
+    timeout = conn.info.get(_TIMEOUT_KEY)
+    if not timeout:
+        return
+    dbapi_conn = conn.connection.dbapi_connection
+
+    def fire():
+        conn.info[_TIMED_OUT_KEY] = True
+        _cancel_statement(cursor, dbapi_conn)
+
+    timer = threading.Timer(timeout + _WATCHDOG_GRACE_SECONDS, fire)
+    timer.daemon = True
+    conn.info[_WATCHDOG_KEY] = timer
+    timer.start()
+
+
+def _stop_watchdog(conn, *args):
+    timer = conn.info.pop(_WATCHDOG_KEY, None)
+    if timer is not None:
+        timer.cancel()
+
+
+def _stop_watchdog_on_error(context):
+    conn = getattr(context, "connection", None)
+    if conn is not None:
+        _stop_watchdog(conn)
+
+
+def install_governor_hooks(engine: Engine) -> None:
+    if not event.contains(engine, "before_cursor_execute", _start_watchdog):
+        event.listen(engine, "before_cursor_execute", _start_watchdog)
+        event.listen(engine, "after_cursor_execute", _stop_watchdog)
+        event.listen(engine, "handle_error", _stop_watchdog_on_error)
+
+
+# ----------------------------------------------------------------------
+# Entry point
+# ----------------------------------------------------------------------
+@contextmanager
+def governed_connection(engine: Engine, timeout: Optional[float] = None) -> Iterator[Connection]:
+    """
+    A warehouse connection that holds one of the warehouse's query slots
+    for its lifetime, with every statement limited to `timeout` seconds
+    (WAREHOUSE_STATEMENT_TIMEOUT_SECONDS by default).
+    """
+    timeout = timeout or settings.WAREHOUSE_STATEMENT_TIMEOUT_SECONDS
+    governor = get_governor(engine)
+    scope = current_cancel_scope()
+    if scope is not None:
+        scope.check()
+
+    governor.acquire()
+    try:
+        with engine.connect() as conn:
+            conn.info[_TIMEOUT_KEY] = timeout
+            conn.info.pop(_TIMED_OUT_KEY, None)
+            try:
+                _apply_server_timeouts(conn, timeout)
+                yield conn
+            except QueryCancelled:
+                raise
+            except Exception as e:
+                if conn.info.get(_TIMED_OUT_KEY) or _is_timeout_error(e):
+                    with governor._cond:
+                        governor.timeouts += 1
+                    raise QueryTimeout(f"Query exceeded the {timeout:g}s statement timeout") from e
+                if scope is not None and scope.cancelled:
+                    raise QueryCancelled("Cancelled") from e
+                raise
+            finally:
+                _stop_watchdog(conn)
+                conn.info.pop(_TIMEOUT_KEY, None)
+                conn.info.pop(_TIMED_OUT_KEY, None)
+                _clear_server_timeouts(conn)
+    finally:
+        governor.release()
+
+
+@asynccontextmanager
+async def governed_async_connection(
+    engine: AsyncEngine, timeout: Optional[float] = None
+) -> AsyncIterator[AsyncConnection]:
+    """
+    governed_connection for an AsyncEngine. The slot is shared with the
+    sync pool of the same warehouse. The client-side deadline covers the
+    whole block: cancelling the awaiting task makes the async driver abort
+    the running statement.
+    """
+    timeout = timeout or settings.WAREHOUSE_STATEMENT_TIMEOUT_SECONDS
+    governor = get_governor(engine)
+    scope = current_cancel_scope()
+    if scope is not None:
+        scope.check()
+
+    await governor.acquire_async()
+    try:
+        async with engine.connect() as conn:
+            try:
+                await conn.run_sync(_apply_server_timeouts, timeout, False)
+                async with asyncio.timeout(timeout + _WATCHDOG_GRACE_SECONDS):
+                    yield conn
+            except QueryCancelled:
+                raise
+            except Exception as e:
+                if isinstance(e, TimeoutError) or _is_timeout_error(e):
+                    with governor._cond:
+                        governor.timeouts += 1
+                    raise QueryTimeout(f"Query exceeded the {timeout:g}s statement timeout") from e
+                if scope is not None and scope.cancelled:
+                    raise QueryCancelled("Cancelled") from e
+                raise
+    finally:
+        governor.release()
@@ -1,9 +1,9 @@
 from app.warehouse.client import WarehouseClient
 
-def list_tables():
-    client = WarehouseClient()
+def list_tables(db=None, connection=None):
+    client = WarehouseClient(db, connection)
     return client.list_tables()
 
-def extract_table_metadata(table_name):
-    client = WarehouseClient()
-    return client.get_columns(table_name)
+def extract_table_metadata(db, table_name, connection=None):
+    client = WarehouseClient(db, connection)
+    return client.get_table(table_name).as_dict()
@@ -0,0 +1,234 @@
+# app/warehouse/schema_index.py
+"""
+Schema retrieval for agent prompts: a BM25 index over table and column
+names, comments and foreign-key neighbours picks the tables relevant to a
+question, and the selection is rendered as compact DDL under a token budget.
+"""
+import math
+import re
+import threading
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from app.core.settings import settings
+from app.warehouse.catalog import CatalogSnapshot, TableInfo
+
+
+# ----------------------------------------------------------------------
+# Tokenizing identifiers and questions
+# ----------------------------------------------------------------------
+_WORD = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|\d+")
+
+# Field weights: a question naming the table matters more than a column hit.
+_TABLE_WEIGHT = 3
+_COLUMN_WEIGHT = 1
+_COMMENT_WEIGHT = 1
+_NEIGHBOUR_WEIGHT = 1
+
+_STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "do", "does", "for", "from",
+    "how", "i", "in", "is", "it", "many", "me", "my", "of", "on", "or", "show",
+    "that", "the", "there", "this", "to", "us", "was", "what", "when", "where",
+    "which", "who", "why", "with", "table", "tables", "column", "columns",
+}
+
+
+def _stem(token: str) -> str:
+    if len(token) > 4 and token.endswith("ies"):
+        return token[:-3] + "y"
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Split snake_case, camelCase and prose into lowercase, lightly stemmed terms."""
+    if not text:
+        return []
+    tokens = []
+    for word in _WORD.findall(text):
+        word = word.lower()
+        if word not in _STOPWORDS:
+            tokens.append(_stem(word))
+    return tokens
+
+
+def _table_terms(table: TableInfo, neighbours: List[str]) -> Counter:
+    terms = Counter()
+    for token in tokenize(table.name):
+        terms[token] += _TABLE_WEIGHT
+    for token in tokenize(table.schema):
+        terms[token] += _COLUMN_WEIGHT
+    for token in tokenize(table.comment):
+        terms[token] += _COMMENT_WEIGHT
+    for col in table.columns:
+        for token in tokenize(col.name):
+            terms[token] += _COLUMN_WEIGHT
+        for token in tokenize(col.comment):
+            terms[token] += _COMMENT_WEIGHT
+    for neighbour in neighbours:
+        for token in tokenize(neighbour.rsplit(".", 1)[-1]):
+            terms[token] += _NEIGHBOUR_WEIGHT
+    return terms
+
+
+# ----------------------------------------------------------------------
+# BM25 index
+# ----------------------------------------------------------------------
+class SchemaIndex:
+    """Okapi BM25 over one document per table."""
+
+    def __init__(self, snapshot: CatalogSnapshot, k1: float = 1.2, b: float = 0.75):
+        self.snapshot = snapshot
+        self.k1 = k1
+        self.b = b
+
+        self.neighbours: Dict[str, List[str]] = defaultdict(list)
+        for key, table in snapshot.tables.items():
+            for fk in table.foreign_keys:
+                if fk.referred_table != key:
+                    self.neighbours[key].append(fk.referred_table)
+                    self.neighbours[fk.referred_table].append(key)
+
+        self.postings: Dict[str, List[Tuple[str, int]]] = defaultdict(list)
+        self.lengths: Dict[str, int] = {}
+        for key, table in snapshot.tables.items():
+            terms = _table_terms(table, self.neighbours.get(key, []))
+            self.lengths[key] = sum(terms.values())
+            for term, tf in terms.items():
+                self.postings[term].append((key, tf))
+
+        n = len(self.lengths)
+        self.avg_length = (sum(self.lengths.values()) / n) if n else 0.0
+        self.idf = {
+            term: math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+            for term, docs in self.postings.items()
+        }
+
+    def search(self, question: str, k: int) -> List[Tuple[str, float]]:
+        scores: Dict[str, float] = defaultdict(float)
+        for term in set(tokenize(question)):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for key, tf in self.postings[term]:
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[key] / (self.avg_length or 1))
+                scores[key] += idf * tf * (self.k1 + 1) / (tf + norm)
+        ranked = sorted(scores.items(), key=lambda kv: (-kv[1], kv[0]))
+        return ranked[:k]
+
+
+_indexes: Dict[str, Tuple[CatalogSnapshot, SchemaIndex]] = {}
+_lock = threading.Lock()
+
+
+def get_schema_index(client) -> SchemaIndex:
+    """One index per connection, rebuilt whenever the catalog snapshot changes."""
+    snapshot = client.catalog()
+    key = client.connection_key
+    with _lock:
+        cached = _indexes.get(key)
+        if cached and cached[0] is snapshot:
+            return cached[1]
+    index = SchemaIndex(snapshot)
+    with _lock:
+        _indexes[key] = (snapshot, index)
+    return index
+
+
+# ----------------------------------------------------------------------
+# Compact DDL rendering under a token budget
+# ----------------------------------------------------------------------
+def estimate_tokens(text: str) -> int:
+    """Rough LLM token count (about four characters per token)."""
+    return len(text) // 4 + 1
+
+
+def render_table(table: TableInfo) -> str:
+    """`TABLE key (col type PK NOT NULL, fk_col type -> other.col) -- comment`"""
+    references = {}
+    for fk in table.foreign_keys:
+        for col, ref in zip(fk.columns, fk.referred_columns):
+            references[col] = f"{fk.referred_table}.{ref}"
+
+    parts = []
+    for col in table.columns:
+        part = f"{col.name} {col.type.lower()}"
+        if col.primary_key:
+            part += " PK"
+        elif not col.nullable:
+            part += " NOT NULL"
+        if col.name in references:
+            part += f" -> {references[col.name]}"
+        if col.comment:
+            part += f" /* {col.comment} */"
+        parts.append(part)
+
+    line = f"TABLE {table.key} ({', '.join(parts)})"
+    if table.comment:
+        line += f" -- {table.comment}"
+    return line
+
+
+def build_schema_context(
+    client,
+    question: str,
+    tables: Optional[List[str]] = None,
+    top_k: Optional[int] = None,
+    token_budget: Optional[int] = None,
+) -> Dict:
+    """
+    Pick the tables for a prompt: explicitly selected tables first, then
+    the best BM25 matches for the question. Tables are rendered in that
+    order until the token budget is spent; the remaining tables are listed
+    by name only when the whole list still fits.
+    """
+    top_k = top_k or settings.SCHEMA_CONTEXT_TOP_K
+    token_budget = token_budget or settings.SCHEMA_CONTEXT_TOKEN_BUDGET
+
+    index = get_schema_index(client)
+    snapshot = index.snapshot
+
+    ranked = [t for t in (tables or []) if t in snapshot.tables]
+    for key, _ in index.search(question, top_k):
+        if key not in ranked:
+            ranked.append(key)
+
+    lines, included, used = [], [], 0
+    for key in ranked:
+        line = render_table(snapshot.tables[key])
+        cost = estimate_tokens(line)
+        if used + cost > token_budget and included:
+            continue
+        lines.append(line)
+        included.append(key)
+        used += cost
+
+    # Small warehouses: name the remaining tables too, if they all fit.
+    others = [key for key in snapshot.tables if key not in included]
+    if others:
+        listing = f"-- other tables: {', '.join(others)}"
+        if used + estimate_tokens(listing) <= token_budget:
+            lines.append(listing)
+            used += estimate_tokens(listing)
+        else:
+            lines.append(f"-- {len(others)} more tables not shown")
+
+    return {
+        "text": "\n".join(lines),
+        "tables": included,
+        "total_tables": len(snapshot.tables),
+        "tokens": used,
+    }
+
+
+async def abuild_schema_context(
+    client,
+    question: str,
+    tables: Optional[List[str]] = None,
+    top_k: Optional[int] = None,
+    token_budget: Optional[int] = None,
+) -> Dict:
+    """build_schema_context with the catalog loaded without blocking the event loop."""
+    await client.acatalog()
+    return build_schema_context(client, question, tables=tables, top_k=top_k, token_budget=token_budget)
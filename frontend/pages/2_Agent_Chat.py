@@ -1,7 +1,7 @@
 # frontend/pages/2_Agent_Chat.py
 import streamlit as st
 
-from utils.api import fetch_tables, run_agents, test_connection
+from utils.api import fetch_tables, stream_agents, test_connection
 
 st.title("💬 Dr. Database — Agent Chat")
 
@@ -41,22 +41,45 @@ if st.button("Ask Dr. Database"):
     if not question.strip():
         st.error("Please enter a question.")
     else:
-        with st.spinner("Thinking with LangGraph agents..."):
-            result, err = run_agents(
-                question=question.strip(),
-                tables=selected_tables,
-                sql_text=sql_input.strip() or None,
-            )
+        st.subheader("🧠 Answer")
+        status = st.status("Thinking with LangGraph agents...", expanded=False)
+        answer_box = st.empty()
+        answer = ""
+        result, err = None, None
+
+        for event, data in stream_agents(
+            question=question.strip(),
+            tables=selected_tables,
+            sql_text=sql_input.strip() or None,
+        ):
+            if event == "token":
+                answer += data.get("text", "")
+                answer_box.markdown(answer)
+            elif event == "node_start":
+                status.update(label=f"Running {data.get('node')}...")
+            elif event == "node_end":
+                status.write(f"✔ {data.get('node')} ({data.get('elapsed_ms')} ms)")
+            elif event == "schema_loaded":
+                status.write(f"Loaded schema for {data.get('tables')} tables")
+            elif event == "dq_table_done":
+                mark = "⚠" if data.get("error") else "✔"
+                status.write(f"{mark} DQ checks for {data.get('table')}")
+            elif event == "final":
+                result = data
+            elif event == "error":
+                err = data.get("error")
 
         if err:
+            status.update(label="Failed", state="error")
             st.error(f"❌ Error calling backend: {err}")
         elif not result:
+            status.update(label="Failed", state="error")
             st.error("No response from backend.")
         else:
-            # Main answer
+            status.update(label="Done", state="complete")
+            # Final answer (replaces the streamed text with the complete one)
             answer = result.get("answer") or result.get("sql") or "(no answer field)"
-            st.subheader("🧠 Answer")
-            st.write(answer)
+            answer_box.markdown(answer)
 
             # Debug trace from LangGraph
             debug = result.get("debug")
@@ -1,6 +1,7 @@
 import os
+import json
 import requests
-from typing import Dict, Any, List, Tuple, Optional
+from typing import Dict, Any, Iterator, List, Tuple, Optional
 
 BACKEND_URL = os.getenv("DRDB_BACKEND_URL", "http://localhost:8000")
 
@@ -11,13 +12,13 @@ def _url(path: str) -> str:
 
 def save_connection(payload: Dict[str, Any]) -> Tuple[bool, Optional[str]]:
     """
-    Uses new JSON endpoint: POST /config/save-json
+    POST /config/save (registers the connection under payload["name"], default "default")
     """
     try:
-        resp = requests.post(_url("/config/save-json"), json=payload, timeout=10)
+        resp = requests.post(_url("/config/save"), json=payload, timeout=10)
         data = resp.json()
 
-        if data.get("ok"):
+        if data.get("success"):
             return True, None
 
         return False, data.get("error", "Unknown error")
@@ -27,13 +28,14 @@ def save_connection(payload: Dict[str, Any]) -> Tuple[bool, Optional[str]]:
 
 def test_connection() -> Tuple[bool, Optional[str]]:
     """
-    Hit /dq/tables to verify DB engine exists and works.
+    Hit /config/test to verify the default connection exists and works.
     """
     try:
-        resp = requests.get(_url("/dq/tables"), timeout=10)
-        if resp.status_code == 200:
+        resp = requests.get(_url("/config/test"), timeout=10)
+        data = resp.json()
+        if data.get("success"):
             return True, None
-        return False, f"Status {resp.status_code}: {resp.text}"
+        return False, data.get("error") or f"Status {resp.status_code}: {resp.text}"
     except Exception as e:
         return False, str(e)
 
@@ -41,7 +43,7 @@ def test_connection() -> Tuple[bool, Optional[str]]:
 
 def fetch_tables() -> Tuple[List[str], Optional[str]]:
     try:
-        resp = requests.get(_url("/dq/tables"), timeout=10)
+        resp = requests.get(_url("/run/tables"), timeout=10)
         if resp.status_code == 200:
             data = resp.json()
             return data.get("tables", []), None
@@ -62,3 +64,35 @@ def run_agents(question: str, tables: List[str], sql_text: Optional[str]):
         return None, f"Status {resp.status_code}: {resp.text}"
     except Exception as e:
         return None, str(e)
+
+
+def stream_agents(question: str, tables: List[str], sql_text: Optional[str]) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """
+    POST /agents/run/stream and yield (event, data) pairs from the
+    server-sent event stream as they arrive.
+    """
+    payload = {
+        "question": question,
+        "tables": tables,
+        "sql_text": sql_text,
+    }
+    try:
+        with requests.post(_url("/agents/run/stream"), json=payload, stream=True, timeout=(10, 300)) as resp:
+            if resp.status_code != 200:
+                yield "error", {"error": f"Status {resp.status_code}: {resp.text}"}
+                return
+
+            event, data_lines = "message", []
+            for line in resp.iter_lines(decode_unicode=True):
+                if line is None:
+                    continue
+                if line == "":
+                    if data_lines:
+                        yield event, json.loads("\n".join(data_lines))
+                    event, data_lines = "message", []
+                elif line.startswith("event:"):
+                    event = line[len("event:"):].strip()
+                elif line.startswith("data:"):
+                    data_lines.append(line[len("data:"):].strip())
+    except Exception as e:
+        yield "error", {"error": str(e)}
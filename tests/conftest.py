@@ -0,0 +1,6 @@
+import os
+
+# Settings are read at import time; the sketch and estimator tests need
+# neither a warehouse nor an LLM.
+os.environ.setdefault("GEMINI_API_KEY", "test")
+os.environ.setdefault("APP_DB_URL", "sqlite://")
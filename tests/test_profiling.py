@@ -0,0 +1,75 @@
+import numpy as np
+
+from app.dq.profiling import _reservoir, estimate_distinct
+
+
+# ----------------------------------------------------------------------
+# Duj1
+# ----------------------------------------------------------------------
+def test_duj1_is_exact_on_the_whole_table():
+    assert estimate_distinct(sample_rows=1_000, distinct=37, singletons=5, total_rows=1_000) == 37
+    assert estimate_distinct(sample_rows=0, distinct=0, singletons=0, total_rows=1_000) == 0
+
+
+def test_duj1_keeps_the_sample_count_without_singletons():
+    # Every value repeats in the sample: assume they were all seen.
+    assert estimate_distinct(sample_rows=10_000, distinct=50, singletons=0, total_rows=1_000_000) == 50
+
+
+def test_duj1_scales_an_all_singleton_sample_to_the_table():
+    # A unique column: nothing repeats, so every row is a distinct value.
+    assert estimate_distinct(sample_rows=10_000, distinct=10_000, singletons=10_000, total_rows=1_000_000) == 1_000_000
+
+
+def test_duj1_is_capped_at_the_row_count():
+    estimate = estimate_distinct(sample_rows=10_000, distinct=9_999, singletons=9_998, total_rows=20_000)
+    assert 9_999 <= estimate <= 20_000
+
+
+def test_duj1_on_a_uniform_sample():
+    rng = np.random.default_rng(8)
+    table = rng.integers(0, 50_000, 1_000_000)
+    sample = rng.choice(table, 20_000, replace=False)
+    _, counts = np.unique(sample, return_counts=True)
+    estimate = estimate_distinct(
+        sample_rows=sample.size,
+        distinct=counts.size,
+        singletons=int(np.count_nonzero(counts == 1)),
+        total_rows=table.size,
+    )
+    true_distinct = np.unique(table).size
+    assert counts.size < estimate
+    assert abs(estimate - true_distinct) / true_distinct < 0.35
+
+
+# ----------------------------------------------------------------------
+# Reservoir sampling
+# ----------------------------------------------------------------------
+def _partitions(n: int, size: int):
+    rows = [(i,) for i in range(n)]
+    return [rows[start:start + size] for start in range(0, n, size)]
+
+
+def test_reservoir_keeps_everything_under_the_limit():
+    sample, seen = _reservoir(_partitions(40, 7), limit=100)
+    assert seen == 40
+    assert sample == [(i,) for i in range(40)]
+
+
+def test_reservoir_returns_limit_distinct_rows():
+    sample, seen = _reservoir(_partitions(10_000, 333), limit=500)
+    assert seen == 10_000
+    assert len(sample) == 500
+    assert len(set(sample)) == 500
+
+
+def test_reservoir_is_uniform_over_the_stream():
+    # Biased (head-truncating) sampling would never pick late rows.
+    n, limit, trials = 1_000, 100, 300
+    hits = np.zeros(n)
+    for _ in range(trials):
+        sample, _ = _reservoir(_partitions(n, 64), limit)
+        hits[[row[0] for row in sample]] += 1
+    deciles = hits.reshape(10, -1).sum(axis=1)
+    expected = trials * limit / 10
+    assert np.all(np.abs(deciles - expected) < 0.15 * expected)
@@ -0,0 +1,228 @@
+import math
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from app.dq.sketches import (
+    ColumnSketch,
+    HyperLogLog,
+    SpaceSaving,
+    TDigest,
+    _leading_zeros64,
+    hash_numbers,
+    hash_strings,
+)
+
+
+# ----------------------------------------------------------------------
+# Hashing
+# ----------------------------------------------------------------------
+def test_hash_strings_is_deterministic_and_spreads():
+    values = np.array([f"value-{i}" for i in range(10_000)])
+    first, second = hash_strings(values), hash_strings(values)
+    assert first.dtype == np.uint64
+    assert np.array_equal(first, second)
+    assert np.unique(first).size == values.size
+
+
+def test_hash_strings_mixes_in_length_past_the_hashed_prefix():
+    prefix = "x" * 100
+    hashes = hash_strings(np.array([prefix, prefix + "y", prefix + "yz"]))
+    assert np.unique(hashes).size == 3
+
+
+def test_hash_strings_handles_unicode_and_empty():
+    assert hash_strings(np.array([], dtype=str)).size == 0
+    hashes = hash_strings(np.array(["", "é", "e", "日本"]))
+    assert np.unique(hashes).size == 4
+
+
+def test_hash_numbers_treats_ints_and_floats_alike():
+    assert hash_numbers(np.array([1]))[0] == hash_numbers(np.array([1.0]))[0]
+    assert hash_numbers(np.array([-0.0]))[0] == hash_numbers(np.array([0.0]))[0]
+
+
+# ----------------------------------------------------------------------
+# HyperLogLog
+# ----------------------------------------------------------------------
+def test_leading_zeros64_matches_python():
+    rng = np.random.default_rng(1)
+    values = np.r_[
+        np.array([0, 1, 2**63, 2**32, 2**32 - 1], dtype=np.uint64),
+        rng.integers(0, 2**63, 1000, dtype=np.uint64) >> rng.integers(0, 63, 1000).astype(np.uint64),
+    ]
+    expected = [64 - int(v).bit_length() for v in values]
+    assert _leading_zeros64(values).tolist() == expected
+
+
+def test_hll_rank_is_position_of_first_one_bit_after_the_index():
+    hll = HyperLogLog(p=4)
+    # Index 0b0001; the remaining 60 bits start with three zeros.
+    hll.update(np.array([(1 << 60) | (1 << 56)], dtype=np.uint64))
+    assert hll.registers[1] == 4
+    # All-zero remainder: the rank is capped at 64 - p + 1.
+    hll.update(np.array([2 << 60], dtype=np.uint64))
+    assert hll.registers[2] == 61
+
+
+@pytest.mark.parametrize("n", [10, 1_000, 200_000])
+def test_hll_estimate_within_error_bound(n):
+    hll = HyperLogLog(p=12)
+    hll.update(hash_numbers(np.arange(n, dtype=np.float64)))
+    # 1.04 / sqrt(4096) ~ 1.6%; allow four standard errors.
+    assert abs(hll.estimate() - n) <= max(2, 0.065 * n)
+
+
+def test_hll_merge_equals_sketch_of_the_union():
+    left, right, union = HyperLogLog(), HyperLogLog(), HyperLogLog()
+    a = hash_numbers(np.arange(0, 60_000, dtype=np.float64))
+    b = hash_numbers(np.arange(40_000, 100_000, dtype=np.float64))
+    left.update(a)
+    right.update(b)
+    union.update(np.r_[a, b])
+    left.merge(right)
+    assert np.array_equal(left.registers, union.registers)
+
+
+def test_hll_rejects_mixed_precision():
+    with pytest.raises(ValueError):
+        HyperLogLog(p=10).merge(HyperLogLog(p=12))
+
+
+# ----------------------------------------------------------------------
+# t-digest
+# ----------------------------------------------------------------------
+def test_tdigest_quantiles_of_uniform_data():
+    digest = TDigest()
+    values = np.random.default_rng(2).permutation(100_000).astype(np.float64)
+    for batch in np.array_split(values, 37):
+        digest.update(batch)
+    qs = [0.01, 0.25, 0.5, 0.75, 0.99]
+    for q, estimate in zip(qs, digest.quantiles(qs)):
+        assert abs(estimate - q * 100_000) <= 500
+    assert digest.quantiles([0.0, 1.0]) == [0.0, 99_999.0]
+
+
+def test_tdigest_merge_matches_single_digest():
+    rng = np.random.default_rng(3)
+    values = rng.normal(size=50_000)
+    whole, left, right = TDigest(), TDigest(), TDigest()
+    whole.update(values)
+    left.update(values[:20_000])
+    right.update(values[20_000:])
+    left.merge(right)
+    assert left.count == pytest.approx(whole.count)
+    assert left.min == whole.min and left.max == whole.max
+    qs = [0.05, 0.5, 0.95]
+    assert left.quantiles(qs) == pytest.approx(whole.quantiles(qs), abs=0.02)
+
+
+def test_tdigest_stays_compressed_and_ignores_non_finite():
+    digest = TDigest(compression=50)
+    digest.update(np.r_[np.arange(100_000, dtype=np.float64), np.nan, np.inf])
+    digest.quantiles([0.5])
+    assert digest.count == 100_000
+    assert digest.means.size <= 50
+
+
+def test_tdigest_empty_has_no_quantiles():
+    assert TDigest().quantiles([0.5]) is None
+
+
+# ----------------------------------------------------------------------
+# Space-Saving
+# ----------------------------------------------------------------------
+def _skewed_stream(seed: int, size: int) -> np.ndarray:
+    ranks = np.random.default_rng(seed).zipf(1.3, size)
+    return np.array([f"v{r}" for r in ranks])
+
+
+def _assert_bounds(sketch: SpaceSaving, stream: np.ndarray) -> None:
+    values, counts = np.unique(stream, return_counts=True)
+    truth = dict(zip(values.tolist(), counts.tolist()))
+    for item in sketch.top(sketch.capacity):
+        true_count = truth.get(item["value"], 0)
+        assert item["count"] - item["error"] <= true_count <= item["count"]
+
+
+def test_space_saving_is_exact_below_capacity():
+    sketch = SpaceSaving(k=3)
+    sketch.update(np.array(list("aaabbc")))
+    assert sketch.top() == [
+        {"value": "a", "count": 3, "error": 0},
+        {"value": "b", "count": 2, "error": 0},
+        {"value": "c", "count": 1, "error": 0},
+    ]
+
+
+def test_space_saving_bounds_hold_over_batches():
+    stream = _skewed_stream(4, 50_000)
+    sketch = SpaceSaving(k=10)
+    for batch in np.array_split(stream, 25):
+        sketch.update(batch)
+    assert sketch.n == stream.size
+    _assert_bounds(sketch, stream)
+    assert sketch.top(1)[0]["value"] == "v1"
+
+
+def test_space_saving_bounds_hold_after_merge():
+    left_stream, right_stream = _skewed_stream(5, 30_000), _skewed_stream(6, 30_000)
+    left, right = SpaceSaving(k=10), SpaceSaving(k=10)
+    for batch in np.array_split(left_stream, 10):
+        left.update(batch)
+    for batch in np.array_split(right_stream, 10):
+        right.update(batch)
+    left.merge(right)
+    assert left.n == 60_000
+    _assert_bounds(left, np.r_[left_stream, right_stream])
+
+
+# ----------------------------------------------------------------------
+# ColumnSketch
+# ----------------------------------------------------------------------
+def test_column_sketch_counts_nulls_and_summarises():
+    sketch = ColumnSketch("numeric")
+    sketch.update([1, 2, 2, None, 3, None])
+    summary = sketch.summary()
+    assert (sketch.rows, sketch.nulls) == (6, 2)
+    assert summary["distinct_sketch"] == 3
+    assert summary["top_values"][0]["value"] == "2"
+    assert summary["quantiles"]["p50"] == pytest.approx(2.0)
+
+
+@pytest.mark.parametrize(
+    "kind, values",
+    [
+        ("numeric", list(np.random.default_rng(7).normal(size=5_000)) + [None] * 10),
+        ("text", [f"name-{i % 300}" for i in range(5_000)] + [None]),
+        ("temporal", [datetime(2024, 1, 1 + i % 28, i % 24) for i in range(2_000)]),
+        ("other", [bytes([i % 7]) for i in range(500)]),
+    ],
+)
+def test_column_sketch_round_trips_through_bytes(kind, values):
+    sketch = ColumnSketch(kind)
+    sketch.update(values)
+    restored = ColumnSketch.from_bytes(sketch.to_bytes())
+
+    assert restored.summary() == sketch.summary()
+    assert np.array_equal(restored.hll.registers, sketch.hll.registers)
+    assert restored.top.counts == sketch.top.counts
+    assert restored.top.errors == sketch.top.errors
+    assert (restored.top.capacity, restored.top.n) == (sketch.top.capacity, sketch.top.n)
+    if sketch.digest is not None:
+        assert np.array_equal(restored.digest.means, sketch.digest.means)
+        assert np.array_equal(restored.digest.weights, sketch.digest.weights)
+
+
+def test_restored_sketches_keep_merging():
+    left, right = ColumnSketch("numeric"), ColumnSketch("numeric")
+    left.update(list(range(0, 3_000)))
+    right.update(list(range(2_000, 5_000)))
+    merged = ColumnSketch.from_bytes(left.to_bytes())
+    merged.merge(ColumnSketch.from_bytes(right.to_bytes()))
+
+    assert merged.rows == 6_000
+    assert abs(merged.summary()["distinct_sketch"] - 5_000) <= 0.065 * 5_000
+    assert merged.digest.min == 0 and merged.digest.max == 4_999
+    assert not math.isinf(merged.summary()["quantiles"]["p50"])